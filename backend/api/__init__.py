@@ -4,5 +4,8 @@ from .benchmark import router as benchmark_router
 from .statistics import router as statistics_router
 from .components import router as components_router
 from .trends import router as trends_router
+from .vorberechnung import router as vorberechnung_router
+from .dashboard import router as dashboard_router
+from .export import router as export_router
 
-__all__ = ["submit_router", "stats_router", "benchmark_router", "statistics_router", "components_router", "trends_router"]
+__all__ = ["submit_router", "stats_router", "benchmark_router", "statistics_router", "components_router", "trends_router", "vorberechnung_router", "dashboard_router", "export_router"]
@@ -12,14 +12,40 @@ Aktuell:
   obwohl er nur Speicher-Anlagen gemittelt hat. Median + Spanne + Ratio
   geben dem Leser den Plausibilitäts-Anker; der Frontend-Label macht
   die Auswahl explizit.
+- spez_jahresertrag_je_anlage / durchschnitt_spez_jahresertrag: spez.
+  Jahresertrag je Anlage (letzte 12 Monatszeilen, ab 6 Monaten auf 12
+  hochgerechnet) in einem Statement per Fensterfunktion. Ersetzt die
+  Schleifen mit einer Abfrage pro Anlage in `/api/stats` und
+  `/api/statistics`.
+- periode / im_zeitraum: Zeitfenster über die generierte Spalte
+  `monatswerte.periode` als `BETWEEN` — ein Bereichsscan auf
+  `ix_monatswerte_periode` statt (jahr, monat)-Verknüpfungen je Aufruf,
+  mit Jahresgrenzen für das Partition-Pruning (core/partitionen.py).
 """
 
 from dataclasses import dataclass
 
-from sqlalchemy import case, func, select
+from sqlalchemy import and_, case, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import Anlage
+from models import Anlage, Monatswert
+
+
+def periode(jahr: int, monat: int) -> int:
+    """Fortlaufender Monatsindex, identisch mit `monatswerte.periode`."""
+    return jahr * 12 + monat - 1
+
+
+def im_zeitraum(von_jahr: int, von_monat: int, bis_jahr: int, bis_monat: int):
+    """Filter „Monatswert liegt im Zeitraum", beide Grenzen eingeschlossen.
+
+    Die Jahresgrenzen sind inhaltlich doppelt, aber nur über `jahr` kann
+    Postgres die Jahrespartitionen außerhalb des Zeitraums überspringen.
+    """
+    return and_(
+        Monatswert.jahr.between(von_jahr, bis_jahr),
+        Monatswert.periode.between(periode(von_jahr, von_monat), periode(bis_jahr, bis_monat)),
+    )
 
 
 @dataclass
@@ -39,6 +65,44 @@ class SpeicherStats:
     n_gesamt: int
 
 
+def speicher_stats_spalten() -> list:
+    """Aggregat-Spalten der Speicher-KPIs, zum Einbetten in größere Statements.
+
+    Alle per `FILTER (speicher_kwh > 0)`, dazu die Gesamtzahl `sp_n_gesamt`.
+    Auswerten mit `speicher_stats_aus_row`.
+    """
+    has_speicher = Anlage.speicher_kwh.isnot(None) & (Anlage.speicher_kwh > 0)
+    sortiert = Anlage.speicher_kwh.asc()
+    return [
+        func.count(Anlage.id).label("sp_n_gesamt"),
+        func.count(Anlage.id).filter(has_speicher).label("sp_n"),
+        func.avg(Anlage.speicher_kwh).filter(has_speicher).label("sp_avg"),
+        func.percentile_cont(0.5).within_group(sortiert).filter(has_speicher).label("sp_median"),
+        func.percentile_cont(0.25).within_group(sortiert).filter(has_speicher).label("sp_p25"),
+        func.percentile_cont(0.75).within_group(sortiert).filter(has_speicher).label("sp_p75"),
+        func.avg(
+            case((Anlage.kwp > 0, Anlage.speicher_kwh / Anlage.kwp), else_=None)
+        ).filter(has_speicher).label("sp_avg_kwh_pro_kwp"),
+    ]
+
+
+def speicher_stats_aus_row(row) -> SpeicherStats:
+    """Baut `SpeicherStats` aus einer Zeile mit den `speicher_stats_spalten`."""
+
+    def _f(value):
+        return float(value) if value is not None else None
+
+    return SpeicherStats(
+        avg_kwh=_f(row.sp_avg),
+        median_kwh=_f(row.sp_median),
+        p25_kwh=_f(row.sp_p25),
+        p75_kwh=_f(row.sp_p75),
+        avg_kwh_pro_kwp=_f(row.sp_avg_kwh_pro_kwp),
+        n_mit_speicher=int(row.sp_n or 0),
+        n_gesamt=int(row.sp_n_gesamt or 0),
+    )
+
+
 async def compute_speicher_stats(db: AsyncSession) -> SpeicherStats:
     """Berechnet die Speicher-KPIs in einem SQL-Roundtrip.
 
@@ -47,32 +111,45 @@ async def compute_speicher_stats(db: AsyncSession) -> SpeicherStats:
     muss im UI klar gelabeled werden, sonst entsteht die naive Lesart
     "Ø über alle Anlagen".
     """
-    n_total = (await db.execute(select(func.count(Anlage.id)))).scalar() or 0
+    row = (await db.execute(select(*speicher_stats_spalten()))).one()
+    return speicher_stats_aus_row(row)
 
-    has_speicher = Anlage.speicher_kwh.isnot(None) & (Anlage.speicher_kwh > 0)
 
-    stmt = select(
-        func.count(Anlage.id).label("n"),
-        func.avg(Anlage.speicher_kwh).label("avg"),
-        func.percentile_cont(0.5).within_group(Anlage.speicher_kwh.asc()).label("median"),
-        func.percentile_cont(0.25).within_group(Anlage.speicher_kwh.asc()).label("p25"),
-        func.percentile_cont(0.75).within_group(Anlage.speicher_kwh.asc()).label("p75"),
-        func.avg(
-            case((Anlage.kwp > 0, Anlage.speicher_kwh / Anlage.kwp), else_=None)
-        ).label("avg_kwh_pro_kwp"),
-    ).where(has_speicher)
+def spez_jahresertrag_je_anlage(region: str | None = None):
+    """Subquery (anlage_id, region, spez_jahresertrag) für alle Anlagen mit kWp > 0.
 
-    row = (await db.execute(stmt)).one()
+    Gleiche Regel wie bisher in den Pro-Anlage-Schleifen: die letzten 12
+    Monatszeilen der Anlage (auch solche ohne Ertrag), davon mindestens 6 mit
+    Ertrag, Ø-Monatsertrag × 12 / kWp. Anlagen mit weniger Monaten fehlen.
+    """
+    rang = func.row_number().over(
+        partition_by=Monatswert.anlage_id,
+        order_by=Monatswert.periode.desc(),
+    )
+    letzte = select(
+        Monatswert.anlage_id, Monatswert.ertrag_kwh, rang.label("rang")
+    ).subquery()
+
+    stmt = (
+        select(
+            Anlage.id.label("anlage_id"),
+            Anlage.region,
+            (
+                func.sum(letzte.c.ertrag_kwh) / func.count(letzte.c.ertrag_kwh) * 12 / Anlage.kwp
+            ).label("spez_jahresertrag"),
+        )
+        .join(letzte, letzte.c.anlage_id == Anlage.id)
+        .where(letzte.c.rang <= 12, Anlage.kwp > 0)
+        .group_by(Anlage.id)
+        .having(func.count(letzte.c.ertrag_kwh) >= 6)
+    )
+    if region is not None:
+        stmt = stmt.where(Anlage.region == region)
+    return stmt.subquery()
 
-    def _f(value):
-        return float(value) if value is not None else None
 
-    return SpeicherStats(
-        avg_kwh=_f(row.avg),
-        median_kwh=_f(row.median),
-        p25_kwh=_f(row.p25),
-        p75_kwh=_f(row.p75),
-        avg_kwh_pro_kwp=_f(row.avg_kwh_pro_kwp),
-        n_mit_speicher=int(row.n or 0),
-        n_gesamt=int(n_total),
-    )
+async def durchschnitt_spez_jahresertrag(db: AsyncSession, region: str | None = None) -> float:
+    """Ø spez. Jahresertrag über alle (bzw. die Anlagen einer Region), 0 ohne Daten."""
+    je_anlage = spez_jahresertrag_je_anlage(region)
+    wert = (await db.execute(select(func.avg(je_anlage.c.spez_jahresertrag)))).scalar()
+    return float(wert) if wert is not None else 0
@@ -0,0 +1,458 @@
+"""
+EEDC Community - Spaltenbasierte In-Memory-Analytik (NumPy)
+
+Der ganze Datenbestand passt bequem in den Speicher: einige tausend Anlagen,
+einige zehntausend Monatswerte. `Analytik` hält beide Tabellen als NumPy-
+Spalten (`Datenstand`) und beantwortet damit die Auswertungen, die sonst je
+Anlage eine SQL-Abfrage stellen (Rankings, Komponenten-Deep-Dives, Trends).
+
+- Spalten: Anlagen nach `id`, Monatswerte nach (Anlage, Periode) sortiert;
+  Periode wie `monatswerte.periode`. Region, Ausrichtung und WP-Art zusätzlich
+  als kategoriale Codes (`-1` = nicht gesetzt), NULL als NaN.
+- Primitive: `gruppen_summe`, `gruppen_anzahl`, `gruppen_mittel`,
+  `gruppen_perzentil` (wie `percentile_cont`) und das Fenster
+  `Datenstand.letzte_monate` (die n jüngsten Monate je Anlage).
+- Aktuell gehalten: Submit und Löschen wenden ihre Änderung als Delta an
+  (`anlagen_geaendert`, `anlage_entfernt`). Passt das Delta nicht lückenlos
+  an die Datenversion (Schreibvorgang in einem anderen Worker, Rollup-
+  Neuaufbau), lädt das nächste Lesen nur die Anlagen nach, die laut
+  `daten_aenderungen` seitdem geändert wurden; komplett neu geladen wird nur,
+  wenn das Protokoll nicht weit genug zurückreicht.
+- Optional: ohne `numpy` oder mit `ANALYTIK_AKTIV=false` liefert `stand()`
+  None und die Endpoints rechnen wie bisher per SQL.
+
+Konsistenzprüfung gegen die Datenbank: `python manage.py analytik pruefen`.
+"""
+
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import daten_version_abgleichen, schnappschuss, settings
+from models import Anlage, DatenAenderung, Monatswert
+from .aggregations import periode
+
+try:
+    import numpy as np
+except ImportError:  # optional, siehe requirements.txt
+    np = None
+
+logger = logging.getLogger(__name__)
+
+#: Anlagen-Spalten: Name → dtype ("O" = Python-Objekte, z. B. Strings)
+ANLAGEN_SPALTEN = {
+    "id": "int64",
+    "anlage_hash": "O",
+    "region": "O",
+    "kwp": "float64",
+    "ausrichtung": "O",
+    "neigung_grad": "float64",
+    "speicher_kwh": "float64",
+    "installation_jahr": "int64",
+    "hat_waermepumpe": "bool",
+    "wp_art": "O",
+    "hat_eauto": "bool",
+    "hat_wallbox": "bool",
+    "hat_balkonkraftwerk": "bool",
+    "bkw_wp": "float64",
+}
+
+KATEGORIEN = ("region", "ausrichtung", "wp_art")
+
+#: Alle Messwerte eines Monats, als float64 (NULL → NaN)
+MONATS_WERTE = tuple(
+    spalte.name for spalte in Monatswert.__table__.columns
+    if spalte.name not in ("id", "anlage_id", "jahr", "monat", "periode")
+)
+
+
+# =============================================================================
+# Primitive
+# =============================================================================
+
+def gruppen_anzahl(maske, gruppen, anzahl: int):
+    """Anzahl der Zeilen mit `maske` je Gruppe."""
+    return np.bincount(gruppen[maske], minlength=anzahl)
+
+
+def gruppen_summe(werte, gruppen, anzahl: int, maske=None):
+    """Summe je Gruppe; NaN zählt als 0 (wie `SUM` mit `or 0`)."""
+    gueltig = ~np.isnan(werte)
+    if maske is not None:
+        gueltig &= maske
+    return np.bincount(gruppen[gueltig], weights=werte[gueltig], minlength=anzahl)
+
+
+def gruppen_mittel(werte, gruppen, anzahl: int, maske=None):
+    """Mittelwert je Gruppe ohne NaN; NaN, wo die Gruppe keinen Wert hat."""
+    gueltig = ~np.isnan(werte)
+    if maske is not None:
+        gueltig &= maske
+    summe = np.bincount(gruppen[gueltig], weights=werte[gueltig], minlength=anzahl)
+    n = np.bincount(gruppen[gueltig], minlength=anzahl)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, summe / np.maximum(n, 1), np.nan)
+
+
+def gruppen_perzentil(werte, gruppen, anzahl: int, q: float, maske=None):
+    """Perzentil je Gruppe mit linearer Interpolation (`percentile_cont(q)`)."""
+    gueltig = ~np.isnan(werte)
+    if maske is not None:
+        gueltig &= maske
+    g, w = gruppen[gueltig], werte[gueltig]
+    reihenfolge = np.lexsort((w, g))
+    g, w = g[reihenfolge], w[reihenfolge]
+    n = np.bincount(g, minlength=anzahl)
+    start = np.concatenate(([0], np.cumsum(n)[:-1]))
+    ergebnis = np.full(anzahl, np.nan)
+    hat = n > 0
+    position = start[hat] + q * (n[hat] - 1)
+    unten = np.floor(position).astype(np.int64)
+    oben = np.ceil(position).astype(np.int64)
+    ergebnis[hat] = w[unten] + (w[oben] - w[unten]) * (position - unten)
+    return ergebnis
+
+
+def quotient(zaehler, nenner):
+    """Elementweise Division; NaN, wo der Nenner 0 ist."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(nenner != 0, zaehler / np.where(nenner != 0, nenner, 1), np.nan)
+
+
+def jaz_je_anlage(stand: "Datenstand"):
+    """JAZ je Anlage über alle Monate mit WP-Strom; NaN ohne Strom > 0.
+
+    Anlagen ohne Wärmepumpe bekommen ebenfalls einen Wert, wenn sie
+    WP-Strom melden — filtern ist Sache des Aufrufers (`hat_waermepumpe`).
+    """
+    mit_strom = stand.gesetzt("wp_stromverbrauch_kwh")
+    strom = stand.summe_je_anlage("wp_stromverbrauch_kwh", mit_strom)
+    waerme = (
+        stand.summe_je_anlage("wp_heizwaerme_kwh", mit_strom)
+        + stand.summe_je_anlage("wp_warmwasser_kwh", mit_strom)
+    )
+    return np.where(strom > 0, quotient(waerme, strom), np.nan)
+
+
+# =============================================================================
+# Datenstand
+# =============================================================================
+
+class Datenstand:
+    """Unveränderlicher Spaltensatz einer Datenversion.
+
+    Deltas erzeugen einen neuen Stand; wer einen Stand in der Hand hält,
+    sieht ihn bis zum Ende seiner Berechnung unverändert.
+    """
+
+    def __init__(self, anlagen: dict[str, Any], monatswerte: dict[str, Any], version: int):
+        self.version = version
+
+        reihenfolge = np.argsort(anlagen["id"], kind="stable")
+        self.anlagen = {name: anlagen[name][reihenfolge] for name in ANLAGEN_SPALTEN}
+        self.anzahl_anlagen = len(self.anlagen["id"])
+
+        # Kategoriale Codes, Kategorien sortiert; -1 = nicht gesetzt
+        self.kategorien: dict[str, list[str]] = {}
+        self.codes: dict[str, Any] = {}
+        for name in KATEGORIEN:
+            werte = self.anlagen[name]
+            kategorien = sorted({w for w in werte if w is not None})
+            index = {k: i for i, k in enumerate(kategorien)}
+            self.kategorien[name] = kategorien
+            self.codes[name] = np.array([index.get(w, -1) for w in werte], dtype=np.int32)
+
+        self.periode = periode(monatswerte["jahr"], monatswerte["monat"])
+        reihenfolge = np.lexsort((self.periode, monatswerte["anlage_id"]))
+        self.monatswerte = {name: spalte[reihenfolge] for name, spalte in monatswerte.items()}
+        self.periode = self.periode[reihenfolge]
+        # Zeile → Position der Anlage in den Anlagen-Spalten
+        self.anlage = np.searchsorted(self.anlagen["id"], self.monatswerte["anlage_id"])
+        # Zeilenbereich [beginn, ende) je Anlage
+        self._beginn = np.searchsorted(self.monatswerte["anlage_id"], self.anlagen["id"], side="left")
+        self._ende = np.searchsorted(self.monatswerte["anlage_id"], self.anlagen["id"], side="right")
+
+    @property
+    def anzahl_monatswerte(self) -> int:
+        return len(self.periode)
+
+    def gesetzt(self, name: str):
+        """Maske der Zeilen, in denen der Messwert nicht NULL ist."""
+        return ~np.isnan(self.monatswerte[name])
+
+    def je_zeile(self, name: str):
+        """Anlagen-Spalte auf die Monatswert-Zeilen verteilt."""
+        return self.anlagen[name][self.anlage]
+
+    def summe_je_anlage(self, name: str, maske=None):
+        return gruppen_summe(self.monatswerte[name], self.anlage, self.anzahl_anlagen, maske)
+
+    def mittel_je_anlage(self, name: str, maske=None):
+        return gruppen_mittel(self.monatswerte[name], self.anlage, self.anzahl_anlagen, maske)
+
+    def anzahl_je_anlage(self, maske):
+        return gruppen_anzahl(maske, self.anlage, self.anzahl_anlagen)
+
+    def letzte_monate(self, n: int):
+        """Fenster: Maske der n jüngsten Monate je Anlage (wie `ORDER BY … DESC LIMIT n`)."""
+        zeile = np.arange(self.anzahl_monatswerte)
+        return zeile >= self._ende[self.anlage] - n
+
+    def im_zeitraum(self, von_jahr: int, von_monat: int, bis_jahr: int, bis_monat: int):
+        return (self.periode >= periode(von_jahr, von_monat)) & (self.periode <= periode(bis_jahr, bis_monat))
+
+    def erste_periode(self):
+        """Früheste Periode je Anlage (ohne Monatswerte: größer als jede Periode)."""
+        ergebnis = np.full(self.anzahl_anlagen, np.iinfo(np.int64).max)
+        hat = self._ende > self._beginn
+        ergebnis[hat] = self.periode[self._beginn[hat]]
+        return ergebnis
+
+    # --- Deltas -------------------------------------------------------------
+
+    def ohne_anlage(self, anlage_id: int, version: int) -> "Datenstand":
+        anlagen = {k: v[self.anlagen["id"] != anlage_id] for k, v in self.anlagen.items()}
+        maske = self.monatswerte["anlage_id"] != anlage_id
+        monatswerte = {k: v[maske] for k, v in self.monatswerte.items()}
+        return Datenstand(anlagen, monatswerte, version)
+
+    def mit_anlagen(self, aenderungen: list[tuple[Anlage, list[Monatswert]]], version: int) -> "Datenstand":
+        """Ersetzt Anlagen samt aller ihrer Monatswerte (je Anlage gilt die letzte Änderung)."""
+        letzte = {anlage.id: (anlage, monatswerte) for anlage, monatswerte in aenderungen}
+        return self.ersetzt(
+            list(letzte),
+            _anlagen_spalten([anlage for anlage, _ in letzte.values()]),
+            _monats_spalten([m for _, monatswerte in letzte.values() for m in monatswerte]),
+            version,
+        )
+
+    def ersetzt(self, ids, anlagen: dict[str, Any], monatswerte: dict[str, Any], version: int) -> "Datenstand":
+        """Ersetzt die Anlagen `ids` samt Monatswerten durch die übergebenen Spalten.
+
+        IDs ohne Zeile in `anlagen` fallen weg (gelöschte Anlagen).
+        """
+        behalten = ~np.isin(self.anlagen["id"], ids)
+        behalten_monate = ~np.isin(self.monatswerte["anlage_id"], ids)
+        return Datenstand(
+            {k: np.concatenate((self.anlagen[k][behalten], anlagen[k])) for k in ANLAGEN_SPALTEN},
+            {k: np.concatenate((self.monatswerte[k][behalten_monate], monatswerte[k])) for k in self.monatswerte},
+            version,
+        )
+
+    def gleich(self, anderer: "Datenstand") -> list[str]:
+        """Abweichende Spalten gegenüber einem anderen Stand (leer = gleich)."""
+        abweichend = []
+        for name in ANLAGEN_SPALTEN:
+            if not _spalten_gleich(self.anlagen[name], anderer.anlagen[name]):
+                abweichend.append(f"anlagen.{name}")
+        for name in self.monatswerte:
+            if not _spalten_gleich(self.monatswerte[name], anderer.monatswerte[name]):
+                abweichend.append(f"monatswerte.{name}")
+        return abweichend
+
+
+def _spalten_gleich(a, b) -> bool:
+    if a.shape != b.shape:
+        return False
+    if a.dtype.kind == "f":
+        return bool(np.array_equal(a, b, equal_nan=True))
+    return bool(np.array_equal(a, b))
+
+
+def _anlagen_spalten(zeilen) -> dict[str, Any]:
+    return {
+        name: np.array([getattr(z, name) for z in zeilen], dtype=dtype)
+        for name, dtype in ANLAGEN_SPALTEN.items()
+    }
+
+
+def _monats_spalten(zeilen) -> dict[str, Any]:
+    spalten = {
+        "anlage_id": np.array([z.anlage_id for z in zeilen], dtype=np.int64),
+        "jahr": np.array([z.jahr for z in zeilen], dtype=np.int64),
+        "monat": np.array([z.monat for z in zeilen], dtype=np.int64),
+    }
+    for name in MONATS_WERTE:
+        # dtype=float macht aus None direkt NaN
+        spalten[name] = np.array([getattr(z, name) for z in zeilen], dtype=np.float64)
+    return spalten
+
+
+async def _spalten_laden(db: AsyncSession, anlage_ids: list[int] | None = None):
+    anlagen = select(*(getattr(Anlage, name) for name in ANLAGEN_SPALTEN))
+    monatswerte = select(
+        Monatswert.anlage_id, Monatswert.jahr, Monatswert.monat,
+        *(getattr(Monatswert, name) for name in MONATS_WERTE),
+    )
+    if anlage_ids is not None:
+        anlagen = anlagen.where(Anlage.id.in_(anlage_ids))
+        monatswerte = monatswerte.where(Monatswert.anlage_id.in_(anlage_ids))
+    return (
+        _anlagen_spalten((await db.execute(anlagen)).all()),
+        _monats_spalten((await db.execute(monatswerte)).all()),
+    )
+
+
+async def stand_laden(db: AsyncSession, version: int) -> Datenstand:
+    """Beide Tabellen in Spalten laden — zwei Abfragen."""
+    anlagen, monatswerte = await _spalten_laden(db)
+    return Datenstand(anlagen, monatswerte, version)
+
+
+async def stand_nachladen(db: AsyncSession, stand: Datenstand, version: int) -> Datenstand | None:
+    """Nur die seit `stand.version` geänderten Anlagen laden (`daten_aenderungen`).
+
+    None, wenn das Protokoll die Lücke bis `version` nicht lückenlos abdeckt
+    (zu alt, schon aufgeräumt) oder so viele Anlagen betrifft, dass ein
+    vollständiges Laden nicht teurer wäre.
+    """
+    zeilen = (await db.execute(
+        select(DatenAenderung.version, DatenAenderung.anlage_ids)
+        .where(DatenAenderung.version > stand.version)
+    )).all()
+    versionen = {zeile.version for zeile in zeilen}
+    if not versionen.issuperset(range(stand.version + 1, version + 1)):
+        return None
+    ids = sorted({anlage_id for zeile in zeilen for anlage_id in zeile.anlage_ids})
+    if len(ids) > stand.anzahl_anlagen // 2:
+        return None
+    if ids:
+        anlagen, monatswerte = await _spalten_laden(db, ids)
+    else:  # z. B. nur ein Rollup-Neuaufbau
+        anlagen, monatswerte = _anlagen_spalten([]), _monats_spalten([])
+    return stand.ersetzt(ids, anlagen, monatswerte, version)
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+_analytik_umgehen: ContextVar[bool] = ContextVar("analytik_umgehen", default=False)
+
+
+class Analytik:
+    """Hält den aktuellen `Datenstand` dieses Worker-Prozesses."""
+
+    def __init__(self):
+        self._stand: Datenstand | None = None
+        self._laden = asyncio.Lock()
+
+    @property
+    def aktiv(self) -> bool:
+        return np is not None and settings.analytik_aktiv
+
+    @property
+    def geladen(self) -> Datenstand | None:
+        return self._stand
+
+    async def stand(self, db: AsyncSession) -> Datenstand | None:
+        """Stand zur aktuellen Datenversion; None, wenn die Analytik aus ist."""
+        if not self.aktiv or _analytik_umgehen.get():
+            return None
+        version = await daten_version_abgleichen(db)
+        stand = self._stand
+        if stand is not None and stand.version == version:
+            return stand
+        async with self._laden:
+            stand = self._stand
+            if stand is None or stand.version != version:
+                neu = None
+                if stand is not None and stand.version < version:
+                    neu = await stand_nachladen(db, stand, version)
+                if neu is None:
+                    neu = await stand_laden(db, version)
+                # Ein lokales Delta kann inzwischen schon weiter sein
+                if self._stand is None or self._stand.version < neu.version:
+                    self._stand = neu
+        return self._stand
+
+    def anlagen_geaendert(self, aenderungen: list[tuple[Anlage, list[Monatswert]]], version: int) -> None:
+        """Delta nach einem Submit bzw. Sammel-Commit (nach dem Commit aufrufen)."""
+        stand = self._stand
+        if stand is None or not self.aktiv:
+            return
+        if stand.version != version - 1:
+            return  # Lücke: beim nächsten Lesen neu laden
+        try:
+            self._stand = stand.mit_anlagen(aenderungen, version)
+        except Exception:
+            logger.exception("Analytik: Delta fehlgeschlagen, wird neu geladen")
+
+    def anlage_entfernt(self, anlage_id: int, version: int) -> None:
+        """Delta nach dem Löschen einer Anlage (nach dem Commit aufrufen)."""
+        stand = self._stand
+        if stand is None or not self.aktiv or stand.version != version - 1:
+            return
+        self._stand = stand.ohne_anlage(anlage_id, version)
+
+    @staticmethod
+    @contextmanager
+    def umgehen() -> Iterator[None]:
+        """Im aktuellen Task per SQL rechnen (Referenz für die Prüfung)."""
+        token = _analytik_umgehen.set(True)
+        try:
+            yield
+        finally:
+            _analytik_umgehen.reset(token)
+
+
+analytik = Analytik()
+
+
+# =============================================================================
+# Konsistenzprüfung
+# =============================================================================
+
+def _weicht_ab(a, b) -> bool:
+    """Vergleich zweier Ausgaben; Floats dürfen um eine Rundungsstufe abweichen.
+
+    SQL summiert in Scan-Reihenfolge, NumPy in Spalten-Reihenfolge — an der
+    Grenze x,x5 kann das eine Rundungsstufe ausmachen.
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() != b.keys() or any(_weicht_ab(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) != len(b) or any(_weicht_ab(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return abs(a - b) > 0.1 + 1e-9
+    return a != b
+
+
+async def analytik_pruefen(db: AsyncSession) -> list[str]:
+    """Prüft den Stand gegen die Datenbank.
+
+    1. Spalten des gehaltenen Stands (mit allen Deltas) gegen frisch geladene.
+    2. Jede Auswertung, die die Analytik beantwortet, gegen ihren SQL-Pfad.
+
+    Gibt die Abweichungen zurück (leer = konsistent).
+    """
+    from .vorberechnung import aggregate
+
+    abweichend = []
+    version = await daten_version_abgleichen(db, erzwingen=True)
+    frisch = await stand_laden(db, version)
+    gehalten = analytik.geladen
+    if gehalten is not None and gehalten.version == version:
+        abweichend += [f"Spalte {name}" for name in gehalten.gleich(frisch)]
+
+    berechnungen = {
+        schluessel: berechnung for schluessel, berechnung in aggregate().items()
+        if schluessel.startswith(("statistics/rankings/", "components/", "trends/"))
+    }
+    with schnappschuss.umgehen():
+        for schluessel, berechnung in berechnungen.items():
+            mit_analytik = await berechnung(db)
+            with analytik.umgehen():
+                mit_sql = await berechnung(db)
+            if _weicht_ab(_als_daten(mit_analytik), _als_daten(mit_sql)):
+                abweichend.append(schluessel)
+    return abweichend
+
+
+def _als_daten(wert):
+    return wert.model_dump() if hasattr(wert, "model_dump") else wert
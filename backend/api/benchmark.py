@@ -2,26 +2,31 @@
 EEDC Community - Benchmark API
 """
 
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Literal
+from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, and_
+from sqlalchemy import and_, select, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core import get_db
+from core import get_read_db
+from core.parallel import parallel_lesen, zeilen
 from models import Anlage, Monatswert
 from schemas import (
     AnlageOutput, MonatswertOutput, BenchmarkData,
     KPIVergleich, PVBenchmark, SpeicherBenchmark, WaermepumpeBenchmark,
     EAutoBenchmark, WallboxBenchmark, BKWBenchmark, ErweiterteBenchmarkData,
     MonatsVergleich, MonatsKPI, MonatsRegionVergleich,
+    ZeitraumTyp, BatchBenchmarkAnfrage, BatchBenchmarkAntwort,
 )
+from .aggregations import im_zeitraum
 
 router = APIRouter(prefix="/benchmark", tags=["Benchmark"])
 
-# Zeitraum-Typen
-ZeitraumTyp = Literal["letzter_monat", "letzte_12_monate", "letztes_vollstaendiges_jahr", "jahr", "seit_installation", "monat"]
+# Zeitraum der Community-Durchschnitte der Komponenten (alle Daten)
+GESAMTER_ZEITRAUM = (2020, 1, 2099, 12)
 
 
 def get_zeitraum_filter(
@@ -69,46 +74,68 @@ def get_zeitraum_filter(
     return get_zeitraum_filter("letzte_12_monate")
 
 
-async def berechne_speicher_kpis(
+# =============================================================================
+# Komponenten-Summen je Anlage
+# =============================================================================
+
+#: Summen, aus denen die Komponenten-KPIs berechnet werden (Label → Spalte)
+KOMPONENTEN_SUMMEN = {
+    "speicher_ladung": Monatswert.speicher_ladung_kwh,
+    "speicher_entladung": Monatswert.speicher_entladung_kwh,
+    "speicher_ladung_netz": Monatswert.speicher_ladung_netz_kwh,
+    "wp_strom": Monatswert.wp_stromverbrauch_kwh,
+    "wp_heizwaerme": Monatswert.wp_heizwaerme_kwh,
+    "wp_warmwasser": Monatswert.wp_warmwasser_kwh,
+    "eauto_ladung": Monatswert.eauto_ladung_gesamt_kwh,
+    "eauto_ladung_pv": Monatswert.eauto_ladung_pv_kwh,
+    "eauto_km": Monatswert.eauto_km,
+    "eauto_v2h": Monatswert.eauto_v2h_kwh,
+    "wallbox_ladung": Monatswert.wallbox_ladung_kwh,
+    "wallbox_ladung_pv": Monatswert.wallbox_ladung_pv_kwh,
+    "wallbox_ladevorgaenge": Monatswert.wallbox_ladevorgaenge,
+    "bkw_erzeugung": Monatswert.bkw_erzeugung_kwh,
+    "bkw_eigenverbrauch": Monatswert.bkw_eigenverbrauch_kwh,
+}
+
+
+async def lade_komponenten_summen(
     db: AsyncSession,
-    anlage_id: int,
-    kapazitaet: float,
     von_jahr: int, von_monat: int,
     bis_jahr: int, bis_monat: int,
-) -> dict | None:
-    """Berechnet Speicher-KPIs für einen Zeitraum."""
-    if kapazitaet <= 0:
-        return None
+    anlage_ids: list[int] | None = None,
+) -> dict[int, Any]:
+    """Komponenten-Summen und Monatsanzahl je Anlage — eine gruppierte Abfrage.
 
-    result = await db.execute(
+    Ohne `anlage_ids` für alle Anlagen. Anlagen ohne Monat im Zeitraum fehlen.
+    """
+    query = (
         select(
-            func.sum(Monatswert.speicher_ladung_kwh),
-            func.sum(Monatswert.speicher_entladung_kwh),
-            func.sum(Monatswert.speicher_ladung_netz_kwh),
-            func.count(Monatswert.id),
-        )
-        .where(Monatswert.anlage_id == anlage_id)
-        .where(
-            (Monatswert.jahr > von_jahr) |
-            ((Monatswert.jahr == von_jahr) & (Monatswert.monat >= von_monat))
-        )
-        .where(
-            (Monatswert.jahr < bis_jahr) |
-            ((Monatswert.jahr == bis_jahr) & (Monatswert.monat <= bis_monat))
+            Monatswert.anlage_id,
+            *(func.sum(spalte).label(name) for name, spalte in KOMPONENTEN_SUMMEN.items()),
+            func.count(Monatswert.id).label("monate"),
         )
+        .where(im_zeitraum(von_jahr, von_monat, bis_jahr, bis_monat))
+        .group_by(Monatswert.anlage_id)
     )
-    row = result.first()
-    if not row or not row[0]:
-        return None
+    if anlage_ids is not None:
+        query = query.where(Monatswert.anlage_id.in_(anlage_ids))
+    result = await db.execute(query)
+    return {row.anlage_id: row for row in result.all()}
+
 
-    ladung, entladung, ladung_netz, monate = row
-    ladung = ladung or 0
-    entladung = entladung or 0
-    ladung_netz = ladung_netz or 0
+# =============================================================================
+# Komponenten-KPIs (aus den Summen eines Zeitraums)
+# =============================================================================
 
-    if ladung == 0:
+def _speicher_kpis(summen, kapazitaet: float) -> dict | None:
+    if kapazitaet <= 0 or not summen.speicher_ladung:
         return None
 
+    ladung = summen.speicher_ladung
+    entladung = summen.speicher_entladung or 0
+    ladung_netz = summen.speicher_ladung_netz or 0
+    monate = summen.monate
+
     # Zyklen = Entladung / Kapazität (auf Jahr hochrechnen)
     zyklen = entladung / kapazitaet
     if monate > 0 and monate < 12:
@@ -141,42 +168,12 @@ async def berechne_speicher_kpis(
     }
 
 
-async def berechne_wp_kpis(
-    db: AsyncSession,
-    anlage_id: int,
-    von_jahr: int, von_monat: int,
-    bis_jahr: int, bis_monat: int,
-) -> dict | None:
-    """Berechnet Wärmepumpe-KPIs für einen Zeitraum."""
-    result = await db.execute(
-        select(
-            func.sum(Monatswert.wp_stromverbrauch_kwh),
-            func.sum(Monatswert.wp_heizwaerme_kwh),
-            func.sum(Monatswert.wp_warmwasser_kwh),
-        )
-        .where(Monatswert.anlage_id == anlage_id)
-        .where(
-            (Monatswert.jahr > von_jahr) |
-            ((Monatswert.jahr == von_jahr) & (Monatswert.monat >= von_monat))
-        )
-        .where(
-            (Monatswert.jahr < bis_jahr) |
-            ((Monatswert.jahr == bis_jahr) & (Monatswert.monat <= bis_monat))
-        )
-    )
-    row = result.first()
-    if not row or not row[0]:
+def _wp_kpis(summen) -> dict | None:
+    if not summen.wp_strom:
         return None
 
-    strom, heiz, ww = row
-    strom = strom or 0
-    heiz = heiz or 0
-    ww = ww or 0
-
-    if strom == 0:
-        return None
-
-    waerme_gesamt = heiz + ww
+    strom = summen.wp_strom
+    waerme_gesamt = (summen.wp_heizwaerme or 0) + (summen.wp_warmwasser or 0)
     jaz = waerme_gesamt / strom if strom > 0 else None
 
     return {
@@ -186,42 +183,14 @@ async def berechne_wp_kpis(
     }
 
 
-async def berechne_eauto_kpis(
-    db: AsyncSession,
-    anlage_id: int,
-    von_jahr: int, von_monat: int,
-    bis_jahr: int, bis_monat: int,
-) -> dict | None:
-    """Berechnet E-Auto-KPIs für einen Zeitraum."""
-    result = await db.execute(
-        select(
-            func.sum(Monatswert.eauto_ladung_gesamt_kwh),
-            func.sum(Monatswert.eauto_ladung_pv_kwh),
-            func.sum(Monatswert.eauto_km),
-            func.sum(Monatswert.eauto_v2h_kwh),
-        )
-        .where(Monatswert.anlage_id == anlage_id)
-        .where(
-            (Monatswert.jahr > von_jahr) |
-            ((Monatswert.jahr == von_jahr) & (Monatswert.monat >= von_monat))
-        )
-        .where(
-            (Monatswert.jahr < bis_jahr) |
-            ((Monatswert.jahr == bis_jahr) & (Monatswert.monat <= bis_monat))
-        )
-    )
-    row = result.first()
-    if not row or not row[0]:
+def _eauto_kpis(summen) -> dict | None:
+    if not summen.eauto_ladung:
         return None
 
-    ladung, pv, km, v2h = row
-    ladung = ladung or 0
-    pv = pv or 0
-    km = km or 0
-    v2h = v2h or 0
-
-    if ladung == 0:
-        return None
+    ladung = summen.eauto_ladung
+    pv = summen.eauto_ladung_pv or 0
+    km = summen.eauto_km or 0
+    v2h = summen.eauto_v2h or 0
 
     pv_anteil = (pv / ladung * 100) if ladung > 0 else None
     verbrauch_100km = (ladung / km * 100) if km > 0 else None
@@ -235,113 +204,97 @@ async def berechne_eauto_kpis(
     }
 
 
-async def berechne_community_avg_jaz(db: AsyncSession, wp_art: str | None = None) -> float | None:
-    """
-    Berechnet den Community-Durchschnitt für JAZ.
-
-    Args:
-        wp_art: Optional — wenn gesetzt, nur Anlagen mit gleicher WP-Art.
-    """
-    # Hole alle Anlagen mit WP (optional gefiltert nach Art)
-    query = select(Anlage.id).where(Anlage.hat_waermepumpe == True)
-    if wp_art:
-        query = query.where(Anlage.wp_art == wp_art)
-    result = await db.execute(query)
-    anlage_ids = [row[0] for row in result.all()]
-
-    if not anlage_ids:
+def _wallbox_kpis(summen) -> dict | None:
+    if not summen.wallbox_ladung:
         return None
 
-    jaz_values = []
-    for aid in anlage_ids:
-        wp = await berechne_wp_kpis(db, aid, 2020, 1, 2099, 12)
-        if wp and wp.get("jaz"):
-            jaz_values.append(wp["jaz"])
+    ladung = summen.wallbox_ladung
+    pv_ladung = summen.wallbox_ladung_pv or 0
+    ladevorgaenge = summen.wallbox_ladevorgaenge or 0
 
-    return sum(jaz_values) / len(jaz_values) if jaz_values else None
+    pv_anteil = (pv_ladung / ladung * 100) if ladung > 0 else None
 
+    return {
+        "ladung": round(ladung, 1),
+        "pv_anteil": round(pv_anteil, 1) if pv_anteil else None,
+        "ladevorgaenge": ladevorgaenge if ladevorgaenge > 0 else None,
+    }
 
-async def berechne_community_avg_pv_anteil_eauto(db: AsyncSession) -> float | None:
-    """Berechnet den Community-Durchschnitt für E-Auto PV-Anteil."""
-    result = await db.execute(
-        select(Anlage.id).where(Anlage.hat_eauto == True)
-    )
-    anlage_ids = [row[0] for row in result.all()]
 
-    if not anlage_ids:
+def _bkw_kpis(summen, bkw_wp: float) -> dict | None:
+    if bkw_wp <= 0 or not summen.bkw_erzeugung:
         return None
 
-    pv_anteile = []
-    for aid in anlage_ids:
-        ea = await berechne_eauto_kpis(db, aid, 2020, 1, 2099, 12)
-        if ea and ea.get("pv_anteil"):
-            pv_anteile.append(ea["pv_anteil"])
+    erzeugung = summen.bkw_erzeugung
+    eigenverbrauch = summen.bkw_eigenverbrauch or 0
+    monate = summen.monate
 
-    return sum(pv_anteile) / len(pv_anteile) if pv_anteile else None
+    # Spez. Ertrag (auf Jahr hochrechnen)
+    kwp = bkw_wp / 1000  # Wp -> kWp
+    if monate > 0 and monate < 12:
+        jahres_erzeugung = erzeugung * (12 / monate)
+    else:
+        jahres_erzeugung = erzeugung
 
+    spez_ertrag = jahres_erzeugung / kwp if kwp > 0 else 0
+    ev_quote = (eigenverbrauch / erzeugung * 100) if erzeugung > 0 else None
 
-async def berechne_wallbox_kpis(
+    return {
+        "erzeugung": round(erzeugung, 1),
+        "spez_ertrag": round(spez_ertrag, 0),
+        "eigenverbrauch_quote": round(ev_quote, 1) if ev_quote else None,
+    }
+
+
+async def _summen_einer_anlage(db: AsyncSession, anlage_id: int, *zeitraum: int):
+    return (await lade_komponenten_summen(db, *zeitraum, anlage_ids=[anlage_id])).get(anlage_id)
+
+
+async def berechne_speicher_kpis(
     db: AsyncSession,
     anlage_id: int,
+    kapazitaet: float,
     von_jahr: int, von_monat: int,
     bis_jahr: int, bis_monat: int,
 ) -> dict | None:
-    """Berechnet Wallbox-KPIs für einen Zeitraum."""
-    result = await db.execute(
-        select(
-            func.sum(Monatswert.wallbox_ladung_kwh),
-            func.sum(Monatswert.wallbox_ladung_pv_kwh),
-            func.sum(Monatswert.wallbox_ladevorgaenge),
-            func.count(Monatswert.id),
-        )
-        .where(Monatswert.anlage_id == anlage_id)
-        .where(
-            (Monatswert.jahr > von_jahr) |
-            ((Monatswert.jahr == von_jahr) & (Monatswert.monat >= von_monat))
-        )
-        .where(
-            (Monatswert.jahr < bis_jahr) |
-            ((Monatswert.jahr == bis_jahr) & (Monatswert.monat <= bis_monat))
-        )
-    )
-    row = result.first()
-    if not row or not row[0]:
-        return None
-
-    ladung, pv_ladung, ladevorgaenge, monate = row
-    ladung = ladung or 0
-    pv_ladung = pv_ladung or 0
-    ladevorgaenge = ladevorgaenge or 0
-
-    if ladung == 0:
+    """Berechnet Speicher-KPIs für einen Zeitraum."""
+    if kapazitaet <= 0:
         return None
+    summen = await _summen_einer_anlage(db, anlage_id, von_jahr, von_monat, bis_jahr, bis_monat)
+    return _speicher_kpis(summen, kapazitaet) if summen else None
 
-    pv_anteil = (pv_ladung / ladung * 100) if ladung > 0 else None
-
-    return {
-        "ladung": round(ladung, 1),
-        "pv_anteil": round(pv_anteil, 1) if pv_anteil else None,
-        "ladevorgaenge": ladevorgaenge if ladevorgaenge > 0 else None,
-    }
 
+async def berechne_wp_kpis(
+    db: AsyncSession,
+    anlage_id: int,
+    von_jahr: int, von_monat: int,
+    bis_jahr: int, bis_monat: int,
+) -> dict | None:
+    """Berechnet Wärmepumpe-KPIs für einen Zeitraum."""
+    summen = await _summen_einer_anlage(db, anlage_id, von_jahr, von_monat, bis_jahr, bis_monat)
+    return _wp_kpis(summen) if summen else None
 
-async def berechne_community_avg_pv_anteil_wallbox(db: AsyncSession) -> float | None:
-    """Berechnet den Community-Durchschnitt für Wallbox PV-Anteil."""
-    result = await db.execute(
-        select(Anlage.id).where(Anlage.hat_wallbox == True)
-    )
-    anlage_ids = [row[0] for row in result.all()]
 
-    if not anlage_ids:
-        return None
+async def berechne_eauto_kpis(
+    db: AsyncSession,
+    anlage_id: int,
+    von_jahr: int, von_monat: int,
+    bis_jahr: int, bis_monat: int,
+) -> dict | None:
+    """Berechnet E-Auto-KPIs für einen Zeitraum."""
+    summen = await _summen_einer_anlage(db, anlage_id, von_jahr, von_monat, bis_jahr, bis_monat)
+    return _eauto_kpis(summen) if summen else None
 
-    pv_anteile = []
-    for aid in anlage_ids:
-        wb = await berechne_wallbox_kpis(db, aid, 2020, 1, 2099, 12)
-        if wb and wb.get("pv_anteil"):
-            pv_anteile.append(wb["pv_anteil"])
 
-    return sum(pv_anteile) / len(pv_anteile) if pv_anteile else None
+async def berechne_wallbox_kpis(
+    db: AsyncSession,
+    anlage_id: int,
+    von_jahr: int, von_monat: int,
+    bis_jahr: int, bis_monat: int,
+) -> dict | None:
+    """Berechnet Wallbox-KPIs für einen Zeitraum."""
+    summen = await _summen_einer_anlage(db, anlage_id, von_jahr, von_monat, bis_jahr, bis_monat)
+    return _wallbox_kpis(summen) if summen else None
 
 
 async def berechne_bkw_kpis(
@@ -354,237 +307,230 @@ async def berechne_bkw_kpis(
     """Berechnet Balkonkraftwerk-KPIs für einen Zeitraum."""
     if bkw_wp <= 0:
         return None
+    summen = await _summen_einer_anlage(db, anlage_id, von_jahr, von_monat, bis_jahr, bis_monat)
+    return _bkw_kpis(summen, bkw_wp) if summen else None
 
-    result = await db.execute(
-        select(
-            func.sum(Monatswert.bkw_erzeugung_kwh),
-            func.sum(Monatswert.bkw_eigenverbrauch_kwh),
-            func.count(Monatswert.id),
-        )
-        .where(Monatswert.anlage_id == anlage_id)
-        .where(
-            (Monatswert.jahr > von_jahr) |
-            ((Monatswert.jahr == von_jahr) & (Monatswert.monat >= von_monat))
-        )
-        .where(
-            (Monatswert.jahr < bis_jahr) |
-            ((Monatswert.jahr == bis_jahr) & (Monatswert.monat <= bis_monat))
-        )
-    )
-    row = result.first()
-    if not row or not row[0]:
-        return None
 
-    erzeugung, eigenverbrauch, monate = row
-    erzeugung = erzeugung or 0
-    eigenverbrauch = eigenverbrauch or 0
+# =============================================================================
+# Community-Durchschnitte der Komponenten
+# =============================================================================
 
-    if erzeugung == 0:
-        return None
+def _mittelwert(werte: list[float]) -> float | None:
+    return sum(werte) / len(werte) if werte else None
 
-    # Spez. Ertrag (auf Jahr hochrechnen)
-    kwp = bkw_wp / 1000  # Wp -> kWp
-    if monate > 0 and monate < 12:
-        jahres_erzeugung = erzeugung * (12 / monate)
-    else:
-        jahres_erzeugung = erzeugung
-
-    spez_ertrag = jahres_erzeugung / kwp if kwp > 0 else 0
-    ev_quote = (eigenverbrauch / erzeugung * 100) if erzeugung > 0 else None
-
-    return {
-        "erzeugung": round(erzeugung, 1),
-        "spez_ertrag": round(spez_ertrag, 0),
-        "eigenverbrauch_quote": round(ev_quote, 1) if ev_quote else None,
-    }
 
+def _avg_jaz(anlagen: list[Anlage], summen: dict, wp_art: str | None = None) -> float | None:
+    werte = []
+    for a in anlagen:
+        if a.hat_waermepumpe and (not wp_art or a.wp_art == wp_art) and a.id in summen:
+            wp = _wp_kpis(summen[a.id])
+            if wp and wp.get("jaz"):
+                werte.append(wp["jaz"])
+    return _mittelwert(werte)
 
-async def berechne_community_avg_bkw_spez_ertrag(db: AsyncSession) -> float | None:
-    """Berechnet den Community-Durchschnitt für BKW spez. Ertrag."""
-    result = await db.execute(
-        select(Anlage.id, Anlage.bkw_wp)
-        .where(Anlage.hat_balkonkraftwerk == True)
-        .where(Anlage.bkw_wp > 0)
-    )
-    anlagen = result.all()
 
-    if not anlagen:
-        return None
+def _avg_pv_anteil_eauto(anlagen: list[Anlage], summen: dict) -> float | None:
+    werte = []
+    for a in anlagen:
+        if a.hat_eauto and a.id in summen:
+            ea = _eauto_kpis(summen[a.id])
+            if ea and ea.get("pv_anteil"):
+                werte.append(ea["pv_anteil"])
+    return _mittelwert(werte)
 
-    spez_ertraege = []
-    for aid, bkw_wp in anlagen:
-        bkw = await berechne_bkw_kpis(db, aid, bkw_wp, 2020, 1, 2099, 12)
-        if bkw and bkw.get("spez_ertrag"):
-            spez_ertraege.append(bkw["spez_ertrag"])
 
-    return sum(spez_ertraege) / len(spez_ertraege) if spez_ertraege else None
+def _avg_pv_anteil_wallbox(anlagen: list[Anlage], summen: dict) -> float | None:
+    werte = []
+    for a in anlagen:
+        if a.hat_wallbox and a.id in summen:
+            wb = _wallbox_kpis(summen[a.id])
+            if wb and wb.get("pv_anteil"):
+                werte.append(wb["pv_anteil"])
+    return _mittelwert(werte)
 
 
-async def berechne_spez_jahresertrag(db: AsyncSession, anlage_id: int, kwp: float) -> float:
-    """Berechnet den spezifischen Jahresertrag für eine Anlage (letzte 12 Monate, hochgerechnet)."""
-    if kwp <= 0:
-        return 0
+def _avg_bkw_spez_ertrag(anlagen: list[Anlage], summen: dict) -> float | None:
+    werte = []
+    for a in anlagen:
+        if a.hat_balkonkraftwerk and a.bkw_wp and a.bkw_wp > 0 and a.id in summen:
+            bkw = _bkw_kpis(summen[a.id], a.bkw_wp)
+            if bkw and bkw.get("spez_ertrag"):
+                werte.append(bkw["spez_ertrag"])
+    return _mittelwert(werte)
 
-    monate_result = await db.execute(
-        select(Monatswert.ertrag_kwh)
-        .where(Monatswert.anlage_id == anlage_id)
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-        .limit(12)
-    )
-    ertraege = [row[0] for row in monate_result.all() if row[0] is not None]
 
-    if not ertraege:
-        return 0
+async def _alle_anlagen(db: AsyncSession) -> list[Anlage]:
+    result = await db.execute(select(Anlage).order_by(Anlage.id))
+    return list(result.scalars().all())
 
-    summe_ertrag = sum(ertraege)
-    anzahl_monate = len(ertraege)
 
-    # Auf 12 Monate hochrechnen
-    if anzahl_monate >= 6:
-        jahres_ertrag = (summe_ertrag / anzahl_monate) * 12
-    else:
-        jahres_ertrag = summe_ertrag  # Nicht genug Daten zum Hochrechnen
+async def _anlagen_mit_gesamtsummen(db: AsyncSession) -> tuple[list[Anlage], dict]:
+    return await parallel_lesen(
+        db, _alle_anlagen, lambda s: lade_komponenten_summen(s, *GESAMTER_ZEITRAUM)
+    )
 
-    return jahres_ertrag / kwp
 
+async def berechne_community_avg_jaz(db: AsyncSession, wp_art: str | None = None) -> float | None:
+    """
+    Berechnet den Community-Durchschnitt für JAZ.
 
-async def berechne_community_durchschnitt(db: AsyncSession) -> float:
-    """Berechnet den Community-Durchschnitt (alle Anlagen, letzte 12 Monate)."""
-    anlagen_result = await db.execute(select(Anlage))
-    anlagen = anlagen_result.scalars().all()
+    Args:
+        wp_art: Optional — wenn gesetzt, nur Anlagen mit gleicher WP-Art.
+    """
+    return _avg_jaz(*await _anlagen_mit_gesamtsummen(db), wp_art=wp_art)
 
-    if not anlagen:
-        return 0
 
-    jahresertraege = []
-    for anlage in anlagen:
-        spez = await berechne_spez_jahresertrag(db, anlage.id, anlage.kwp)
-        if spez > 0:
-            jahresertraege.append(spez)
+async def berechne_community_avg_pv_anteil_eauto(db: AsyncSession) -> float | None:
+    """Berechnet den Community-Durchschnitt für E-Auto PV-Anteil."""
+    return _avg_pv_anteil_eauto(*await _anlagen_mit_gesamtsummen(db))
 
-    return sum(jahresertraege) / len(jahresertraege) if jahresertraege else 0
 
+async def berechne_community_avg_pv_anteil_wallbox(db: AsyncSession) -> float | None:
+    """Berechnet den Community-Durchschnitt für Wallbox PV-Anteil."""
+    return _avg_pv_anteil_wallbox(*await _anlagen_mit_gesamtsummen(db))
 
-async def berechne_region_durchschnitt(db: AsyncSession, region: str) -> float:
-    """Berechnet den Regions-Durchschnitt."""
-    anlagen_result = await db.execute(
-        select(Anlage).where(Anlage.region == region)
-    )
-    anlagen = anlagen_result.scalars().all()
 
-    if not anlagen:
-        return 0
+async def berechne_community_avg_bkw_spez_ertrag(db: AsyncSession) -> float | None:
+    """Berechnet den Community-Durchschnitt für BKW spez. Ertrag."""
+    return _avg_bkw_spez_ertrag(*await _anlagen_mit_gesamtsummen(db))
 
-    jahresertraege = []
-    for anlage in anlagen:
-        spez = await berechne_spez_jahresertrag(db, anlage.id, anlage.kwp)
-        if spez > 0:
-            jahresertraege.append(spez)
 
-    return sum(jahresertraege) / len(jahresertraege) if jahresertraege else 0
+# =============================================================================
+# Spezifischer Jahresertrag
+# =============================================================================
 
+def _spez_jahresertrag(ertraege: list[float], kwp: float) -> float:
+    """Spez. Jahresertrag aus den (bis zu 12) jüngsten Monatserträgen."""
+    return _spez_aus_summe(sum(ertraege), len(ertraege), kwp)
 
-async def berechne_rang_und_anzahl(
-    db: AsyncSession, anlage_id: int, region: str
-) -> tuple[int, int, int, int, int, int]:
-    """Liefert (rang_gesamt, anzahl_gesamt, anzahl_mit_daten,
-                rang_region, anzahl_region, anzahl_region_mit_daten).
 
-    `anzahl_*` zählt alle Anlagen in der DB (für Submit-Confirmation).
-    `anzahl_*_mit_daten` zählt nur Anlagen mit spez_ertrag > 0
-    (für Dashboard-Anzeige 'von N'). Beide Konzepte werden parallel benötigt
-    (Original-Inkonsistenz Submit vs. Dashboard, bewusst beibehalten).
-    """
-    anzahl_result = await db.execute(select(func.count(Anlage.id)))
-    anzahl_gesamt = anzahl_result.scalar() or 1
+def _spez_aus_summe(summe_ertrag: float, anzahl_monate: int, kwp: float) -> float:
+    """Wie `_spez_jahresertrag`, aus Summe und Anzahl der Monatserträge."""
+    if kwp <= 0 or not anzahl_monate:
+        return 0
 
-    region_result = await db.execute(
-        select(func.count(Anlage.id)).where(Anlage.region == region)
-    )
-    anzahl_region = region_result.scalar() or 1
+    # Auf 12 Monate hochrechnen
+    if anzahl_monate >= 6:
+        jahres_ertrag = (summe_ertrag / anzahl_monate) * 12
+    else:
+        jahres_ertrag = summe_ertrag  # Nicht genug Daten zum Hochrechnen
 
-    alle_result = await db.execute(select(Anlage))
-    alle = alle_result.scalars().all()
+    return jahres_ertrag / kwp
 
-    ertraege_alle: list[tuple[int, float]] = []
-    ertraege_region: list[tuple[int, float]] = []
-    for a in alle:
-        spez = await berechne_spez_jahresertrag(db, a.id, a.kwp)
-        if spez > 0:
-            ertraege_alle.append((a.id, spez))
-            if a.region == region:
-                ertraege_region.append((a.id, spez))
 
-    ertraege_alle.sort(key=lambda x: x[1], reverse=True)
-    ertraege_region.sort(key=lambda x: x[1], reverse=True)
+def _letzte_12_monate():
+    """Monatswerte mit `rang` je Anlage, 1 = jüngster; Grundlage des spez. Ertrags."""
+    rang = func.row_number().over(
+        partition_by=Monatswert.anlage_id,
+        order_by=Monatswert.periode.desc(),
+    ).label("rang")
+    return select(Monatswert.anlage_id, Monatswert.ertrag_kwh, rang).subquery()
 
-    rang_gesamt = next(
-        (i + 1 for i, (aid, _) in enumerate(ertraege_alle) if aid == anlage_id),
-        1,
-    )
-    rang_region = next(
-        (i + 1 for i, (aid, _) in enumerate(ertraege_region) if aid == anlage_id),
-        1,
-    )
 
-    return (rang_gesamt, anzahl_gesamt, len(ertraege_alle),
-            rang_region, anzahl_region, len(ertraege_region))
+# =============================================================================
+# Anlagen-Benchmark (einzeln und gebündelt)
+# =============================================================================
 
+@dataclass
+class BenchmarkBasis:
+    """Community-Grundlage der Anlagen-Benchmarks, einmal je Anfrage geladen.
 
-@router.get("/anlage/{anlage_hash}")
-async def get_anlage_benchmark(
-    anlage_hash: str,
-    zeitraum: ZeitraumTyp = Query("letzte_12_monate", description="Vergleichszeitraum"),
-    jahr: int | None = Query(None, ge=2010, le=2050, description="Jahr für zeitraum=jahr oder zeitraum=monat"),
-    monat: int | None = Query(None, ge=1, le=12, description="Monat für zeitraum=monat"),
-    db: AsyncSession = Depends(get_db),
-):
+    Gleiche Semantik wie die `berechne_community_avg_*`-Helper, dazu
+    Durchschnitt, Rang und Anzahl des spez. Ertrags für Dashboard und
+    Submit-Bestätigung — ohne Abfrage je Anlage.
     """
-    Liefert Vergleichsdaten für eine bestimmte Anlage.
-    Der Hash identifiziert die Anlage ohne sensible Daten preiszugeben.
-
-    Zeitraum-Optionen:
-    - letzter_monat: Nur der Vormonat
-    - letzte_12_monate: Die letzten 12 abgeschlossenen Monate (Standard)
-    - monat: Ein bestimmter Monat (Parameter 'jahr' und 'monat' erforderlich)
-    - jahr: Ein bestimmtes Jahr (Parameter 'jahr' erforderlich)
-    - seit_installation: Alle Daten seit Installationsjahr
+    spez_ertrag: dict[int, float]  # anlage_id → spez. Jahresertrag (0 ohne Daten)
+    region: dict[int, str]
+    jaz: float | None
+    jaz_je_art: dict[str, float | None]
+    pv_anteil_eauto: float | None
+    pv_anteil_wallbox: float | None
+    bkw_spez_ertrag: float | None
+    # Rangliste je Region (None = gesamt): anlage_id → Rang unter den Anlagen mit Daten
+    _raenge: dict[str | None, dict[int, int]] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        mit_daten = sorted(
+            ((aid, spez) for aid, spez in self.spez_ertrag.items() if spez > 0),
+            key=lambda x: x[1], reverse=True,
+        )
+        self._raenge[None] = {aid: i + 1 for i, (aid, _) in enumerate(mit_daten)}
+        je_region: dict[str, list[int]] = defaultdict(list)
+        for aid, _ in mit_daten:
+            je_region[self.region[aid]].append(aid)
+        for region, ids in je_region.items():
+            self._raenge[region] = {aid: i + 1 for i, aid in enumerate(ids)}
+
+    def durchschnitt(self, region: str | None = None) -> float:
+        werte = [
+            spez for aid, spez in self.spez_ertrag.items()
+            if spez > 0 and (region is None or self.region[aid] == region)
+        ]
+        return sum(werte) / len(werte) if werte else 0
+
+    def rang(self, anlage_id: int, region: str | None = None) -> tuple[int, int]:
+        """(Rang, Anzahl Anlagen mit Daten); ohne eigene Daten Rang 1."""
+        raenge = self._raenge.get(region, {})
+        return raenge.get(anlage_id, 1), len(raenge)
+
+    def anzahl(self, region: str | None = None) -> int:
+        """Anzahl aller Anlagen, auch ohne Daten (Submit-Bestätigung 'von N')."""
+        if region is None:
+            return len(self.region)
+        return sum(1 for r in self.region.values() if r == region)
+
+
+async def lade_benchmark_basis(db: AsyncSession) -> BenchmarkBasis:
+    """Spez. Erträge aller Anlagen und Komponenten-Durchschnitte in drei Abfragen.
+
+    Die drei sind unabhängig voneinander und laufen nebenläufig (core/parallel.py).
     """
-    result = await db.execute(
-        select(Anlage).where(Anlage.anlage_hash == anlage_hash)
-    )
-    anlage = result.scalar_one_or_none()
-
-    if not anlage:
-        raise HTTPException(status_code=404, detail="Anlage nicht gefunden")
-
-    # Zeitraum-Filter bestimmen
-    von_jahr, von_monat, bis_jahr, bis_monat = get_zeitraum_filter(
-        zeitraum, jahr, monat, anlage.installation_jahr
+    letzte = _letzte_12_monate()
+    anlagen, gesamtsummen, letzte_ertraege = await parallel_lesen(
+        db,
+        _alle_anlagen,
+        lambda s: lade_komponenten_summen(s, *GESAMTER_ZEITRAUM),
+        zeilen(
+            select(letzte.c.anlage_id, letzte.c.ertrag_kwh)
+            .where(letzte.c.rang <= 12)
+            .order_by(letzte.c.anlage_id, letzte.c.rang)
+        ),
     )
-
-    # Monatswerte laden
-    result = await db.execute(
-        select(Monatswert)
-        .where(Monatswert.anlage_id == anlage.id)
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
+    ertraege: dict[int, list[float]] = defaultdict(list)
+    for anlage_id, ertrag in letzte_ertraege:
+        if ertrag is not None:
+            ertraege[anlage_id].append(ertrag)
+
+    wp_arten = {a.wp_art for a in anlagen if a.hat_waermepumpe and a.wp_art}
+    return BenchmarkBasis(
+        spez_ertrag={a.id: _spez_jahresertrag(ertraege.get(a.id, []), a.kwp) for a in anlagen},
+        region={a.id: a.region for a in anlagen},
+        jaz=_avg_jaz(anlagen, gesamtsummen),
+        jaz_je_art={art: _avg_jaz(anlagen, gesamtsummen, wp_art=art) for art in wp_arten},
+        pv_anteil_eauto=_avg_pv_anteil_eauto(anlagen, gesamtsummen),
+        pv_anteil_wallbox=_avg_pv_anteil_wallbox(anlagen, gesamtsummen),
+        bkw_spez_ertrag=_avg_bkw_spez_ertrag(anlagen, gesamtsummen),
     )
-    monatswerte = result.scalars().all()
 
-    # Spez. Jahresertrag der Anlage (letzte 12 Monate, hochgerechnet)
-    spez_ertrag_anlage = await berechne_spez_jahresertrag(db, anlage.id, anlage.kwp)
 
-    # Community-Durchschnitt
-    spez_ertrag_durchschnitt = await berechne_community_durchschnitt(db)
-
-    # Regions-Durchschnitt
-    spez_ertrag_region = await berechne_region_durchschnitt(db, anlage.region)
-
-    # Rang + Anzahl (SoT-Helper, identisch zur Submit-Confirmation)
-    (rang_gesamt, anzahl_gesamt, anzahl_mit_daten,
-     rang_region, anzahl_region, anzahl_region_mit_daten) = await berechne_rang_und_anzahl(
-        db, anlage.id, anlage.region
-    )
+def _anlage_vergleich(
+    anlage: Anlage,
+    monatswerte: list[Monatswert],
+    summen,
+    basis: BenchmarkBasis,
+    zeitraum_filter: tuple[int, int, int, int],
+    zeitraum: ZeitraumTyp,
+    jahr: int | None,
+    monat: int | None,
+) -> dict:
+    """Benchmark einer Anlage aus vorab geladenen Daten (ohne DB-Zugriff)."""
+    _, _, bis_jahr, bis_monat = zeitraum_filter
+
+    spez_ertrag_anlage = basis.spez_ertrag.get(anlage.id, 0)
+    spez_ertrag_durchschnitt = basis.durchschnitt()
+    spez_ertrag_region = basis.durchschnitt(anlage.region)
+    rang_gesamt, anzahl_mit_daten = basis.rang(anlage.id)
+    rang_region, anzahl_region_mit_daten = basis.rang(anlage.id, anlage.region)
 
     # Monatswerte mit spez. Ertrag anreichern
     monatswerte_output = [
@@ -621,9 +567,6 @@ async def get_anlage_benchmark(
         for mw in monatswerte
     ]
 
-    # Erweiterte Komponenten-Benchmarks berechnen
-    erweiterte_benchmarks = None
-
     # PV-Benchmark (immer vorhanden)
     pv_benchmark = PVBenchmark(
         spez_ertrag=KPIVergleich(
@@ -636,11 +579,8 @@ async def get_anlage_benchmark(
 
     # Speicher-Benchmark
     speicher_benchmark = None
-    if anlage.speicher_kwh and anlage.speicher_kwh > 0:
-        speicher_kpis = await berechne_speicher_kpis(
-            db, anlage.id, anlage.speicher_kwh,
-            von_jahr, von_monat, bis_jahr, bis_monat
-        )
+    if anlage.speicher_kwh and anlage.speicher_kwh > 0 and summen:
+        speicher_kpis = _speicher_kpis(summen, anlage.speicher_kwh)
         if speicher_kpis:
             speicher_benchmark = SpeicherBenchmark(
                 kapazitaet=KPIVergleich(wert=anlage.speicher_kwh),
@@ -651,14 +591,13 @@ async def get_anlage_benchmark(
 
     # Wärmepumpe-Benchmark
     wp_benchmark = None
-    if anlage.hat_waermepumpe:
-        wp_kpis = await berechne_wp_kpis(db, anlage.id, von_jahr, von_monat, bis_jahr, bis_monat)
+    if anlage.hat_waermepumpe and summen:
+        wp_kpis = _wp_kpis(summen)
         if wp_kpis:
-            community_jaz = await berechne_community_avg_jaz(db)
             # Typ-spezifischer JAZ-Vergleich (nur mit gleicher WP-Art)
             jaz_typ_vergleich = None
             if anlage.wp_art and wp_kpis.get("jaz"):
-                community_jaz_typ = await berechne_community_avg_jaz(db, wp_art=anlage.wp_art)
+                community_jaz_typ = basis.jaz_je_art.get(anlage.wp_art)
                 if community_jaz_typ is not None:
                     jaz_typ_vergleich = KPIVergleich(
                         wert=wp_kpis["jaz"],
@@ -667,7 +606,7 @@ async def get_anlage_benchmark(
             wp_benchmark = WaermepumpeBenchmark(
                 jaz=KPIVergleich(
                     wert=wp_kpis["jaz"],
-                    community_avg=community_jaz,
+                    community_avg=basis.jaz,
                 ) if wp_kpis.get("jaz") else None,
                 jaz_typ=jaz_typ_vergleich,
                 wp_art=anlage.wp_art,
@@ -677,10 +616,10 @@ async def get_anlage_benchmark(
 
     # E-Auto-Benchmark
     eauto_benchmark = None
-    if anlage.hat_eauto:
-        eauto_kpis = await berechne_eauto_kpis(db, anlage.id, von_jahr, von_monat, bis_jahr, bis_monat)
+    if anlage.hat_eauto and summen:
+        eauto_kpis = _eauto_kpis(summen)
         if eauto_kpis:
-            community_pv_anteil = await berechne_community_avg_pv_anteil_eauto(db)
+            community_pv_anteil = basis.pv_anteil_eauto
             eauto_benchmark = EAutoBenchmark(
                 ladung_gesamt=KPIVergleich(wert=eauto_kpis["ladung_gesamt"]) if eauto_kpis.get("ladung_gesamt") else None,
                 pv_anteil=KPIVergleich(
@@ -694,10 +633,10 @@ async def get_anlage_benchmark(
 
     # Wallbox-Benchmark
     wallbox_benchmark = None
-    if anlage.hat_wallbox:
-        wallbox_kpis = await berechne_wallbox_kpis(db, anlage.id, von_jahr, von_monat, bis_jahr, bis_monat)
+    if anlage.hat_wallbox and summen:
+        wallbox_kpis = _wallbox_kpis(summen)
         if wallbox_kpis:
-            community_pv_anteil_wb = await berechne_community_avg_pv_anteil_wallbox(db)
+            community_pv_anteil_wb = basis.pv_anteil_wallbox
             wallbox_benchmark = WallboxBenchmark(
                 ladung=KPIVergleich(wert=wallbox_kpis["ladung"]) if wallbox_kpis.get("ladung") else None,
                 pv_anteil=KPIVergleich(
@@ -709,10 +648,10 @@ async def get_anlage_benchmark(
 
     # Balkonkraftwerk-Benchmark
     bkw_benchmark = None
-    if anlage.hat_balkonkraftwerk and anlage.bkw_wp and anlage.bkw_wp > 0:
-        bkw_kpis = await berechne_bkw_kpis(db, anlage.id, anlage.bkw_wp, von_jahr, von_monat, bis_jahr, bis_monat)
+    if anlage.hat_balkonkraftwerk and anlage.bkw_wp and anlage.bkw_wp > 0 and summen:
+        bkw_kpis = _bkw_kpis(summen, anlage.bkw_wp)
         if bkw_kpis:
-            community_spez_ertrag_bkw = await berechne_community_avg_bkw_spez_ertrag(db)
+            community_spez_ertrag_bkw = basis.bkw_spez_ertrag
             bkw_benchmark = BKWBenchmark(
                 erzeugung=KPIVergleich(wert=bkw_kpis["erzeugung"]) if bkw_kpis.get("erzeugung") else None,
                 spez_ertrag=KPIVergleich(
@@ -775,177 +714,327 @@ async def get_anlage_benchmark(
     }
 
 
+async def _monatswerte_der_anlagen(db: AsyncSession, ids: list[int]) -> list[Monatswert]:
+    result = await db.execute(
+        select(Monatswert)
+        .where(Monatswert.anlage_id.in_(ids))
+        .order_by(Monatswert.anlage_id, Monatswert.periode.desc())
+    )
+    return list(result.scalars().all())
+
+
+async def benchmark_fuer_anlagen(
+    db: AsyncSession,
+    anlagen: list[Anlage],
+    zeitraum: ZeitraumTyp,
+    jahr: int | None = None,
+    monat: int | None = None,
+) -> dict[int, dict]:
+    """Benchmarks mehrerer Anlagen (anlage_id → Ergebnis).
+
+    Die Community-Grundlage wird einmal geladen, Monatswerte und Komponenten-
+    Summen aller Anlagen je eine gruppierte Abfrage — die Zahl der Abfragen
+    hängt nicht von der Zahl der Anlagen ab. Alle Teile laufen nebenläufig.
+    """
+    if not anlagen:
+        return {}
+    ids = [a.id for a in anlagen]
+
+    # Der Zeitraum unterscheidet sich nur bei seit_installation je Anlage
+    zeitraeume = {
+        a.id: get_zeitraum_filter(zeitraum, jahr, monat, a.installation_jahr) for a in anlagen
+    }
+    zeitraum_filter = list(set(zeitraeume.values()))
+
+    def _summen(zf: tuple[int, int, int, int]):
+        return lambda s: lade_komponenten_summen(
+            s, *zf, anlage_ids=[aid for aid, z in zeitraeume.items() if z == zf],
+        )
+
+    basis, alle_monatswerte, *summen_je_zeitraum = await parallel_lesen(
+        db,
+        lade_benchmark_basis,
+        lambda s: _monatswerte_der_anlagen(s, ids),
+        *(_summen(zf) for zf in zeitraum_filter),
+    )
+    monatswerte: dict[int, list[Monatswert]] = defaultdict(list)
+    for mw in alle_monatswerte:
+        monatswerte[mw.anlage_id].append(mw)
+    summen: dict[int, Any] = {}
+    for teil in summen_je_zeitraum:
+        summen.update(teil)
+
+    return {
+        a.id: _anlage_vergleich(
+            a, monatswerte[a.id], summen.get(a.id), basis,
+            zeitraeume[a.id], zeitraum, jahr, monat,
+        )
+        for a in anlagen
+    }
+
+
+@router.get("/anlage/{anlage_hash}")
+async def get_anlage_benchmark(
+    anlage_hash: str,
+    zeitraum: ZeitraumTyp = Query("letzte_12_monate", description="Vergleichszeitraum"),
+    jahr: int | None = Query(None, ge=2010, le=2050, description="Jahr für zeitraum=jahr oder zeitraum=monat"),
+    monat: int | None = Query(None, ge=1, le=12, description="Monat für zeitraum=monat"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Liefert Vergleichsdaten für eine bestimmte Anlage.
+    Der Hash identifiziert die Anlage ohne sensible Daten preiszugeben.
+
+    Zeitraum-Optionen:
+    - letzter_monat: Nur der Vormonat
+    - letzte_12_monate: Die letzten 12 abgeschlossenen Monate (Standard)
+    - monat: Ein bestimmter Monat (Parameter 'jahr' und 'monat' erforderlich)
+    - jahr: Ein bestimmtes Jahr (Parameter 'jahr' erforderlich)
+    - seit_installation: Alle Daten seit Installationsjahr
+    """
+    result = await db.execute(
+        select(Anlage).where(Anlage.anlage_hash == anlage_hash)
+    )
+    anlage = result.scalar_one_or_none()
+
+    if not anlage:
+        raise HTTPException(status_code=404, detail="Anlage nicht gefunden")
+
+    ergebnisse = await benchmark_fuer_anlagen(db, [anlage], zeitraum, jahr, monat)
+    return ergebnisse[anlage.id]
+
+
+@router.post("/anlagen", response_model=BatchBenchmarkAntwort)
+async def post_anlagen_benchmark(
+    anfrage: BatchBenchmarkAnfrage,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Vergleichsdaten für mehrere Anlagen in einem Aufruf.
+
+    Je gefundenem Hash dasselbe Ergebnis wie `/api/benchmark/anlage/{hash}`;
+    unbekannte Hashes stehen in `nicht_gefunden`. Doppelte Hashes werden
+    einmal beantwortet.
+    """
+    hashes = list(dict.fromkeys(anfrage.anlage_hashes))
+    result = await db.execute(
+        select(Anlage).where(Anlage.anlage_hash.in_(hashes))
+    )
+    anlagen = {a.anlage_hash: a for a in result.scalars().all()}
+
+    ergebnisse = await benchmark_fuer_anlagen(
+        db, list(anlagen.values()), anfrage.zeitraum, anfrage.jahr, anfrage.monat
+    )
+    return BatchBenchmarkAntwort(
+        zeitraum=anfrage.zeitraum,
+        anlagen={h: ergebnisse[anlagen[h].id] for h in hashes if h in anlagen},
+        nicht_gefunden=[h for h in hashes if h not in anlagen],
+    )
+
+
+#: KPIs des Monatsvergleichs: (Feld in `MonatsVergleich`, Wert-Ausdruck, Filter).
+#: Der Filter entscheidet, welche Anlagen in den KPI eingehen — er ist
+#: deckungsgleich mit den Bedingungen der früheren Python-Schleife
+#: (z. B. JAZ nur bei Strom > 0 UND Wärme > 0).
+_WP_WAERME = (
+    func.coalesce(Monatswert.wp_heizwaerme_kwh, 0)
+    + func.coalesce(Monatswert.wp_warmwasser_kwh, 0)
+)
+_HAT_SPEZ = Monatswert.ertrag_kwh.isnot(None) & (Anlage.kwp > 0)
+_HAT_WP = (Monatswert.wp_stromverbrauch_kwh > 0) & (_WP_WAERME > 0)
+
+MONATS_KPIS = [
+    ("spez_ertrag", Monatswert.ertrag_kwh / Anlage.kwp, _HAT_SPEZ),
+    ("autarkie", Monatswert.autarkie_prozent, Monatswert.autarkie_prozent.isnot(None)),
+    ("eigenverbrauch", Monatswert.eigenverbrauch_prozent, Monatswert.eigenverbrauch_prozent.isnot(None)),
+    ("einspeisung", Monatswert.einspeisung_kwh, Monatswert.einspeisung_kwh.isnot(None)),
+    ("netzbezug", Monatswert.netzbezug_kwh, Monatswert.netzbezug_kwh.isnot(None)),
+    ("speicher_ladung", Monatswert.speicher_ladung_kwh, Monatswert.speicher_ladung_kwh.isnot(None)),
+    ("speicher_entladung", Monatswert.speicher_entladung_kwh, Monatswert.speicher_entladung_kwh.isnot(None)),
+    (
+        "speicher_wirkungsgrad",
+        Monatswert.speicher_entladung_kwh / Monatswert.speicher_ladung_kwh * 100,
+        (Monatswert.speicher_ladung_kwh > 0) & Monatswert.speicher_entladung_kwh.isnot(None),
+    ),
+    ("wp_stromverbrauch", Monatswert.wp_stromverbrauch_kwh, Monatswert.wp_stromverbrauch_kwh > 0),
+    ("wp_waerme", _WP_WAERME, _HAT_WP),
+    ("wp_jaz", _WP_WAERME / Monatswert.wp_stromverbrauch_kwh, _HAT_WP),
+    ("eauto_ladung", Monatswert.eauto_ladung_gesamt_kwh, Monatswert.eauto_ladung_gesamt_kwh > 0),
+    (
+        "eauto_pv_anteil",
+        Monatswert.eauto_ladung_pv_kwh / Monatswert.eauto_ladung_gesamt_kwh * 100,
+        (Monatswert.eauto_ladung_gesamt_kwh > 0) & Monatswert.eauto_ladung_pv_kwh.isnot(None),
+    ),
+    ("eauto_km", Monatswert.eauto_km, Monatswert.eauto_km > 0),
+    ("wallbox_ladung", Monatswert.wallbox_ladung_kwh, Monatswert.wallbox_ladung_kwh > 0),
+    (
+        "wallbox_pv_anteil",
+        Monatswert.wallbox_ladung_pv_kwh / Monatswert.wallbox_ladung_kwh * 100,
+        (Monatswert.wallbox_ladung_kwh > 0) & Monatswert.wallbox_ladung_pv_kwh.isnot(None),
+    ),
+    ("bkw_erzeugung", Monatswert.bkw_erzeugung_kwh, Monatswert.bkw_erzeugung_kwh > 0),
+]
+
+
+def _monats_kpi_spalten() -> list:
+    """Aggregat-Spalten (n, avg, median, min, max) je KPI, alle per FILTER."""
+    spalten = []
+    for name, wert, bedingung in MONATS_KPIS:
+        spalten += [
+            func.count().filter(bedingung).label(f"{name}_n"),
+            func.avg(wert).filter(bedingung).label(f"{name}_avg"),
+            func.percentile_cont(0.5).within_group(wert).filter(bedingung).label(f"{name}_median"),
+            func.min(wert).filter(bedingung).label(f"{name}_min"),
+            func.max(wert).filter(bedingung).label(f"{name}_max"),
+        ]
+    return spalten
+
+
 @router.get("/monat/{jahr}/{monat}", response_model=MonatsVergleich)
 async def get_monats_benchmark(
     jahr: int,
     monat: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert Community-Durchschnitte aller KPIs für einen bestimmten Monat.
     Ermöglicht Monats-Vergleiche: "Wie war der Februar 2026 in der Community?"
+
+    Punktabfrage auf den Monats-Rollup (`community_monat`): die Regionen-
+    Buckets des Monats werden gelesen und für die Gesamtwerte vereinigt.
     """
     if monat < 1 or monat > 12:
         raise HTTPException(status_code=400, detail="Monat muss zwischen 1 und 12 liegen")
 
-    # Alle Monatswerte für diesen Monat mit Anlagendaten laden
+    vergleich = await berechne_monats_vergleich(db, jahr, monat)
+    if vergleich is None:
+        raise HTTPException(status_code=404, detail=f"Keine Daten für {monat:02d}/{jahr}")
+    return vergleich
+
+
+async def berechne_monats_vergleich(db: AsyncSession, jahr: int, monat: int) -> MonatsVergleich | None:
+    """Monatsvergleich aus dem Rollup. `None`, wenn der Monat keine Daten hat."""
+    from api.rollup import lade_buckets, vereinigte_kpis
+
+    buckets = await lade_buckets(db, [(jahr, monat)])
+    if not buckets:
+        return None
+
+    regionen = []
+    for bucket in buckets:  # nach Region sortiert
+        region_kpis = vereinigte_kpis([bucket])
+        spez = region_kpis.get("spez_ertrag")
+        if not spez:
+            continue
+        autarkie = region_kpis.get("autarkie")
+        regionen.append(MonatsRegionVergleich(
+            region=bucket.region,
+            anzahl_anlagen=spez.n,
+            spez_ertrag=round(spez.durchschnitt, 1),
+            autarkie=round(autarkie.durchschnitt, 1) if autarkie else None,
+        ))
+
+    gesamt = vereinigte_kpis(buckets)
+    kpis = {}
+    for name, _, _ in MONATS_KPIS:
+        kz = gesamt.get(name)
+        kpis[name] = (
+            _make_monats_kpi(kz.n, kz.durchschnitt, kz.median, kz.minimum, kz.maximum)
+            if kz else None
+        )
+
+    return MonatsVergleich(
+        jahr=jahr,
+        monat=monat,
+        anzahl_anlagen=sum(b.anzahl_anlagen for b in buckets),
+        **kpis,
+        regionen=regionen if regionen else None,
+    )
+
+
+async def berechne_monats_vergleich_live(db: AsyncSession, jahr: int, monat: int) -> MonatsVergleich | None:
+    """Monatsvergleich direkt aus den Rohdaten — Referenz für den Rollup.
+
+    Ein einziger Roundtrip: alle KPIs werden in SQL aggregiert (FILTER je KPI,
+    Median per `percentile_cont`), die Regionen kommen über GROUPING SETS aus
+    derselben Abfrage. Der Speicherbedarf hängt nicht von der Zahl der Anlagen
+    ab. Wird von `python manage.py rollup pruefen` gegen den Rollup verglichen.
+    """
     result = await db.execute(
-        select(Monatswert, Anlage)
-        .join(Anlage)
+        select(
+            func.grouping(Anlage.region).label("ist_gesamt"),
+            Anlage.region,
+            func.count().label("anzahl"),
+            func.avg(Monatswert.autarkie_prozent).filter(
+                _HAT_SPEZ & Monatswert.autarkie_prozent.isnot(None)
+            ).label("region_autarkie"),
+            *_monats_kpi_spalten(),
+        )
+        .select_from(Monatswert)
+        .join(Anlage, Monatswert.anlage_id == Anlage.id)
         .where(Monatswert.jahr == jahr)
         .where(Monatswert.monat == monat)
+        .group_by(func.grouping_sets(tuple_(), tuple_(Anlage.region)))
     )
     rows = result.all()
 
-    if not rows:
-        raise HTTPException(status_code=404, detail=f"Keine Daten für {monat:02d}/{jahr}")
-
-    anzahl = len(rows)
-
-    # --- PV-Kern-KPIs ---
-    spez_ertraege = []
-    autarkien = []
-    eigenverbrauch_werte = []
-    einspeisungen = []
-    netzbezuege = []
-
-    # --- Speicher ---
-    sp_ladung_werte = []
-    sp_entladung_werte = []
-    sp_wirkungsgrad_werte = []
-
-    # --- Wärmepumpe ---
-    wp_strom_werte = []
-    wp_waerme_werte = []
-    wp_jaz_werte = []
-
-    # --- E-Auto ---
-    eauto_ladung_werte = []
-    eauto_pv_anteil_werte = []
-    eauto_km_werte = []
-
-    # --- Wallbox ---
-    wb_ladung_werte = []
-    wb_pv_anteil_werte = []
-
-    # --- BKW ---
-    bkw_erzeugung_werte = []
-
-    # --- Regional ---
-    region_daten: dict[str, list[dict]] = {}
-
-    for mw, anlage in rows:
-        # Spez. Ertrag
-        if mw.ertrag_kwh is not None and anlage.kwp and anlage.kwp > 0:
-            spez = mw.ertrag_kwh / anlage.kwp
-            spez_ertraege.append(spez)
-
-            # Regional sammeln
-            if anlage.region not in region_daten:
-                region_daten[anlage.region] = []
-            region_daten[anlage.region].append({
-                "spez": spez,
-                "autarkie": mw.autarkie_prozent,
-            })
-
-        if mw.autarkie_prozent is not None:
-            autarkien.append(mw.autarkie_prozent)
-        if mw.eigenverbrauch_prozent is not None:
-            eigenverbrauch_werte.append(mw.eigenverbrauch_prozent)
-        if mw.einspeisung_kwh is not None:
-            einspeisungen.append(mw.einspeisung_kwh)
-        if mw.netzbezug_kwh is not None:
-            netzbezuege.append(mw.netzbezug_kwh)
-
-        # Speicher
-        if mw.speicher_ladung_kwh is not None:
-            sp_ladung_werte.append(mw.speicher_ladung_kwh)
-        if mw.speicher_entladung_kwh is not None:
-            sp_entladung_werte.append(mw.speicher_entladung_kwh)
-        if (mw.speicher_ladung_kwh and mw.speicher_ladung_kwh > 0
-                and mw.speicher_entladung_kwh is not None):
-            sp_wirkungsgrad_werte.append(
-                mw.speicher_entladung_kwh / mw.speicher_ladung_kwh * 100
-            )
-
-        # Wärmepumpe
-        if mw.wp_stromverbrauch_kwh is not None and mw.wp_stromverbrauch_kwh > 0:
-            wp_strom_werte.append(mw.wp_stromverbrauch_kwh)
-            waerme = (mw.wp_heizwaerme_kwh or 0) + (mw.wp_warmwasser_kwh or 0)
-            if waerme > 0:
-                wp_waerme_werte.append(waerme)
-                wp_jaz_werte.append(waerme / mw.wp_stromverbrauch_kwh)
-
-        # E-Auto
-        if mw.eauto_ladung_gesamt_kwh is not None and mw.eauto_ladung_gesamt_kwh > 0:
-            eauto_ladung_werte.append(mw.eauto_ladung_gesamt_kwh)
-            if mw.eauto_ladung_pv_kwh is not None:
-                eauto_pv_anteil_werte.append(
-                    mw.eauto_ladung_pv_kwh / mw.eauto_ladung_gesamt_kwh * 100
-                )
-        if mw.eauto_km is not None and mw.eauto_km > 0:
-            eauto_km_werte.append(mw.eauto_km)
-
-        # Wallbox
-        if mw.wallbox_ladung_kwh is not None and mw.wallbox_ladung_kwh > 0:
-            wb_ladung_werte.append(mw.wallbox_ladung_kwh)
-            if mw.wallbox_ladung_pv_kwh is not None:
-                wb_pv_anteil_werte.append(
-                    mw.wallbox_ladung_pv_kwh / mw.wallbox_ladung_kwh * 100
-                )
-
-        # BKW
-        if mw.bkw_erzeugung_kwh is not None and mw.bkw_erzeugung_kwh > 0:
-            bkw_erzeugung_werte.append(mw.bkw_erzeugung_kwh)
+    gesamt = next((r for r in rows if r.ist_gesamt), None)
+    if gesamt is None or not gesamt.anzahl:
+        return None
 
     # --- Regionale Aufschlüsselung ---
-    regionen = []
-    for region, daten in sorted(region_daten.items()):
-        if len(daten) >= 1:
-            spez_values = [d["spez"] for d in daten]
-            autarkie_values = [d["autarkie"] for d in daten if d["autarkie"] is not None]
-            regionen.append(MonatsRegionVergleich(
-                region=region,
-                anzahl_anlagen=len(daten),
-                spez_ertrag=round(sum(spez_values) / len(spez_values), 1),
-                autarkie=round(sum(autarkie_values) / len(autarkie_values), 1) if autarkie_values else None,
-            ))
+    regionen = [
+        MonatsRegionVergleich(
+            region=r.region,
+            anzahl_anlagen=r.spez_ertrag_n,
+            spez_ertrag=round(r.spez_ertrag_avg, 1),
+            autarkie=round(r.region_autarkie, 1) if r.region_autarkie is not None else None,
+        )
+        for r in sorted((r for r in rows if not r.ist_gesamt), key=lambda r: r.region)
+        if r.spez_ertrag_n
+    ]
+
+    kpis = {
+        name: _make_monats_kpi(
+            getattr(gesamt, f"{name}_n"),
+            getattr(gesamt, f"{name}_avg"),
+            getattr(gesamt, f"{name}_median"),
+            getattr(gesamt, f"{name}_min"),
+            getattr(gesamt, f"{name}_max"),
+        )
+        for name, _, _ in MONATS_KPIS
+    }
 
     return MonatsVergleich(
         jahr=jahr,
         monat=monat,
-        anzahl_anlagen=anzahl,
-        spez_ertrag=_make_monats_kpi(spez_ertraege),
-        autarkie=_make_monats_kpi(autarkien) if autarkien else None,
-        eigenverbrauch=_make_monats_kpi(eigenverbrauch_werte) if eigenverbrauch_werte else None,
-        einspeisung=_make_monats_kpi(einspeisungen) if einspeisungen else None,
-        netzbezug=_make_monats_kpi(netzbezuege) if netzbezuege else None,
-        speicher_ladung=_make_monats_kpi(sp_ladung_werte) if sp_ladung_werte else None,
-        speicher_entladung=_make_monats_kpi(sp_entladung_werte) if sp_entladung_werte else None,
-        speicher_wirkungsgrad=_make_monats_kpi(sp_wirkungsgrad_werte) if sp_wirkungsgrad_werte else None,
-        wp_stromverbrauch=_make_monats_kpi(wp_strom_werte) if wp_strom_werte else None,
-        wp_waerme=_make_monats_kpi(wp_waerme_werte) if wp_waerme_werte else None,
-        wp_jaz=_make_monats_kpi(wp_jaz_werte) if wp_jaz_werte else None,
-        eauto_ladung=_make_monats_kpi(eauto_ladung_werte) if eauto_ladung_werte else None,
-        eauto_pv_anteil=_make_monats_kpi(eauto_pv_anteil_werte) if eauto_pv_anteil_werte else None,
-        eauto_km=_make_monats_kpi(eauto_km_werte) if eauto_km_werte else None,
-        wallbox_ladung=_make_monats_kpi(wb_ladung_werte) if wb_ladung_werte else None,
-        wallbox_pv_anteil=_make_monats_kpi(wb_pv_anteil_werte) if wb_pv_anteil_werte else None,
-        bkw_erzeugung=_make_monats_kpi(bkw_erzeugung_werte) if bkw_erzeugung_werte else None,
+        anzahl_anlagen=gesamt.anzahl,
+        **kpis,
         regionen=regionen if regionen else None,
     )
 
 
-def _make_monats_kpi(werte: list[float]) -> MonatsKPI:
-    """Erstellt ein MonatsKPI-Objekt aus einer Liste von Werten."""
-    from statistics import median as stat_median
-    werte_sorted = sorted(werte)
+def _make_monats_kpi(
+    anzahl: int,
+    durchschnitt: float | None,
+    median: float | None,
+    minimum: float | None,
+    maximum: float | None,
+) -> MonatsKPI | None:
+    """Erstellt ein MonatsKPI-Objekt aus den SQL-Aggregaten eines KPI.
+
+    Ohne Werte gibt es keinen KPI (`None`). Median, Min und Max erst ab drei
+    Anlagen — darunter wären sie die Werte einzelner Teilnehmer.
+    """
+    if not anzahl:
+        return None
+    genug = anzahl >= 3
     return MonatsKPI(
-        durchschnitt=round(sum(werte) / len(werte), 1),
-        median=round(stat_median(werte), 1) if len(werte) >= 3 else None,
-        min=round(werte_sorted[0], 1) if len(werte) >= 3 else None,
-        max=round(werte_sorted[-1], 1) if len(werte) >= 3 else None,
-        anzahl_anlagen=len(werte),
+        durchschnitt=round(durchschnitt, 1),
+        median=round(median, 1) if genug else None,
+        min=round(minimum, 1) if genug else None,
+        max=round(maximum, 1) if genug else None,
+        anzahl_anlagen=anzahl,
     )
 
 
@@ -953,7 +1042,7 @@ def _make_monats_kpi(werte: list[float]) -> MonatsKPI:
 async def get_vergleich(
     kwp: float = Query(..., gt=0, le=100),
     region: str = Query(..., min_length=2, max_length=2),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert Vergleichsdaten für eine Anlage ohne sie zu speichern.
@@ -963,12 +1052,19 @@ async def get_vergleich(
     kwp_min = kwp * 0.7
     kwp_max = kwp * 1.3
 
+    # Eine Abfrage: Summe und Anzahl der 12 jüngsten Monatserträge je Anlage
+    letzte = _letzte_12_monate()
     anlagen_result = await db.execute(
-        select(Anlage)
+        select(
+            Anlage.region, Anlage.kwp,
+            func.sum(letzte.c.ertrag_kwh), func.count(letzte.c.ertrag_kwh),
+        )
+        .outerjoin(letzte, and_(letzte.c.anlage_id == Anlage.id, letzte.c.rang <= 12))
         .where(Anlage.kwp >= kwp_min)
         .where(Anlage.kwp <= kwp_max)
+        .group_by(Anlage.id)
     )
-    anlagen = anlagen_result.scalars().all()
+    anlagen = anlagen_result.all()
 
     if not anlagen:
         return {
@@ -979,11 +1075,11 @@ async def get_vergleich(
     ertraege_alle = []
     ertraege_region = []
 
-    for anlage in anlagen:
-        spez = await berechne_spez_jahresertrag(db, anlage.id, anlage.kwp)
+    for anlage_region, anlage_kwp, summe, anzahl in anlagen:
+        spez = _spez_aus_summe(summe or 0, anzahl, anlage_kwp)
         if spez > 0:
             ertraege_alle.append(spez)
-            if anlage.region == region.upper():
+            if anlage_region == region.upper():
                 ertraege_region.append(spez)
 
     avg_spez = sum(ertraege_alle) / len(ertraege_alle) if ertraege_alle else 0
@@ -8,12 +8,14 @@ gruppiert nach Klassen und Regionen.
 from statistics import median
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import select, func, and_, or_
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from core import get_db
+from core import get_read_db, schnappschuss
 from models import Anlage, Monatswert
+from .aggregations import im_zeitraum
+from .analytik import analytik, jaz_je_anlage, np, quotient
 
 router = APIRouter(prefix="/components", tags=["Komponenten Deep-Dives"])
 
@@ -55,17 +57,7 @@ def _im_fenster():
     """
     from api.benchmark import get_zeitraum_filter
 
-    von_jahr, von_monat, bis_jahr, bis_monat = get_zeitraum_filter("letzte_12_monate")
-    return and_(
-        or_(
-            Monatswert.jahr > von_jahr,
-            and_(Monatswert.jahr == von_jahr, Monatswert.monat >= von_monat),
-        ),
-        or_(
-            Monatswert.jahr < bis_jahr,
-            and_(Monatswert.jahr == bis_jahr, Monatswert.monat <= bis_monat),
-        ),
-    )
+    return im_zeitraum(*get_zeitraum_filter("letzte_12_monate"))
 
 
 #: Mindestzahl an Anlagen für einen ausgewiesenen Community-Wert. Bestehende
@@ -165,7 +157,7 @@ class EAutoByUsage(BaseModel):
 # =============================================================================
 
 @router.get("/speicher/by-class", response_model=SpeicherByClass)
-async def get_speicher_by_class(db: AsyncSession = Depends(get_db)):
+async def get_speicher_by_class(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert Speicher-Statistiken gruppiert nach Kapazitätsklassen.
 
@@ -174,6 +166,9 @@ async def get_speicher_by_class(db: AsyncSession = Depends(get_db)):
     Verwendet für:
     - Komponenten Tab: Speicher-Vergleich nach Größe
     """
+    vorberechnet = schnappschuss.holen("components/speicher/by-class")
+    if vorberechnet is not None:
+        return vorberechnet
     # Definiere Kapazitätsklassen.
     #
     # eedc #F-23: Die Klasse unter 5 kWh fehlte — Anlagen mit kleinem Speicher
@@ -187,6 +182,10 @@ async def get_speicher_by_class(db: AsyncSession = Depends(get_db)):
         (15, None, ">15 kWh"),
     ]
 
+    stand = await analytik.stand(db)
+    if stand is not None:
+        return SpeicherByClass(klassen=_speicher_klassen(stand, klassen_def))
+
     klassen = []
 
     for von, bis, label in klassen_def:
@@ -199,16 +198,6 @@ async def get_speicher_by_class(db: AsyncSession = Depends(get_db)):
         anlagen_result = await db.execute(query)
         anlagen = anlagen_result.scalars().all()
 
-        if not anlagen:
-            klassen.append(SpeicherKlasse(
-                von_kwh=von,
-                bis_kwh=bis,
-                anzahl=0,
-                durchschnitt_wirkungsgrad=None,
-                durchschnitt_zyklen=None,
-                durchschnitt_netz_anteil=None,
-            ))
-            continue
 
         # Statistiken berechnen
         wirkungsgrade = []
@@ -285,36 +274,102 @@ async def get_speicher_by_class(db: AsyncSession = Depends(get_db)):
                     zyklen = jahres_entladung / anlage.speicher_kwh
                     zyklen_liste.append(zyklen)
 
-        klassen.append(SpeicherKlasse(
-            von_kwh=von,
-            bis_kwh=bis,
-            anzahl=len(anlagen),
-            # Median: ein einzelner absurder Wert kippt ihn nicht. Genau das
-            # war die Ursache der 128,6 %, die ein Nutzer am 08.08. gemeldet hat.
-            durchschnitt_wirkungsgrad=_median(wirkungsgrade),
-            durchschnitt_zyklen=round(sum(zyklen_liste) / len(zyklen_liste), 0) if zyklen_liste else None,
-            durchschnitt_netz_anteil=_median(netz_anteile),
-            anzahl_wirkungsgrad=len(wirkungsgrade),
-            verworfen_wirkungsgrad=verworfen_wirkungsgrad,
+        klassen.append(_speicher_klasse(
+            von, bis, len(anlagen), wirkungsgrade, verworfen_wirkungsgrad, zyklen_liste, netz_anteile,
         ))
 
     return SpeicherByClass(klassen=klassen)
 
 
+def _speicher_klasse(
+    von: float,
+    bis: float | None,
+    anzahl: int,
+    wirkungsgrade: list[float],
+    verworfen_wirkungsgrad: int,
+    zyklen_liste: list[float],
+    netz_anteile: list[float],
+) -> SpeicherKlasse:
+    return SpeicherKlasse(
+        von_kwh=von,
+        bis_kwh=bis,
+        anzahl=anzahl,
+        # Median: ein einzelner absurder Wert kippt ihn nicht. Genau das
+        # war die Ursache der 128,6 %, die ein Nutzer am 08.08. gemeldet hat.
+        durchschnitt_wirkungsgrad=_median(wirkungsgrade),
+        durchschnitt_zyklen=round(sum(zyklen_liste) / len(zyklen_liste), 0) if zyklen_liste else None,
+        durchschnitt_netz_anteil=_median(netz_anteile),
+        anzahl_wirkungsgrad=len(wirkungsgrade),
+        verworfen_wirkungsgrad=verworfen_wirkungsgrad,
+    )
+
+
+def _speicher_klassen(stand, klassen_def) -> list[SpeicherKlasse]:
+    """Speicher-Klassen aus dem Analytik-Stand — dieselben Regeln wie die Schleife oben."""
+    from api.benchmark import get_zeitraum_filter
+
+    kapazitaet = stand.anlagen["speicher_kwh"]
+    fenster = stand.im_zeitraum(*get_zeitraum_filter("letzte_12_monate"))
+    mit_ladung = fenster & stand.gesetzt("speicher_ladung_kwh")
+    ladung = stand.summe_je_anlage("speicher_ladung_kwh", mit_ladung)
+    entladung = stand.summe_je_anlage("speicher_entladung_kwh", mit_ladung)
+    netz_ladung = stand.summe_je_anlage("speicher_ladung_netz_kwh", mit_ladung)
+    monate_mit_ladung = stand.anzahl_je_anlage(mit_ladung)
+    monate_mit_entladung = stand.anzahl_je_anlage(fenster & stand.gesetzt("speicher_entladung_kwh"))
+
+    wirkungsgrad = quotient(entladung, ladung) * 100
+    netz_anteil = (quotient(netz_ladung, ladung) * 100).clip(max=100.0)
+    zyklen = quotient(quotient(entladung, monate_mit_entladung) * 12, kapazitaet)
+
+    klassen = []
+    for von, bis, label in klassen_def:
+        in_klasse = kapazitaet > von if von == 0 else kapazitaet >= von
+        if bis is not None:
+            in_klasse &= kapazitaet < bis
+
+        geladen = in_klasse & (ladung > 0)
+        lang_genug = geladen & (monate_mit_ladung >= WIRKUNGSGRAD_MIN_MONATE)
+        plausibel = (
+            lang_genug
+            & (wirkungsgrad >= WIRKUNGSGRAD_MIN_PROZENT)
+            & (wirkungsgrad <= WIRKUNGSGRAD_MAX_PROZENT)
+        )
+        mit_zyklen = (
+            in_klasse & (kapazitaet > 0)
+            & (monate_mit_entladung >= WIRKUNGSGRAD_MIN_MONATE) & (entladung > 0)
+        )
+        klassen.append(_speicher_klasse(
+            von, bis, int(in_klasse.sum()),
+            wirkungsgrad[plausibel].tolist(),
+            int((lang_genug & ~plausibel).sum()),
+            zyklen[mit_zyklen].tolist(),
+            netz_anteil[geladen].tolist(),
+        ))
+    return klassen
+
+
 @router.get("/waermepumpe/by-region", response_model=WPByRegion)
-async def get_wp_by_region(db: AsyncSession = Depends(get_db)):
+async def get_wp_by_region(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert Wärmepumpen-JAZ gruppiert nach Region (Klimazone).
 
     Verwendet für:
     - Komponenten Tab: WP-Vergleich nach Region
     """
+    vorberechnet = schnappschuss.holen("components/waermepumpe/by-region")
+    if vorberechnet is not None:
+        return vorberechnet
+
+    stand = await analytik.stand(db)
+    if stand is not None:
+        return WPByRegion(regionen=_wp_regionen(stand))
+
     # Alle Anlagen mit Wärmepumpe, gruppiert nach Region
     result = await db.execute(
         select(Anlage.region, func.count(Anlage.id).label("anzahl"))
         .where(Anlage.hat_waermepumpe == True)
         .group_by(Anlage.region)
-        .order_by(func.count(Anlage.id).desc())
+        .order_by(func.count(Anlage.id).desc(), Anlage.region)
     )
     regionen_raw = result.all()
 
@@ -358,6 +413,27 @@ async def get_wp_by_region(db: AsyncSession = Depends(get_db)):
     return WPByRegion(regionen=regionen)
 
 
+def _wp_regionen(stand) -> list[WPRegion]:
+    """JAZ je Region aus dem Analytik-Stand, sortiert wie die SQL-Abfrage."""
+    mit_wp = stand.anlagen["hat_waermepumpe"]
+    jaz = jaz_je_anlage(stand)
+    regionen = []
+    for code, region in enumerate(stand.kategorien["region"]):
+        in_region = mit_wp & (stand.codes["region"] == code)
+        anzahl = int(in_region.sum())
+        if anzahl == 0:
+            continue
+        jaz_werte = jaz[in_region & ~np.isnan(jaz)].tolist()
+        regionen.append(WPRegion(
+            region=region,
+            anzahl=anzahl,
+            durchschnitt_jaz=round(sum(jaz_werte) / len(jaz_werte), 2) if jaz_werte else None,
+        ))
+    # Kategorien sind alphabetisch; stabil nach Anzahl absteigend sortieren
+    regionen.sort(key=lambda r: r.anzahl, reverse=True)
+    return regionen
+
+
 WP_ART_LABELS = {
     "luft_wasser": "Luft-Wasser",
     "sole_wasser": "Sole-Wasser",
@@ -367,12 +443,32 @@ WP_ART_LABELS = {
 
 
 @router.get("/waermepumpe/by-art", response_model=WPByArt)
-async def get_wp_by_art(db: AsyncSession = Depends(get_db)):
+async def get_wp_by_art(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert Wärmepumpen-JAZ gruppiert nach Wärmepumpenart.
 
     Ermöglicht fairen Vergleich: Luft-Wasser vs. Sole-Wasser vs. Grundwasser.
     """
+    vorberechnet = schnappschuss.holen("components/waermepumpe/by-art")
+    if vorberechnet is not None:
+        return vorberechnet
+
+    stand = await analytik.stand(db)
+    if stand is not None:
+        mit_wp = stand.anlagen["hat_waermepumpe"]
+        jaz = jaz_je_anlage(stand)
+        arten = []
+        for wp_art, label in WP_ART_LABELS.items():
+            von_art = mit_wp & (stand.anlagen["wp_art"] == wp_art)
+            jaz_werte = jaz[von_art & ~np.isnan(jaz)].tolist()
+            arten.append(WPArtStats(
+                wp_art=wp_art,
+                label=label,
+                anzahl=int(von_art.sum()),
+                durchschnitt_jaz=round(sum(jaz_werte) / len(jaz_werte), 2) if jaz_werte else None,
+            ))
+        return WPByArt(arten=arten)
+
     arten = []
 
     for wp_art, label in WP_ART_LABELS.items():
@@ -423,7 +519,7 @@ async def get_wp_by_art(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/eauto/by-usage", response_model=EAutoByUsage)
-async def get_eauto_by_usage(db: AsyncSession = Depends(get_db)):
+async def get_eauto_by_usage(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert E-Auto-Statistiken gruppiert nach Nutzungsintensität.
 
@@ -432,6 +528,14 @@ async def get_eauto_by_usage(db: AsyncSession = Depends(get_db)):
     Verwendet für:
     - Komponenten Tab: E-Auto-Vergleich nach Nutzung
     """
+    vorberechnet = schnappschuss.holen("components/eauto/by-usage")
+    if vorberechnet is not None:
+        return vorberechnet
+
+    stand = await analytik.stand(db)
+    if stand is not None:
+        return EAutoByUsage(klassen=_eauto_klassen(stand))
+
     # Alle Anlagen mit E-Auto
     anlagen_result = await db.execute(
         select(Anlage).where(Anlage.hat_eauto == True)
@@ -486,7 +590,11 @@ async def get_eauto_by_usage(db: AsyncSession = Depends(get_db)):
         if verbrauch is not None:
             kategorie["verbraeuche"].append(verbrauch)
 
-    klassen = [
+    return EAutoByUsage(klassen=_eauto_klassen_aus(wenig, mittel, viel))
+
+
+def _eauto_klassen_aus(wenig: dict, mittel: dict, viel: dict) -> list[EAutoKlasse]:
+    return [
         EAutoKlasse(
             klasse="wenig",
             beschreibung="<500 km/Monat",
@@ -510,4 +618,29 @@ async def get_eauto_by_usage(db: AsyncSession = Depends(get_db)):
         ),
     ]
 
-    return EAutoByUsage(klassen=klassen)
+
+def _eauto_klassen(stand) -> list[EAutoKlasse]:
+    """Nutzungsklassen aus dem Analytik-Stand — dieselben Regeln wie oben."""
+    mit_km = stand.gesetzt("eauto_km")
+    km = stand.summe_je_anlage("eauto_km", mit_km)
+    ladung = stand.summe_je_anlage("eauto_ladung_gesamt_kwh", mit_km)
+    ladung_pv = stand.summe_je_anlage("eauto_ladung_pv_kwh", mit_km)
+    monate = stand.anzahl_je_anlage(mit_km)
+
+    aktiv = stand.anlagen["hat_eauto"] & (monate > 0)
+    km_pro_monat = quotient(km, monate)
+    pv_anteil = quotient(ladung_pv, ladung) * 100
+    verbrauch = quotient(ladung, km) * 100
+
+    klassen = {}
+    for name, in_klasse in (
+        ("wenig", aktiv & (km_pro_monat < 500)),
+        ("mittel", aktiv & (km_pro_monat >= 500) & (km_pro_monat < 1000)),
+        ("viel", aktiv & (km_pro_monat >= 1000)),
+    ):
+        klassen[name] = {
+            "anzahl": int(in_klasse.sum()),
+            "pv_anteile": pv_anteil[in_klasse & (ladung > 0)].tolist(),
+            "verbraeuche": verbrauch[in_klasse & (km > 0)].tolist(),
+        }
+    return _eauto_klassen_aus(**klassen)
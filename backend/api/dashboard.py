@@ -0,0 +1,170 @@
+"""
+EEDC Community - Dashboard-Bootstrap
+
+Die Community-Übersicht lädt beim Start `/api/stats` und
+`/api/statistics/global/totals` (mit `?anlage=` zusätzlich
+`/api/benchmark/anlage/{hash}`), der Monatsvergleich danach
+`/api/stats/verfuegbare-monate` und `/api/benchmark/monat/...`. Jeder Aufruf
+öffnet eine eigene Session; der Standardmonat des Monatsvergleichs hängt
+sogar an der Antwort des vorherigen.
+
+`GET /api/dashboard` liefert das in einer Antwort. Die voneinander
+unabhängigen Sektionen laden nebenläufig (core/parallel.py); die Monatsliste
+wird einmal gelesen und für die Wahl des Standardmonats wiederverwendet.
+Mit `include=` lassen sich Sektionen auswählen. Die Sektionen sind genau die
+Antworten der Einzel-Endpoints — dieselben Funktionen, derselbe Schnappschuss
+(`api/vorberechnung.py`).
+
+Scheitert eine Sektion, bleibt sie null und steht in `fehler`; die übrigen
+werden trotzdem geliefert (wie früher die einzeln abgefangenen Aufrufe).
+"""
+
+import logging
+from datetime import date
+from typing import Any, Awaitable, Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import get_read_db
+from core.parallel import Abfrage, parallel_lesen
+from schemas import Dashboard, VerfuegbareMonate
+from .benchmark import get_anlage_benchmark, get_monats_benchmark
+from .statistics import get_global_totals
+from .stats import get_statistiken, get_verfuegbare_monate
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+SEKTIONEN = ("stats", "totals", "verfuegbare_monate", "monatsvergleich", "benchmark")
+STANDARD = ("stats", "totals", "benchmark")
+
+
+def standard_monat(verfuegbar: VerfuegbareMonate, heute: date) -> tuple[int, int] | None:
+    """Neuester Monat außer dem laufenden (wie im Monatsvergleich-Tab)."""
+    for m in verfuegbar.monate:
+        if (m.jahr, m.monat) != (heute.year, heute.month):
+            return m.jahr, m.monat
+    if verfuegbar.monate:
+        return verfuegbar.monate[0].jahr, verfuegbar.monate[0].monat
+    return None
+
+
+def _sektion(
+    antwort: Dashboard, name: str, laden: Callable[[AsyncSession], Awaitable[Any]]
+) -> Abfrage:
+    """Sektion als Abfrage; bei einem Fehler null + Eintrag in `fehler`, Rest läuft weiter."""
+    async def abfrage(db: AsyncSession) -> Any:
+        try:
+            return await laden(db)
+        except HTTPException as e:
+            logger.warning("Dashboard-Sektion %s: %s %s", name, e.status_code, e.detail)
+        except Exception:
+            logger.exception("Dashboard-Sektion %s fehlgeschlagen", name)
+        # Abgebrochene Transaktion verwerfen, damit die nächsten Sektionen lesen können
+        await db.rollback()
+        antwort.fehler.append(name)
+        return None
+    return abfrage
+
+
+def _monat_lesen(monat: str) -> tuple[int, int]:
+    jahr, nummer = (int(t) for t in monat.split("-"))
+    if not 1 <= nummer <= 12:
+        raise HTTPException(status_code=400, detail="Monat muss zwischen 1 und 12 liegen")
+    return jahr, nummer
+
+
+@router.get("", response_model=Dashboard)
+async def get_dashboard(
+    include: str | None = Query(
+        None,
+        description=f"Kommagetrennt aus {', '.join(SEKTIONEN)}; Standard: {', '.join(STANDARD)}",
+    ),
+    anlage_hash: str | None = Query(None, description="Für die Sektion benchmark"),
+    monat: str | None = Query(
+        None, pattern=r"^\d{4}-\d{1,2}$", description="YYYY-MM für monatsvergleich (Standard: letzter abgeschlossener)"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Startdaten der Community-Übersicht in einem Aufruf.
+
+    `benchmark` wird nur mit `anlage_hash` geliefert. Fehlgeschlagene
+    Sektionen sind null und stehen in `fehler`.
+    """
+    if include is None:
+        sektionen = list(STANDARD)
+    else:
+        sektionen = [s.strip() for s in include.split(",") if s.strip()]
+        unbekannt = [s for s in sektionen if s not in SEKTIONEN]
+        if unbekannt:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unbekannte Sektion(en): {', '.join(unbekannt)} — möglich: {', '.join(SEKTIONEN)}",
+            )
+    if not anlage_hash and "benchmark" in sektionen:
+        sektionen.remove("benchmark")
+    sektionen = [s for s in SEKTIONEN if s in sektionen]
+
+    jahr_monat = _monat_lesen(monat) if monat is not None else None
+
+    antwort = Dashboard(sektionen=sektionen)
+
+    async def stats_laden(s: AsyncSession) -> None:
+        antwort.stats = await _sektion(antwort, "stats", get_statistiken)(s)
+
+    async def totals_laden(s: AsyncSession) -> None:
+        antwort.totals = await _sektion(antwort, "totals", get_global_totals)(s)
+
+    async def monate_laden(s: AsyncSession) -> None:
+        # Monatsvergleich hängt ohne `monat` an der Monatsliste — nacheinander
+        verfuegbar = None
+        if "verfuegbare_monate" in sektionen or jahr_monat is None:
+            verfuegbar = await _sektion(antwort, "verfuegbare_monate", get_verfuegbare_monate)(s)
+            if "verfuegbare_monate" in sektionen:
+                antwort.verfuegbare_monate = verfuegbar
+        if "monatsvergleich" not in sektionen:
+            return
+        gewaehlt = jahr_monat
+        if gewaehlt is None and verfuegbar is not None:
+            gewaehlt = standard_monat(verfuegbar, date.today())
+        elif gewaehlt is None:
+            # Ohne Monatsliste kein Standardmonat
+            antwort.fehler.append("monatsvergleich")
+        if gewaehlt is not None:
+            antwort.monatsvergleich = await _sektion(
+                antwort, "monatsvergleich", lambda t: get_monats_benchmark(*gewaehlt, db=t)
+            )(s)
+
+    async def benchmark_laden(s: AsyncSession) -> Any:
+        try:
+            ergebnis = await get_anlage_benchmark(
+                anlage_hash, zeitraum="letzte_12_monate", jahr=None, monat=None, db=s
+            )
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            antwort.anlage_gefunden = False
+            return None
+        antwort.anlage_gefunden = True
+        return ergebnis
+
+    async def benchmark_sektion(s: AsyncSession) -> None:
+        antwort.benchmark = await _sektion(antwort, "benchmark", benchmark_laden)(s)
+
+    abfragen: list[Abfrage] = []
+    if "stats" in sektionen:
+        abfragen.append(stats_laden)
+    if "totals" in sektionen:
+        abfragen.append(totals_laden)
+    if "verfuegbare_monate" in sektionen or "monatsvergleich" in sektionen:
+        abfragen.append(monate_laden)
+    if "benchmark" in sektionen:
+        abfragen.append(benchmark_sektion)
+    await parallel_lesen(db, *abfragen)
+
+    # Reihenfolge unabhängig davon, welche Sektion zuerst fertig war
+    antwort.fehler.sort(key=SEKTIONEN.index)
+    return antwort
@@ -0,0 +1,239 @@
+"""
+EEDC Community - Export des anonymisierten Datensatzes
+
+`GET /api/export/monatswerte?format=csv|ndjson|parquet` liefert alle
+Monatswerte samt Anlagen-Eckdaten (Region, kWp, Ausrichtung, Ausstattung) —
+für Auswertungen außerhalb des Dashboards statt eines DB-Dumps.
+
+- Anonymisiert: kein `anlage_hash`, keine internen IDs, keine Freitexte
+  (`sonstiges_bezeichnung`). Die Monate einer Anlage hängen über `anlage_nr`
+  zusammen, eine Nummer nur innerhalb dieses Exports — in gesalzener,
+  je Export neuer Zufallsreihenfolge, damit sie nichts über die Reihenfolge
+  der Einreichungen verrät.
+- Mindestkohorte: ein Monatswert wird nur exportiert, wenn in seiner Region
+  im selben Monat mindestens `MIN_ANLAGEN_FUER_AGGREGAT` Anlagen Daten haben
+  — sonst wäre die Zeile eine einzelne, wiedererkennbare Anlage.
+- Gestreamt: serverseitiger Cursor, `settings.export_batch_groesse` Zeilen
+  je Abruf; die Tabelle liegt nie komplett im Speicher.
+- Parquet braucht `pyarrow` (optional), ohne gibt es 501.
+"""
+
+import csv
+import io
+import json
+import secrets
+from typing import AsyncIterator, Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Float, Integer, String, and_, cast, func, literal, select, true
+
+from core import async_session, settings
+from models import Anlage, Monatswert
+from .components import MIN_ANLAGEN_FUER_AGGREGAT
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, nur für format=parquet
+    pyarrow = None
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+ExportFormat = Literal["csv", "ndjson", "parquet"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+#: Anlagen-Spalten im Export — bewusst ohne Hash, IDs, Freitext und Metadaten
+ANLAGEN_SPALTEN = (
+    "region", "kwp", "ausrichtung", "neigung_grad", "speicher_kwh", "installation_jahr",
+    "hat_waermepumpe", "wp_art", "hat_eauto", "hat_wallbox", "hat_balkonkraftwerk",
+    "hat_sonstiges", "wallbox_kw", "bkw_wp",
+)
+
+#: Alle Messwerte eines Monats (ohne die abgeleitete `periode`)
+MONATS_SPALTEN = tuple(
+    spalte.name for spalte in Monatswert.__table__.columns
+    if spalte.name not in ("id", "anlage_id", "periode")
+)
+
+SPALTEN = ("anlage_nr", *ANLAGEN_SPALTEN, *MONATS_SPALTEN)
+
+
+def export_abfrage(region: str | None = None, jahr: int | None = None, salz: str = ""):
+    """Export-Zeilen in `SPALTEN`-Reihenfolge, nach `anlage_nr` und Monat sortiert.
+
+    `anlage_nr` nummeriert die Anlagen in der Reihenfolge von
+    `md5(salz || id)` — mit frischem Salz je Export zufällig und ohne Bezug
+    zur Einreichungsreihenfolge (Lücken für Anlagen ohne exportierte Monate
+    sind möglich). Fensterfunktion und Sortierung laufen nur über die
+    Anlagen, die Mindestkohorten stehen vorab gruppiert in `kohorten`; die
+    Monate holt der LATERAL-Join je Anlage über `ix_monatswerte_anlage_zeit`.
+    Über den ganzen Join wird nichts sortiert, die ersten Zeilen kommen,
+    sobald `kohorten` steht.
+    """
+    anlagen_filter = [Anlage.region == region] if region else []
+    monats_filter = [Monatswert.jahr == jahr] if jahr else []
+
+    nummern = (
+        select(
+            *(getattr(Anlage, name) for name in ("id", *ANLAGEN_SPALTEN)),
+            func.row_number().over(
+                order_by=func.md5(literal(salz) + cast(Anlage.id, String))
+            ).label("anlage_nr"),
+        )
+        .where(*anlagen_filter)
+        .order_by("anlage_nr")
+        .subquery("nummern")
+    )
+    kohorten = (
+        select(Anlage.region, Monatswert.jahr, Monatswert.monat)
+        .join(Monatswert, Monatswert.anlage_id == Anlage.id)
+        .where(*anlagen_filter, *monats_filter)
+        .group_by(Anlage.region, Monatswert.jahr, Monatswert.monat)
+        .having(func.count() >= MIN_ANLAGEN_FUER_AGGREGAT)
+        .cte("kohorten")
+        .prefix_with("MATERIALIZED", dialect="postgresql")
+    )
+    monate = (
+        select(*(getattr(Monatswert, name) for name in MONATS_SPALTEN))
+        .where(Monatswert.anlage_id == nummern.c.id, *monats_filter)
+        .order_by(Monatswert.jahr, Monatswert.monat)
+        .lateral("monate")
+    )
+
+    return (
+        select(
+            nummern.c.anlage_nr,
+            *(nummern.c[name] for name in ANLAGEN_SPALTEN),
+            *(monate.c[name] for name in MONATS_SPALTEN),
+        )
+        .select_from(nummern)
+        .join(monate, true())
+        .join(kohorten, and_(
+            kohorten.c.region == nummern.c.region,
+            kohorten.c.jahr == monate.c.jahr,
+            kohorten.c.monat == monate.c.monat,
+        ))
+        .order_by(nummern.c.anlage_nr, monate.c.jahr, monate.c.monat)
+    )
+
+
+async def _zeilen_bloecke(region: str | None, jahr: int | None) -> AsyncIterator[list[tuple]]:
+    """Zeilen in Blöcken von `settings.export_batch_groesse` (serverseitiger Cursor).
+
+    Eigene Session: der Cursor lebt so lange wie die Antwort, nicht wie der
+    Endpoint-Aufruf.
+    """
+    async with async_session() as db:
+        result = await db.stream(
+            export_abfrage(region, jahr, salz=secrets.token_hex(16)),
+            execution_options={"yield_per": settings.export_batch_groesse},
+        )
+        async for block in result.partitions():
+            yield [tuple(zeile) for zeile in block]
+
+
+async def _csv(bloecke: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    puffer = io.StringIO()
+    writer = csv.writer(puffer, lineterminator="\n")
+    writer.writerow(SPALTEN)
+    async for block in bloecke:
+        writer.writerows(block)
+        yield puffer.getvalue().encode("utf-8")
+        puffer.seek(0)
+        puffer.truncate()
+    if puffer.tell():
+        yield puffer.getvalue().encode("utf-8")
+
+
+async def _ndjson(bloecke: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    async for block in bloecke:
+        yield "".join(
+            json.dumps(dict(zip(SPALTEN, zeile)), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for zeile in block
+        ).encode("utf-8")
+
+
+def _arrow_schema():
+    typen = {Integer: pyarrow.int32(), Float: pyarrow.float64(), Boolean: pyarrow.bool_()}
+    felder = [pyarrow.field("anlage_nr", pyarrow.int64())]
+    for tabelle, namen in ((Anlage.__table__, ANLAGEN_SPALTEN), (Monatswert.__table__, MONATS_SPALTEN)):
+        for name in namen:
+            typ = type(tabelle.columns[name].type)
+            felder.append(pyarrow.field(name, typen.get(typ, pyarrow.string())))
+    return pyarrow.schema(felder)
+
+
+class _Abholpuffer(io.RawIOBase):
+    """Schreibziel für den ParquetWriter, das nach jedem Block geleert wird."""
+
+    def __init__(self):
+        self._teile: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, daten) -> int:
+        self._teile.append(bytes(daten))
+        self._position += len(daten)
+        return len(daten)
+
+    def tell(self) -> int:
+        return self._position
+
+    def abholen(self) -> bytes:
+        daten = b"".join(self._teile)
+        self._teile.clear()
+        return daten
+
+
+async def _parquet(bloecke: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """Eine Row-Group je Block (Arrow-RecordBatch), Footer am Ende."""
+    schema = _arrow_schema()
+    puffer = _Abholpuffer()
+    writer = pyarrow.parquet.ParquetWriter(puffer, schema, compression="zstd")
+    try:
+        async for block in bloecke:
+            spalten = list(zip(*block))
+            writer.write_batch(pyarrow.RecordBatch.from_arrays(
+                [pyarrow.array(werte, type=feld.type) for werte, feld in zip(spalten, schema)],
+                schema=schema,
+            ))
+            yield puffer.abholen()
+    finally:
+        writer.close()
+    yield puffer.abholen()
+
+
+@router.get("/monatswerte")
+async def export_monatswerte(
+    format: ExportFormat = Query("csv", description="csv, ndjson oder parquet"),
+    region: str | None = Query(None, min_length=2, max_length=2, description="Nur diese Region"),
+    jahr: int | None = Query(None, ge=2010, le=2050, description="Nur dieses Jahr"),
+):
+    """
+    Anonymisierter Datensatz aller Monatswerte, gestreamt.
+
+    Eine Zeile je Anlage und Monat, ohne `anlage_hash`. Monatswerte aus
+    Region-Monaten mit weniger als `MIN_ANLAGEN_FUER_AGGREGAT` Anlagen fehlen.
+    """
+    if format == "parquet" and pyarrow is None:
+        raise HTTPException(
+            status_code=501,
+            detail="Parquet-Export nicht verfügbar (Paket pyarrow nicht installiert)",
+        )
+
+    region = region.upper() if region else None
+    bloecke = _zeilen_bloecke(region, jahr)
+    inhalt = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}[format](bloecke)
+    return StreamingResponse(
+        inhalt,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="eedc-monatswerte.{format}"'},
+    )
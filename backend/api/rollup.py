@@ -0,0 +1,376 @@
+"""
+EEDC Community - Monats-Rollup (`community_monat`)
+
+Vorberechnete Community-Werte je (Jahr, Monat, Region). Die Monats-Endpoints
+(`/api/benchmark/monat/...`, `/api/stats/monat/...`, `/api/stats/verfuegbare-
+monate`, `/api/statistics/monthly-averages`, Monatssummen in
+`/api/statistics/global/totals`) lesen nur noch diese Tabelle — vorher hat
+jeder Aufruf denselben Monat erneut aus `monatswerte` zusammengerechnet.
+
+Pflege:
+- Submit und Löschen rechnen den Beitrag jeder betroffenen Monatszeile aus dem
+  Bucket heraus (alter Stand) und wieder hinein (neuer Stand), in derselben
+  Transaktion wie die Rohdaten (`rollup_anwenden`).
+- `python manage.py rollup aufbauen` baut die Tabelle komplett neu aus den
+  Rohdaten; `python manage.py rollup pruefen` vergleicht sie mit der Live-
+  Berechnung. Beim Server-Start wird sie automatisch aufgebaut, wenn sie leer
+  ist, aber Monatswerte existieren.
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+
+from sqlalchemy import delete, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import daten_geaendert, daten_version_erhoehen
+from models import Anlage, CommunityMonat, Monatswert
+
+from .sketch import QuantilSketch
+
+
+# =============================================================================
+# KPI- und Summen-Definitionen
+# =============================================================================
+
+def kpi_werte(mw, kwp: float) -> dict[str, float]:
+    """Die KPI-Werte, die eine Monatszeile zu ihrem Bucket beiträgt.
+
+    Spiegelt `benchmark.MONATS_KPIS` (SQL) Bedingung für Bedingung — beide
+    Seiten müssen dieselben Anlagen in denselben KPI zählen, sonst weicht der
+    Rollup von der Live-Berechnung ab (`python manage.py rollup pruefen`).
+    Zusätzlich `ertrag` für den Ø-Monatsertrag in `/api/stats`.
+    """
+    werte: dict[str, float] = {}
+
+    if mw.ertrag_kwh is not None:
+        werte["ertrag"] = mw.ertrag_kwh
+        if kwp and kwp > 0:
+            werte["spez_ertrag"] = mw.ertrag_kwh / kwp
+    if mw.autarkie_prozent is not None:
+        werte["autarkie"] = mw.autarkie_prozent
+    if mw.eigenverbrauch_prozent is not None:
+        werte["eigenverbrauch"] = mw.eigenverbrauch_prozent
+    if mw.einspeisung_kwh is not None:
+        werte["einspeisung"] = mw.einspeisung_kwh
+    if mw.netzbezug_kwh is not None:
+        werte["netzbezug"] = mw.netzbezug_kwh
+
+    # Speicher
+    if mw.speicher_ladung_kwh is not None:
+        werte["speicher_ladung"] = mw.speicher_ladung_kwh
+    if mw.speicher_entladung_kwh is not None:
+        werte["speicher_entladung"] = mw.speicher_entladung_kwh
+    if (mw.speicher_ladung_kwh and mw.speicher_ladung_kwh > 0
+            and mw.speicher_entladung_kwh is not None):
+        werte["speicher_wirkungsgrad"] = mw.speicher_entladung_kwh / mw.speicher_ladung_kwh * 100
+
+    # Wärmepumpe
+    if mw.wp_stromverbrauch_kwh is not None and mw.wp_stromverbrauch_kwh > 0:
+        werte["wp_stromverbrauch"] = mw.wp_stromverbrauch_kwh
+        waerme = (mw.wp_heizwaerme_kwh or 0) + (mw.wp_warmwasser_kwh or 0)
+        if waerme > 0:
+            werte["wp_waerme"] = waerme
+            werte["wp_jaz"] = waerme / mw.wp_stromverbrauch_kwh
+
+    # E-Auto
+    if mw.eauto_ladung_gesamt_kwh is not None and mw.eauto_ladung_gesamt_kwh > 0:
+        werte["eauto_ladung"] = mw.eauto_ladung_gesamt_kwh
+        if mw.eauto_ladung_pv_kwh is not None:
+            werte["eauto_pv_anteil"] = mw.eauto_ladung_pv_kwh / mw.eauto_ladung_gesamt_kwh * 100
+    if mw.eauto_km is not None and mw.eauto_km > 0:
+        werte["eauto_km"] = mw.eauto_km
+
+    # Wallbox
+    if mw.wallbox_ladung_kwh is not None and mw.wallbox_ladung_kwh > 0:
+        werte["wallbox_ladung"] = mw.wallbox_ladung_kwh
+        if mw.wallbox_ladung_pv_kwh is not None:
+            werte["wallbox_pv_anteil"] = mw.wallbox_ladung_pv_kwh / mw.wallbox_ladung_kwh * 100
+
+    # BKW
+    if mw.bkw_erzeugung_kwh is not None and mw.bkw_erzeugung_kwh > 0:
+        werte["bkw_erzeugung"] = mw.bkw_erzeugung_kwh
+
+    return werte
+
+
+#: Alle KPIs, die `kpi_werte` liefern kann.
+KPI_NAMEN = (
+    "ertrag", "spez_ertrag", "autarkie", "eigenverbrauch", "einspeisung", "netzbezug",
+    "speicher_ladung", "speicher_entladung", "speicher_wirkungsgrad",
+    "wp_stromverbrauch", "wp_waerme", "wp_jaz",
+    "eauto_ladung", "eauto_pv_anteil", "eauto_km",
+    "wallbox_ladung", "wallbox_pv_anteil", "bkw_erzeugung",
+)
+
+#: Rohsummen je Bucket (Spalte in `CommunityMonat` → Wert der Monatszeile).
+SUMMEN = {
+    "sum_ertrag_kwh": lambda mw: mw.ertrag_kwh or 0,
+    "sum_einspeisung_kwh": lambda mw: mw.einspeisung_kwh or 0,
+    "sum_netzbezug_kwh": lambda mw: mw.netzbezug_kwh or 0,
+    "sum_speicher_ladung_kwh": lambda mw: mw.speicher_ladung_kwh or 0,
+    "sum_speicher_entladung_kwh": lambda mw: mw.speicher_entladung_kwh or 0,
+    "sum_wp_strom_kwh": lambda mw: mw.wp_stromverbrauch_kwh or 0,
+    "sum_wp_waerme_kwh": lambda mw: (mw.wp_heizwaerme_kwh or 0) + (mw.wp_warmwasser_kwh or 0),
+    "sum_eauto_km": lambda mw: mw.eauto_km or 0,
+    "sum_eauto_ladung_kwh": lambda mw: mw.eauto_ladung_gesamt_kwh or 0,
+    "sum_eauto_pv_kwh": lambda mw: mw.eauto_ladung_pv_kwh or 0,
+    "sum_wallbox_ladung_kwh": lambda mw: mw.wallbox_ladung_kwh or 0,
+    "sum_wallbox_pv_kwh": lambda mw: mw.wallbox_ladung_pv_kwh or 0,
+    "sum_bkw_erzeugung_kwh": lambda mw: mw.bkw_erzeugung_kwh or 0,
+}
+
+#: Monatswert-Spalten, die `kpi_werte` und `SUMMEN` lesen.
+ROHSPALTEN = [
+    Monatswert.jahr, Monatswert.monat,
+    Monatswert.ertrag_kwh, Monatswert.einspeisung_kwh, Monatswert.netzbezug_kwh,
+    Monatswert.autarkie_prozent, Monatswert.eigenverbrauch_prozent,
+    Monatswert.speicher_ladung_kwh, Monatswert.speicher_entladung_kwh,
+    Monatswert.wp_stromverbrauch_kwh, Monatswert.wp_heizwaerme_kwh, Monatswert.wp_warmwasser_kwh,
+    Monatswert.eauto_ladung_gesamt_kwh, Monatswert.eauto_ladung_pv_kwh, Monatswert.eauto_km,
+    Monatswert.wallbox_ladung_kwh, Monatswert.wallbox_ladung_pv_kwh,
+    Monatswert.bkw_erzeugung_kwh,
+]
+
+
+@dataclass(frozen=True)
+class Beitrag:
+    """Was eine Monatszeile zu genau einem Bucket beiträgt."""
+
+    jahr: int
+    monat: int
+    region: str
+    werte: tuple[tuple[str, float], ...]
+    summen: tuple[tuple[str, float], ...]
+
+    @property
+    def schluessel(self) -> tuple[int, int, str]:
+        return (self.jahr, self.monat, self.region)
+
+
+def beitrag(mw, region: str, kwp: float) -> Beitrag:
+    """Beitrag einer Monatszeile (ORM-Objekt, Input-Schema oder Row)."""
+    return Beitrag(
+        jahr=mw.jahr,
+        monat=mw.monat,
+        region=region,
+        werte=tuple(sorted(kpi_werte(mw, kwp).items())),
+        summen=tuple((spalte, float(f(mw))) for spalte, f in SUMMEN.items()),
+    )
+
+
+# =============================================================================
+# Pflege
+# =============================================================================
+
+def _anwenden_auf(bucket: CommunityMonat, beitraege: list[Beitrag], vorzeichen: int) -> None:
+    kpis = {name: QuantilSketch.aus_dict(d) for name, d in (bucket.kpis or {}).items()}
+    for b in beitraege:
+        bucket.anzahl_anlagen = (bucket.anzahl_anlagen or 0) + vorzeichen
+        for spalte, wert in b.summen:
+            setattr(bucket, spalte, (getattr(bucket, spalte) or 0) + vorzeichen * wert)
+        for name, wert in b.werte:
+            kz = kpis.setdefault(name, QuantilSketch())
+            if vorzeichen > 0:
+                kz.hinzufuegen(wert)
+            else:
+                kz.entfernen(wert)
+    # Neu zuweisen statt in-place ändern: JSON-Spalten tracken keine Mutation.
+    bucket.kpis = {name: kz.als_dict() for name, kz in kpis.items() if kz.n > 0}
+
+
+async def rollup_anwenden(db: AsyncSession, alt: list[Beitrag], neu: list[Beitrag]) -> None:
+    """Rechnet `alt` aus den Buckets heraus und `neu` hinein.
+
+    Identische Beiträge (unveränderte Monate) heben sich vorher auf. Buckets
+    werden in fester Schlüssel-Reihenfolge gesperrt (`FOR UPDATE`), damit sich
+    parallele Submits nicht gegenseitig verklemmen. Leere Buckets verschwinden.
+    Kein Commit — das übernimmt der aufrufende Submit/Delete.
+    """
+    gemeinsam = Counter(alt) & Counter(neu)
+    alt_rest = list((Counter(alt) - gemeinsam).elements())
+    neu_rest = list((Counter(neu) - gemeinsam).elements())
+    if not alt_rest and not neu_rest:
+        return
+
+    schluessel = sorted({b.schluessel for b in alt_rest + neu_rest})
+
+    # Fehlende Buckets anlegen (parallel sicher), dann alle sperren.
+    await db.execute(
+        insert(CommunityMonat)
+        .values([
+            {"jahr": j, "monat": m, "region": r, "anzahl_anlagen": 0, "kpis": {},
+             **{spalte: 0.0 for spalte in SUMMEN}}
+            for j, m, r in schluessel
+        ])
+        .on_conflict_do_nothing(index_elements=["jahr", "monat", "region"])
+    )
+    result = await db.execute(
+        select(CommunityMonat)
+        .where(tuple_(CommunityMonat.jahr, CommunityMonat.monat, CommunityMonat.region).in_(schluessel))
+        .order_by(CommunityMonat.jahr, CommunityMonat.monat, CommunityMonat.region)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    buckets = {(b.jahr, b.monat, b.region): b for b in result.scalars()}
+
+    for key, bucket in buckets.items():
+        _anwenden_auf(bucket, [b for b in alt_rest if b.schluessel == key], -1)
+        _anwenden_auf(bucket, [b for b in neu_rest if b.schluessel == key], +1)
+        if bucket.anzahl_anlagen <= 0:
+            await db.delete(bucket)
+    await db.flush()
+
+
+async def community_monat_aufbauen(db: AsyncSession) -> int:
+    """Baut `community_monat` komplett neu aus `monatswerte` auf und committet.
+
+    Die Tabelle wird exklusiv gesperrt: laufende Submits warten, bis der
+    Neuaufbau committet ist, und rechnen ihre Deltas dann auf den neuen Stand.
+    Die Rohdaten werden per Server-Cursor gestreamt. Gibt die Bucket-Zahl zurück.
+    """
+    await db.execute(text("LOCK TABLE community_monat IN EXCLUSIVE MODE"))
+    await db.execute(delete(CommunityMonat))
+
+    buckets: dict[tuple[int, int, str], CommunityMonat] = {}
+    sammel: dict[tuple[int, int, str], list[Beitrag]] = {}
+    stream = await db.stream(
+        select(*ROHSPALTEN, Anlage.region, Anlage.kwp)
+        .join(Anlage, Monatswert.anlage_id == Anlage.id)
+        .execution_options(yield_per=2000)
+    )
+    async for row in stream:
+        b = beitrag(row, row.region, row.kwp)
+        sammel.setdefault(b.schluessel, []).append(b)
+
+    for (jahr, monat, region), beitraege in sammel.items():
+        bucket = CommunityMonat(
+            jahr=jahr, monat=monat, region=region, anzahl_anlagen=0, kpis={},
+            **{spalte: 0.0 for spalte in SUMMEN},
+        )
+        _anwenden_auf(bucket, beitraege, +1)
+        buckets[(jahr, monat, region)] = bucket
+    db.add_all(buckets.values())
+    # Laufende Server (alle Worker) verwerfen ihre gecachten Antworten
+    version = await daten_version_erhoehen(db)
+    await db.commit()
+    daten_geaendert(version)
+    return len(buckets)
+
+
+async def community_monat_sicherstellen(db: AsyncSession) -> bool:
+    """Baut den Rollup beim Start auf, wenn er leer ist, aber Daten existieren."""
+    hat_rollup = (await db.execute(select(CommunityMonat.id).limit(1))).first()
+    if hat_rollup:
+        return False
+    hat_daten = (await db.execute(select(Monatswert.id).limit(1))).first()
+    if not hat_daten:
+        return False
+    await community_monat_aufbauen(db)
+    return True
+
+
+# =============================================================================
+# Lesen
+# =============================================================================
+
+async def lade_buckets(
+    db: AsyncSession, monate: list[tuple[int, int]] | None = None
+) -> list[CommunityMonat]:
+    """Buckets für die angegebenen Monate (oder alle), chronologisch."""
+    stmt = select(CommunityMonat).order_by(
+        CommunityMonat.jahr, CommunityMonat.monat, CommunityMonat.region
+    )
+    if monate is not None:
+        if not monate:
+            return []
+        stmt = stmt.where(tuple_(CommunityMonat.jahr, CommunityMonat.monat).in_(monate))
+    return list((await db.execute(stmt)).scalars())
+
+
+async def lade_buckets_zeitraum(
+    db: AsyncSession,
+    von: tuple[int, int],
+    bis: tuple[int, int],
+    region: str | None = None,
+) -> list[CommunityMonat]:
+    """Buckets von (Jahr, Monat) bis (Jahr, Monat) einschließlich, optional je Region."""
+    periode = CommunityMonat.jahr * 100 + CommunityMonat.monat
+    stmt = (
+        select(CommunityMonat)
+        .where(periode.between(von[0] * 100 + von[1], bis[0] * 100 + bis[1]))
+        .order_by(CommunityMonat.jahr, CommunityMonat.monat, CommunityMonat.region)
+    )
+    if region:
+        stmt = stmt.where(CommunityMonat.region == region)
+    return list((await db.execute(stmt)).scalars())
+
+
+async def letzte_monate(db: AsyncSession, limit: int) -> list[tuple[int, int]]:
+    """Die `limit` jüngsten Monate mit Daten, neuester zuerst."""
+    result = await db.execute(
+        select(CommunityMonat.jahr, CommunityMonat.monat)
+        .distinct()
+        .order_by(CommunityMonat.jahr.desc(), CommunityMonat.monat.desc())
+        .limit(limit)
+    )
+    return [(r.jahr, r.monat) for r in result.all()]
+
+
+def vereinigte_kpis(buckets: list[CommunityMonat]) -> dict[str, QuantilSketch]:
+    """Vereinigt die KPI-Verteilungen mehrerer Buckets (z. B. alle Regionen)."""
+    kpis: dict[str, QuantilSketch] = {}
+    for bucket in buckets:
+        for name, daten in (bucket.kpis or {}).items():
+            kpis.setdefault(name, QuantilSketch()).vereinigen(QuantilSketch.aus_dict(daten))
+    return kpis
+
+
+def nach_monat(buckets: list[CommunityMonat]) -> dict[tuple[int, int], list[CommunityMonat]]:
+    """Gruppiert Buckets nach (Jahr, Monat), Reihenfolge bleibt erhalten."""
+    gruppiert: dict[tuple[int, int], list[CommunityMonat]] = {}
+    for bucket in buckets:
+        gruppiert.setdefault((bucket.jahr, bucket.monat), []).append(bucket)
+    return gruppiert
+
+
+# =============================================================================
+# Konsistenzprüfung
+# =============================================================================
+
+def _weicht_ab(a, b) -> bool:
+    """Vergleich zweier Ausgaben im Rahmen der Rollup-Genauigkeit.
+
+    Erlaubt eine Rundungsstufe (SQL-`avg` und Summe/Anzahl in Python können an
+    der Grenze x,x5 auseinanderfallen) plus den relativen Sketch-Fehler der
+    Quantile (`QuantilSketch.GENAUIGKEIT`).
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() != b.keys() or any(_weicht_ab(a[k], b[k]) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) != len(b) or any(_weicht_ab(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        toleranz = 0.1 + QuantilSketch.GENAUIGKEIT * max(abs(a), abs(b))
+        return abs(a - b) > toleranz + 1e-9
+    return a != b
+
+
+async def community_monat_pruefen(db: AsyncSession) -> list[tuple[int, int]]:
+    """Vergleicht jeden Monat im Rollup mit der Live-Berechnung aus den Rohdaten.
+
+    Gibt die abweichenden Monate zurück (leer = konsistent).
+    """
+    from api.benchmark import berechne_monats_vergleich, berechne_monats_vergleich_live
+
+    result = await db.execute(
+        select(Monatswert.jahr, Monatswert.monat).distinct()
+        .order_by(Monatswert.jahr, Monatswert.monat)
+    )
+    abweichend = []
+    for jahr, monat in result.all():
+        live = await berechne_monats_vergleich_live(db, jahr, monat)
+        rollup = await berechne_monats_vergleich(db, jahr, monat)
+        if rollup is None or _weicht_ab(live.model_dump(), rollup.model_dump()):
+            abweichend.append((jahr, monat))
+    return abweichend
@@ -0,0 +1,217 @@
+"""
+EEDC Community - Quantil-Sketch
+
+Verteilung eines KPI in fester, kleiner Größe statt als Liste aller Werte.
+Grundlage ist das DDSketch-Verfahren (Masson/Rim/Lee, VLDB 2019): Werte landen
+in logarithmischen Klassen `(γ^(k-1), γ^k]` mit `γ = (1+α)/(1-α)`, gezählt wird
+nur, wie viele Werte in jeder Klasse liegen.
+
+Eigenschaften:
+- **Fehler:** Jedes Quantil weicht um höchstens `α` = 1 % (relativ) vom exakten
+  `percentile_cont`-Wert ab (gilt für Werte gleichen Vorzeichens, also für
+  alle KPIs hier). Minimum und Maximum sind exakt, solange der Extremwert
+  nicht per `entfernen` herausgenommen wurde — danach ebenfalls ≤ 1 %.
+  Die Anzahl ist exakt. Die Summe (und damit der Durchschnitt) ist eine
+  laufende Float-Summe: nach vielen `hinzufuegen`/`entfernen` kann sie in
+  den letzten Stellen vom Neuberechnen abweichen — `rollup aufbauen` setzt
+  sie zurück.
+- **Speicher:** eine Klasse je Faktor γ ≈ 1,02 im Wertebereich, also rund
+  `ln(max/min) / 0,02` Klassen — für 0,1…10 000 höchstens ~580, unabhängig
+  von der Anzahl der Werte.
+- **Vereinigen und Entfernen** sind exakt (Klassenzähler addieren bzw.
+  dekrementieren). `entfernen` setzt voraus, dass der Wert vorher
+  hinzugefügt wurde; ist seine Klasse leer, bleibt der Sketch unverändert.
+  Deshalb DDSketch und nicht t-digest/KLL: deren Zusammenfassungen lassen sich nicht um einzelne Werte verkleinern, der
+  Monats-Rollup muss bei jedem Submit den alten Stand herausrechnen.
+"""
+
+import math
+
+
+class QuantilSketch:
+    """Mergebarer Quantil-Sketch mit Anzahl, Summe, Minimum und Maximum.
+
+    Serialisierbar als JSON (`als_dict`/`aus_dict`), damit er je Bucket in
+    `community_monat.kpis` liegen kann.
+    """
+
+    GENAUIGKEIT = 0.01  # α, relativer Fehler der Quantile
+    _GAMMA = (1 + GENAUIGKEIT) / (1 - GENAUIGKEIT)
+    _LOG_GAMMA = math.log(_GAMMA)
+
+    __slots__ = ("n", "summe", "min", "max", "null", "pos", "neg")
+
+    def __init__(self):
+        self.n = 0
+        self.summe = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+        self.null = 0                   # Anzahl exakter Nullen
+        self.pos: dict[int, int] = {}   # Klasse → Anzahl (Werte > 0)
+        self.neg: dict[int, int] = {}   # Klasse von |x| → Anzahl (Werte < 0)
+
+    # -------------------------------------------------------------------------
+    # Klassen
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _klasse(cls, betrag: float) -> int:
+        return math.ceil(math.log(betrag) / cls._LOG_GAMMA)
+
+    @classmethod
+    def _vertreter(cls, klasse: int) -> float:
+        # Mitte der Klasse im relativen Sinn: Abstand zu beiden Grenzen ≤ α
+        return 2 * cls._GAMMA ** klasse / (cls._GAMMA + 1)
+
+    @classmethod
+    def _position(cls, wert: float) -> tuple[int, int]:
+        """Sortierschlüssel der Klasse eines Werts: negativ < 0 < positiv."""
+        if wert > 0:
+            return 1, cls._klasse(wert)
+        if wert < 0:
+            return -1, -cls._klasse(-wert)
+        return 0, 0
+
+    def _zaehler(self, wert: float) -> tuple[dict[int, int] | None, int]:
+        if wert > 0:
+            return self.pos, self._klasse(wert)
+        if wert < 0:
+            return self.neg, self._klasse(-wert)
+        return None, 0
+
+    # -------------------------------------------------------------------------
+    # Pflege
+    # -------------------------------------------------------------------------
+
+    def hinzufuegen(self, wert: float) -> None:
+        zaehler, k = self._zaehler(wert)
+        if zaehler is None:
+            self.null += 1
+        else:
+            zaehler[k] = zaehler.get(k, 0) + 1
+        self.n += 1
+        self.summe += wert
+        self.min = wert if self.min is None else min(self.min, wert)
+        self.max = wert if self.max is None else max(self.max, wert)
+
+    def entfernen(self, wert: float) -> None:
+        """Nimmt einen zuvor hinzugefügten Wert wieder heraus.
+
+        Ein nie gezählter Wert fällt nur auf, wenn seine Klasse leer ist — dann
+        passiert nichts. Sonst trifft er den Zähler eines anderen Werts derselben
+        Klasse; Anzahl und Summe gehen dabei trotzdem zurück.
+
+        Ob ein Extremwert wegfiel, entscheidet die Klasse, nicht der Wert: ein
+        nachberechnetes Minimum ist ein Klassenvertreter und kann unter dem
+        echten Wert liegen.
+
+        >>> s = QuantilSketch()
+        >>> for w in (90, 100.9, 200): s.hinzufuegen(w)
+        >>> s.entfernen(90); s.entfernen(100.9); s.hinzufuegen(150)
+        >>> abs(s.min - 150) <= 150 * QuantilSketch.GENAUIGKEIT
+        True
+        """
+        zaehler, k = self._zaehler(wert)
+        if zaehler is None:
+            if not self.null:
+                return
+            self.null -= 1
+        else:
+            if not zaehler.get(k):
+                return
+            zaehler[k] -= 1
+            if not zaehler[k]:
+                del zaehler[k]
+        self.n -= 1
+        self.summe -= wert
+        if not self.n:
+            self.summe, self.min, self.max = 0.0, None, None
+            return
+        # Extremwert entfernt → nächster Extremwert nur noch aus den Klassen
+        position = self._position(wert)
+        if position <= self._position(self.min):
+            self.min = self._rang_wert(0)
+        if position >= self._position(self.max):
+            self.max = self._rang_wert(self.n - 1)
+
+    def vereinigen(self, andere: "QuantilSketch") -> None:
+        for eigene, fremde in ((self.pos, andere.pos), (self.neg, andere.neg)):
+            for k, anzahl in fremde.items():
+                eigene[k] = eigene.get(k, 0) + anzahl
+        self.null += andere.null
+        self.n += andere.n
+        self.summe += andere.summe
+        if andere.min is not None:
+            self.min = andere.min if self.min is None else min(self.min, andere.min)
+            self.max = andere.max if self.max is None else max(self.max, andere.max)
+
+    # -------------------------------------------------------------------------
+    # Abfragen
+    # -------------------------------------------------------------------------
+
+    @property
+    def durchschnitt(self) -> float | None:
+        return self.summe / self.n if self.n else None
+
+    @property
+    def minimum(self) -> float | None:
+        return self.min
+
+    @property
+    def maximum(self) -> float | None:
+        return self.max
+
+    def _rang_wert(self, rang: int) -> float:
+        """Geschätzter Wert an Position `rang` (0-basiert) der sortierten Werte."""
+        gezaehlt = 0
+        for k in sorted(self.neg, reverse=True):
+            gezaehlt += self.neg[k]
+            if gezaehlt > rang:
+                return -self._vertreter(k)
+        gezaehlt += self.null
+        if gezaehlt > rang:
+            return 0.0
+        for k in sorted(self.pos):
+            gezaehlt += self.pos[k]
+            if gezaehlt > rang:
+                return self._vertreter(k)
+        return self.max
+
+    def quantil(self, q: float) -> float | None:
+        """Quantil mit linearer Interpolation wie `percentile_cont`."""
+        if not self.n:
+            return None
+        position = q * (self.n - 1)
+        unten = int(position)
+        wert = self._rang_wert(unten)
+        if position > unten:
+            wert += (self._rang_wert(unten + 1) - wert) * (position - unten)
+        return min(max(wert, self.min), self.max)
+
+    @property
+    def median(self) -> float | None:
+        return self.quantil(0.5)
+
+    # -------------------------------------------------------------------------
+    # Serialisierung
+    # -------------------------------------------------------------------------
+
+    def als_dict(self) -> dict:
+        return {
+            "n": self.n, "summe": self.summe, "min": self.min, "max": self.max,
+            "null": self.null,
+            "pos": {str(k): c for k, c in self.pos.items()},
+            "neg": {str(k): c for k, c in self.neg.items()},
+        }
+
+    @classmethod
+    def aus_dict(cls, daten: dict) -> "QuantilSketch":
+        sketch = cls()
+        sketch.n = daten["n"]
+        sketch.summe = daten["summe"]
+        sketch.min = daten["min"]
+        sketch.max = daten["max"]
+        sketch.null = daten["null"]
+        sketch.pos = {int(k): c for k, c in daten["pos"].items()}
+        sketch.neg = {int(k): c for k, c in daten["neg"].items()}
+        return sketch
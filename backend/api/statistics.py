@@ -4,14 +4,16 @@ EEDC Community - Erweiterte Statistiken API
 Diese Endpoints unterstützen das Community-Feature in eedc-homeassistant.
 """
 
+import math
 from datetime import datetime
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func, case, distinct
+from sqlalchemy import select, func, distinct, true
 from sqlalchemy.ext.asyncio import AsyncSession
 from statistics import median, stdev
 
-from core import get_db
-from models import Anlage, Monatswert
+from core import get_read_db, antwort_cache, daten_version, daten_version_abgleichen, schnappschuss
+from core.parallel import parallel_lesen, zeile
+from models import Anlage, CommunityMonat, Monatswert
 from schemas import (
     GlobaleStatistik,
     AusstattungsQuoten,
@@ -27,13 +29,19 @@ from schemas import (
     CommunityGesamtwerte,
     MonatsSumme,
 )
-from .aggregations import compute_speicher_stats
+from .aggregations import (
+    speicher_stats_aus_row,
+    speicher_stats_spalten,
+    spez_jahresertrag_je_anlage,
+)
+from .analytik import analytik, jaz_je_anlage, np, quotient
+from .rollup import lade_buckets, letzte_monate, nach_monat, vereinigte_kpis
 
 router = APIRouter(prefix="/statistics", tags=["Erweiterte Statistiken"])
 
 
 @router.get("/global", response_model=GlobaleStatistik)
-async def get_global_statistics(db: AsyncSession = Depends(get_db)):
+async def get_global_statistics(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert globale Community-Statistiken mit Ausstattungsquoten.
 
@@ -41,12 +49,50 @@ async def get_global_statistics(db: AsyncSession = Depends(get_db)):
     - Statistiken Tab: Ausstattungsquoten
     - Statistiken Tab: "Die typische Community-Anlage"
     """
-    # Anzahl Anlagen
-    result = await db.execute(select(func.count(Anlage.id)))
-    anzahl_anlagen = result.scalar() or 0
+    vorberechnet = schnappschuss.holen("statistics/global")
+    if vorberechnet is not None:
+        return vorberechnet
+    await daten_version_abgleichen(db)
+    cached = antwort_cache.holen("statistics/global")
+    if cached is not None:
+        return cached
+    version = daten_version()
+
+    # Anlagen-Kennzahlen in einem Statement: Anzahl, Regionen, Ø kWp,
+    # Speicher-KPIs, Ausstattungsquoten (FILTER), häufigste Ausrichtung
+    # (mode) und Median-Neigung (percentile_disc → eine echte Neigung).
+    anlagen_abfrage = select(
+        func.count(distinct(Anlage.region)).label("anzahl_regionen"),
+        func.avg(Anlage.kwp).label("avg_kwp"),
+        *speicher_stats_spalten(),
+        func.count(Anlage.id).filter(Anlage.speicher_kwh > 0).label("n_speicher"),
+        func.count(Anlage.id).filter(Anlage.hat_waermepumpe == True).label("n_wp"),
+        func.count(Anlage.id).filter(Anlage.hat_eauto == True).label("n_eauto"),
+        func.count(Anlage.id).filter(Anlage.hat_wallbox == True).label("n_wallbox"),
+        func.count(Anlage.id).filter(Anlage.hat_balkonkraftwerk == True).label("n_bkw"),
+        func.mode().within_group(Anlage.ausrichtung).label("ausrichtung"),
+        func.percentile_disc(0.5).within_group(Anlage.neigung_grad).label("neigung"),
+    )
+
+    # Monatswert-Kennzahlen: spez. Jahresertrag (Fensterfunktion je Anlage)
+    # und Ø Autarkie/Eigenverbrauch als zwei Teilabfragen eines Statements.
+    je_anlage = spez_jahresertrag_je_anlage()
+    monats_abfrage = select(
+        select(func.avg(je_anlage.c.spez_jahresertrag)).scalar_subquery().label("spez_ertrag"),
+        select(func.avg(Monatswert.autarkie_prozent))
+        .where(Monatswert.autarkie_prozent.isnot(None))
+        .scalar_subquery().label("avg_autarkie"),
+        select(func.avg(Monatswert.eigenverbrauch_prozent))
+        .where(Monatswert.autarkie_prozent.isnot(None))
+        .scalar_subquery().label("avg_eigenverbrauch"),
+    )
+
+    # Beide Statements sind unabhängig voneinander (core/parallel.py)
+    anlagen, row = await parallel_lesen(db, zeile(anlagen_abfrage), zeile(monats_abfrage))
+    anzahl_anlagen = anlagen.sp_n_gesamt
 
     if anzahl_anlagen == 0:
-        return GlobaleStatistik(
+        return antwort_cache.ablegen("statistics/global", GlobaleStatistik(
             anzahl_anlagen=0,
             anzahl_regionen=0,
             durchschnitt={
@@ -63,68 +109,31 @@ async def get_global_statistics(db: AsyncSession = Depends(get_db)):
                 kwp=0, ausrichtung="süd", neigung_grad=30, speicher_kwh=None
             ),
             stand=datetime.utcnow().isoformat() + "Z",
-        )
-
-    # Anzahl Regionen
-    result = await db.execute(select(func.count(distinct(Anlage.region))))
-    anzahl_regionen = result.scalar() or 0
+        ), version)
 
-    # Durchschnittswerte
-    result = await db.execute(select(func.avg(Anlage.kwp)))
-    avg_kwp = result.scalar() or 0
-
-    # Speicher-Statistik (SoT-Helper: avg + median + IQR + kWh/kWp)
-    speicher = await compute_speicher_stats(db)
+    anzahl_regionen = anlagen.anzahl_regionen
+    avg_kwp = anlagen.avg_kwp or 0
+    speicher = speicher_stats_aus_row(anlagen)
     avg_speicher = speicher.avg_kwh
 
-    # Durchschnittlicher spez. Ertrag (Jahresertrag)
-    spez_ertrag = await berechne_community_jahresertrag(db)
-
-    # Durchschnittliche Autarkie und Eigenverbrauch
-    result = await db.execute(
-        select(
-            func.avg(Monatswert.autarkie_prozent).label("avg_autarkie"),
-            func.avg(Monatswert.eigenverbrauch_prozent).label("avg_eigenverbrauch"),
-        )
-        .where(Monatswert.autarkie_prozent.isnot(None))
-    )
-    row = result.one()
+    spez_ertrag = row.spez_ertrag or 0
     avg_autarkie = row.avg_autarkie
     avg_eigenverbrauch = row.avg_eigenverbrauch
 
-    # Ausstattungsquoten
-    result = await db.execute(
-        select(
-            func.avg(case((Anlage.speicher_kwh > 0, 1.0), else_=0.0)).label("q_speicher"),
-            func.avg(case((Anlage.hat_waermepumpe == True, 1.0), else_=0.0)).label("q_wp"),
-            func.avg(case((Anlage.hat_eauto == True, 1.0), else_=0.0)).label("q_eauto"),
-            func.avg(case((Anlage.hat_wallbox == True, 1.0), else_=0.0)).label("q_wallbox"),
-            func.avg(case((Anlage.hat_balkonkraftwerk == True, 1.0), else_=0.0)).label("q_bkw"),
-        )
-    )
-    row = result.one()
+    def _quote(n: int) -> float:
+        return round(n / anzahl_anlagen * 100, 1)
 
     ausstattungsquoten = AusstattungsQuoten(
-        speicher=round((row.q_speicher or 0) * 100, 1),
-        waermepumpe=round((row.q_wp or 0) * 100, 1),
-        eauto=round((row.q_eauto or 0) * 100, 1),
-        wallbox=round((row.q_wallbox or 0) * 100, 1),
-        balkonkraftwerk=round((row.q_bkw or 0) * 100, 1),
+        speicher=_quote(anlagen.n_speicher),
+        waermepumpe=_quote(anlagen.n_wp),
+        eauto=_quote(anlagen.n_eauto),
+        wallbox=_quote(anlagen.n_wallbox),
+        balkonkraftwerk=_quote(anlagen.n_bkw),
     )
 
     # Typische Anlage (häufigste Ausrichtung, Median-Neigung)
-    result = await db.execute(
-        select(Anlage.ausrichtung, func.count(Anlage.id).label("cnt"))
-        .group_by(Anlage.ausrichtung)
-        .order_by(func.count(Anlage.id).desc())
-        .limit(1)
-    )
-    row = result.first()
-    typische_ausrichtung = row.ausrichtung if row else "süd"
-
-    result = await db.execute(select(Anlage.neigung_grad))
-    neigungen = [r[0] for r in result.all() if r[0] is not None]
-    typische_neigung = int(median(neigungen)) if neigungen else 30
+    typische_ausrichtung = anlagen.ausrichtung or "süd"
+    typische_neigung = int(anlagen.neigung) if anlagen.neigung is not None else 30
 
     typische_anlage = TypischeAnlage(
         kwp=round(avg_kwp, 1),
@@ -133,7 +142,7 @@ async def get_global_statistics(db: AsyncSession = Depends(get_db)):
         speicher_kwh=round(avg_speicher, 1) if avg_speicher else None,
     )
 
-    return GlobaleStatistik(
+    antwort = GlobaleStatistik(
         anzahl_anlagen=anzahl_anlagen,
         anzahl_regionen=anzahl_regionen,
         durchschnitt={
@@ -162,34 +171,88 @@ async def get_global_statistics(db: AsyncSession = Depends(get_db)):
         typische_anlage=typische_anlage,
         stand=datetime.utcnow().isoformat() + "Z",
     )
+    return antwort_cache.ablegen("statistics/global", antwort, version)
 
 
 @router.get("/global/totals", response_model=CommunityGesamtwerte)
-async def get_global_totals(db: AsyncSession = Depends(get_db)):
+async def get_global_totals(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert aufsummierte Gesamtwerte aller Community-Anlagen.
 
     Verwendet für:
     - Impact Tab: Hero-Banner, Energie-Bilanz, Komponenten-Übersicht
     """
-    # --- Anlage-Aggregate ---
-    result = await db.execute(
+    vorberechnet = schnappschuss.holen("statistics/global/totals")
+    if vorberechnet is not None:
+        return vorberechnet
+    await daten_version_abgleichen(db)
+    cached = antwort_cache.holen("statistics/global/totals")
+    if cached is not None:
+        return cached
+    version = daten_version()
+
+    # Ein Statement, drei CTEs: Anlage-Aggregate, Energie-Summen aus dem
+    # Monats-Rollup (statt Vollscan über monatswerte) und die letzten
+    # 12 Monate. Jede Monatszeile trägt die Gesamtwerte mit; ohne Monate
+    # kommt genau eine Zeile mit NULL-Monat.
+    anlagen_cte = select(
+        func.count(Anlage.id).label("anzahl"),
+        func.sum(Anlage.kwp).label("sum_kwp"),
+        func.sum(func.coalesce(Anlage.speicher_kwh, 0)).label("sum_speicher"),
+        func.count(Anlage.id).filter(Anlage.speicher_kwh > 0).label("n_speicher"),
+        func.count(Anlage.id).filter(Anlage.hat_waermepumpe == True).label("n_wp"),
+        func.count(Anlage.id).filter(Anlage.hat_eauto == True).label("n_eauto"),
+        func.count(Anlage.id).filter(Anlage.hat_wallbox == True).label("n_wallbox"),
+        func.count(Anlage.id).filter(Anlage.hat_balkonkraftwerk == True).label("n_bkw"),
+    ).cte("anlagen_agg")
+
+    summen_cte = select(
+        # Jede Monatszeile zählt in ihrem Bucket genau einmal
+        func.sum(CommunityMonat.anzahl_anlagen).label("n_monate"),
+        func.sum(CommunityMonat.sum_ertrag_kwh).label("sum_ertrag"),
+        func.sum(CommunityMonat.sum_einspeisung_kwh).label("sum_einspeisung"),
+        func.sum(CommunityMonat.sum_netzbezug_kwh).label("sum_netzbezug"),
+        func.sum(CommunityMonat.sum_speicher_ladung_kwh).label("sum_sp_lad"),
+        func.sum(CommunityMonat.sum_speicher_entladung_kwh).label("sum_sp_entl"),
+        func.sum(CommunityMonat.sum_wp_strom_kwh).label("sum_wp_strom"),
+        func.sum(CommunityMonat.sum_wp_waerme_kwh).label("sum_wp_waerme"),
+        func.sum(CommunityMonat.sum_eauto_km).label("sum_eauto_km"),
+        func.sum(CommunityMonat.sum_eauto_ladung_kwh).label("sum_eauto_lad"),
+        func.sum(CommunityMonat.sum_eauto_pv_kwh).label("sum_eauto_pv"),
+        func.sum(CommunityMonat.sum_wallbox_ladung_kwh).label("sum_wb_lad"),
+        func.sum(CommunityMonat.sum_wallbox_pv_kwh).label("sum_wb_pv"),
+        func.sum(CommunityMonat.sum_bkw_erzeugung_kwh).label("sum_bkw"),
+    ).cte("rollup_summen")
+
+    monate_cte = (
         select(
-            func.count(Anlage.id).label("anzahl"),
-            func.sum(Anlage.kwp).label("sum_kwp"),
-            func.sum(func.coalesce(Anlage.speicher_kwh, 0)).label("sum_speicher"),
-            func.count(case((Anlage.speicher_kwh > 0, 1))).label("n_speicher"),
-            func.count(case((Anlage.hat_waermepumpe == True, 1))).label("n_wp"),
-            func.count(case((Anlage.hat_eauto == True, 1))).label("n_eauto"),
-            func.count(case((Anlage.hat_wallbox == True, 1))).label("n_wallbox"),
-            func.count(case((Anlage.hat_balkonkraftwerk == True, 1))).label("n_bkw"),
+            CommunityMonat.jahr,
+            CommunityMonat.monat,
+            func.sum(CommunityMonat.sum_ertrag_kwh).label("monat_ertrag"),
+            func.sum(CommunityMonat.sum_einspeisung_kwh).label("monat_einspeisung"),
+            func.sum(CommunityMonat.anzahl_anlagen).label("monat_anlagen"),
         )
+        .group_by(CommunityMonat.jahr, CommunityMonat.monat)
+        .order_by(CommunityMonat.jahr.desc(), CommunityMonat.monat.desc())
+        .limit(12)
+        .cte("letzte_monate")
     )
-    anlage_row = result.one()
-    anzahl_anlagen = anlage_row.anzahl or 0
+
+    result = await db.execute(
+        select(anlagen_cte, summen_cte, monate_cte)
+        .select_from(
+            anlagen_cte
+            .join(summen_cte, true())
+            .outerjoin(monate_cte, true())
+        )
+        .order_by(monate_cte.c.jahr, monate_cte.c.monat)  # chronologisch
+    )
+    rows = result.all()
+    gesamt = rows[0]
+    anzahl_anlagen = gesamt.anzahl or 0
 
     if anzahl_anlagen == 0:
-        return CommunityGesamtwerte(
+        return antwort_cache.ablegen("statistics/global/totals", CommunityGesamtwerte(
             anzahl_anlagen=0, anzahl_monate_total=0,
             stand=datetime.utcnow().isoformat() + "Z",
             gesamt_kwp=0, gesamt_speicher_kwh=0,
@@ -202,101 +265,75 @@ async def get_global_totals(db: AsyncSession = Depends(get_db)):
             wallbox_ladung_kwh=0, wallbox_pv_kwh=0,
             bkw_anzahl=0, bkw_erzeugung_kwh=0,
             co2_vermieden_kg=0, monatliche_summen=[],
-        )
-
-    # --- Monatswerte-Aggregate (ein Query für alle Summen) ---
-    result = await db.execute(
-        select(
-            func.count(Monatswert.id).label("n_monate"),
-            func.sum(func.coalesce(Monatswert.ertrag_kwh, 0)).label("sum_ertrag"),
-            func.sum(func.coalesce(Monatswert.einspeisung_kwh, 0)).label("sum_einspeisung"),
-            func.sum(func.coalesce(Monatswert.netzbezug_kwh, 0)).label("sum_netzbezug"),
-            func.sum(func.coalesce(Monatswert.speicher_ladung_kwh, 0)).label("sum_sp_lad"),
-            func.sum(func.coalesce(Monatswert.speicher_entladung_kwh, 0)).label("sum_sp_entl"),
-            func.sum(func.coalesce(Monatswert.wp_stromverbrauch_kwh, 0)).label("sum_wp_strom"),
-            func.sum(
-                func.coalesce(Monatswert.wp_heizwaerme_kwh, 0)
-                + func.coalesce(Monatswert.wp_warmwasser_kwh, 0)
-            ).label("sum_wp_waerme"),
-            func.sum(func.coalesce(Monatswert.eauto_km, 0)).label("sum_eauto_km"),
-            func.sum(func.coalesce(Monatswert.eauto_ladung_gesamt_kwh, 0)).label("sum_eauto_lad"),
-            func.sum(func.coalesce(Monatswert.eauto_ladung_pv_kwh, 0)).label("sum_eauto_pv"),
-            func.sum(func.coalesce(Monatswert.wallbox_ladung_kwh, 0)).label("sum_wb_lad"),
-            func.sum(func.coalesce(Monatswert.wallbox_ladung_pv_kwh, 0)).label("sum_wb_pv"),
-            func.sum(func.coalesce(Monatswert.bkw_erzeugung_kwh, 0)).label("sum_bkw"),
-        )
-    )
-    mw_row = result.one()
+        ), version)
 
-    sum_ertrag = float(mw_row.sum_ertrag or 0)
-    sum_einspeisung = float(mw_row.sum_einspeisung or 0)
+    sum_ertrag = float(gesamt.sum_ertrag or 0)
+    sum_einspeisung = float(gesamt.sum_einspeisung or 0)
     eigenverbrauch = max(0, sum_ertrag - sum_einspeisung)
 
-    # --- Monatliche Summen (letzte 12 Monate) ---
-    result = await db.execute(
-        select(
-            Monatswert.jahr,
-            Monatswert.monat,
-            func.sum(func.coalesce(Monatswert.ertrag_kwh, 0)).label("sum_ertrag"),
-            func.sum(func.coalesce(Monatswert.einspeisung_kwh, 0)).label("sum_einspeisung"),
-            func.count(distinct(Monatswert.anlage_id)).label("n_anlagen"),
-        )
-        .group_by(Monatswert.jahr, Monatswert.monat)
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-        .limit(12)
-    )
-    rows = result.all()
-
     monatliche_summen = []
-    for row in reversed(rows):  # Chronologisch sortieren
-        ertrag = float(row.sum_ertrag or 0)
-        einspeisung = float(row.sum_einspeisung or 0)
+    for row in rows:
+        if row.jahr is None:
+            continue
+        ertrag = float(row.monat_ertrag or 0)
+        einspeisung = float(row.monat_einspeisung or 0)
         monatliche_summen.append(MonatsSumme(
             jahr=row.jahr,
             monat=row.monat,
             pv_erzeugung_kwh=round(ertrag, 1),
             eigenverbrauch_kwh=round(max(0, ertrag - einspeisung), 1),
             einspeisung_kwh=round(einspeisung, 1),
-            anzahl_anlagen=row.n_anlagen,
+            anzahl_anlagen=row.monat_anlagen,
         ))
 
     # CO2-Faktor: 0.38 kg/kWh (deutscher Strommix)
     co2_vermieden = eigenverbrauch * 0.38
 
-    return CommunityGesamtwerte(
+    antwort = CommunityGesamtwerte(
         anzahl_anlagen=anzahl_anlagen,
-        anzahl_monate_total=mw_row.n_monate or 0,
+        anzahl_monate_total=gesamt.n_monate or 0,
         stand=datetime.utcnow().isoformat() + "Z",
-        gesamt_kwp=round(float(anlage_row.sum_kwp or 0), 1),
-        gesamt_speicher_kwh=round(float(anlage_row.sum_speicher or 0), 1),
+        gesamt_kwp=round(float(gesamt.sum_kwp or 0), 1),
+        gesamt_speicher_kwh=round(float(gesamt.sum_speicher or 0), 1),
         pv_erzeugung_kwh=round(sum_ertrag, 1),
         pv_einspeisung_kwh=round(sum_einspeisung, 1),
         pv_eigenverbrauch_kwh=round(eigenverbrauch, 1),
-        netzbezug_kwh=round(float(mw_row.sum_netzbezug or 0), 1),
-        speicher_anzahl=anlage_row.n_speicher or 0,
-        speicher_ladung_kwh=round(float(mw_row.sum_sp_lad or 0), 1),
-        speicher_entladung_kwh=round(float(mw_row.sum_sp_entl or 0), 1),
-        wp_anzahl=anlage_row.n_wp or 0,
-        wp_stromverbrauch_kwh=round(float(mw_row.sum_wp_strom or 0), 1),
-        wp_waerme_kwh=round(float(mw_row.sum_wp_waerme or 0), 1),
-        eauto_anzahl=anlage_row.n_eauto or 0,
-        wallbox_anzahl=anlage_row.n_wallbox or 0,
-        eauto_km=round(float(mw_row.sum_eauto_km or 0), 1),
-        eauto_ladung_kwh=round(float(mw_row.sum_eauto_lad or 0), 1),
-        eauto_pv_kwh=round(float(mw_row.sum_eauto_pv or 0), 1),
-        wallbox_ladung_kwh=round(float(mw_row.sum_wb_lad or 0), 1),
-        wallbox_pv_kwh=round(float(mw_row.sum_wb_pv or 0), 1),
-        bkw_anzahl=anlage_row.n_bkw or 0,
-        bkw_erzeugung_kwh=round(float(mw_row.sum_bkw or 0), 1),
+        netzbezug_kwh=round(float(gesamt.sum_netzbezug or 0), 1),
+        speicher_anzahl=gesamt.n_speicher or 0,
+        speicher_ladung_kwh=round(float(gesamt.sum_sp_lad or 0), 1),
+        speicher_entladung_kwh=round(float(gesamt.sum_sp_entl or 0), 1),
+        wp_anzahl=gesamt.n_wp or 0,
+        wp_stromverbrauch_kwh=round(float(gesamt.sum_wp_strom or 0), 1),
+        wp_waerme_kwh=round(float(gesamt.sum_wp_waerme or 0), 1),
+        eauto_anzahl=gesamt.n_eauto or 0,
+        wallbox_anzahl=gesamt.n_wallbox or 0,
+        eauto_km=round(float(gesamt.sum_eauto_km or 0), 1),
+        eauto_ladung_kwh=round(float(gesamt.sum_eauto_lad or 0), 1),
+        eauto_pv_kwh=round(float(gesamt.sum_eauto_pv or 0), 1),
+        wallbox_ladung_kwh=round(float(gesamt.sum_wb_lad or 0), 1),
+        wallbox_pv_kwh=round(float(gesamt.sum_wb_pv or 0), 1),
+        bkw_anzahl=gesamt.n_bkw or 0,
+        bkw_erzeugung_kwh=round(float(gesamt.sum_bkw or 0), 1),
         co2_vermieden_kg=round(co2_vermieden, 1),
         monatliche_summen=monatliche_summen,
     )
+    return antwort_cache.ablegen("statistics/global/totals", antwort, version)
+
+
+async def caches_aufwaermen(db: AsyncSession) -> None:
+    """Füllt den Antwort-Cache dieses Prozesses (beim Start jedes Workers).
+
+    Sonst bezahlt der erste Besucher nach einem Deploy die Aggregation — und
+    zwar einmal pro Worker.
+    """
+    await get_global_statistics(db)
+    await get_global_totals(db)
 
 
 @router.get("/monthly-averages", response_model=MonatlicheDurchschnitte)
 async def get_monthly_averages(
     monate: int = Query(12, ge=1, le=60, description="Anzahl Monate"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert monatliche Community-Durchschnitte (spez. Ertrag).
@@ -305,49 +342,25 @@ async def get_monthly_averages(
     - PV-Ertrag Tab: Monatliche Vergleichslinie
     - Trends Tab: Community-Trend
     """
-    # Letzte Monate ermitteln
-    result = await db.execute(
-        select(Monatswert.jahr, Monatswert.monat)
-        .distinct()
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-        .limit(monate)
-    )
-    monate_list = result.all()
+    monate_list = await letzte_monate(db, monate)
+    buckets = nach_monat(await lade_buckets(db, monate_list))
 
     durchschnitte = []
     for jahr, monat in reversed(monate_list):  # Chronologisch sortieren
-        # Hole alle Monatswerte für diesen Monat mit den zugehörigen Anlagen-kWp
-        result = await db.execute(
-            select(
-                Monatswert.ertrag_kwh,
-                Anlage.kwp
-            )
-            .join(Anlage)
-            .where(Monatswert.jahr == jahr)
-            .where(Monatswert.monat == monat)
-        )
-        rows = result.all()
-
-        if not rows:
-            continue
-
-        # Berechne spezifischen Ertrag
-        spez_ertraege = [r[0] / r[1] for r in rows if r[0] is not None and r[1] and r[1] > 0]
-
-        if spez_ertraege:
-            avg_spez = sum(spez_ertraege) / len(spez_ertraege)
+        spez = vereinigte_kpis(buckets.get((jahr, monat), [])).get("spez_ertrag")
+        if spez:
             durchschnitte.append(MonatsDurchschnitt(
                 jahr=jahr,
                 monat=monat,
-                spez_ertrag_avg=round(avg_spez, 1),
-                anzahl_anlagen=len(spez_ertraege),
+                spez_ertrag_avg=round(spez.durchschnitt, 1),
+                anzahl_anlagen=spez.n,
             ))
 
     return MonatlicheDurchschnitte(monate=durchschnitte)
 
 
 @router.get("/regional", response_model=list[RegionStatistik])
-async def get_regional_statistics(db: AsyncSession = Depends(get_db)):
+async def get_regional_statistics(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert Statistiken pro Region für Deutschland-Karte.
 
@@ -355,6 +368,9 @@ async def get_regional_statistics(db: AsyncSession = Depends(get_db)):
     - Regional Tab: Choropleth-Karte
     - Regional Tab: Bundesland-Vergleich
     """
+    vorberechnet = schnappschuss.holen("statistics/regional")
+    if vorberechnet is not None:
+        return vorberechnet
     from api.stats import get_regionen_statistiken
     return await get_regionen_statistiken(db)
 
@@ -362,7 +378,7 @@ async def get_regional_statistics(db: AsyncSession = Depends(get_db)):
 @router.get("/regional/{region}", response_model=RegionStatistik)
 async def get_region_detail(
     region: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert Detail-Statistiken für eine bestimmte Region.
@@ -407,7 +423,7 @@ METRIC_CONFIG = {
 @router.get("/distributions/{metric}", response_model=Verteilung)
 async def get_distribution(
     metric: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert Verteilungsdaten für Histogramme.
@@ -488,28 +504,9 @@ async def _hole_metrik_werte(db: AsyncSession, metric: str) -> list[float]:
 
     elif metric == "spez_ertrag":
         # Spez. Jahresertrag pro Anlage
-        anlagen_result = await db.execute(select(Anlage))
-        anlagen = anlagen_result.scalars().all()
-
-        werte = []
-        for anlage in anlagen:
-            if not anlage.kwp or anlage.kwp <= 0:
-                continue
-
-            monate_result = await db.execute(
-                select(Monatswert.ertrag_kwh)
-                .where(Monatswert.anlage_id == anlage.id)
-                .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-                .limit(12)
-            )
-            ertraege = [r[0] for r in monate_result.all() if r[0] is not None]
-
-            if len(ertraege) >= 6:
-                jahres_ertrag = (sum(ertraege) / len(ertraege)) * 12
-                spez = jahres_ertrag / anlage.kwp
-                werte.append(spez)
-
-        return werte
+        je_anlage = spez_jahresertrag_je_anlage()
+        result = await db.execute(select(je_anlage.c.spez_jahresertrag))
+        return [r[0] for r in result.all()]
 
     return []
 
@@ -532,7 +529,7 @@ async def get_ranking(
     category: str,
     limit: int = Query(10, ge=1, le=50, description="Anzahl Einträge"),
     anlage_hash: str | None = Query(None, description="Eigene Anlage für Rang-Anzeige"),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """
     Liefert anonyme Top-N Ranglisten.
@@ -552,10 +549,9 @@ async def get_ranking(
         )
 
     config = RANKING_CONFIG[category]
-    ranking_daten = await _berechne_ranking(db, category)
-
-    # Sortieren (absteigend) und limitieren
-    ranking_daten.sort(key=lambda x: x["wert"], reverse=True)
+    ranking_daten = schnappschuss.holen(f"statistics/rankings/{category}")
+    if ranking_daten is None:
+        ranking_daten = await sortiertes_ranking(db, category)
 
     # Eigenen Rang finden
     eigener_rang = None
@@ -588,8 +584,29 @@ async def get_ranking(
     )
 
 
+async def sortiertes_ranking(db: AsyncSession, category: str) -> list[dict]:
+    """Alle Ranking-Einträge einer Kategorie, absteigend sortiert (vorberechenbar)."""
+    ranking_daten = await _berechne_ranking(db, category)
+    ranking_daten.sort(key=lambda x: x["wert"], reverse=True)
+    return ranking_daten
+
+
 async def _berechne_ranking(db: AsyncSession, category: str) -> list[dict]:
     """Berechnet Ranking-Daten für eine Kategorie."""
+    stand = await analytik.stand(db)
+    if stand is not None:
+        werte = _ranking_werte(stand, category)
+        if werte is None:
+            return []
+        return [
+            {"hash": anlage_hash, "wert": wert, "region": region, "kwp": kwp}
+            for anlage_hash, wert, region, kwp in zip(
+                stand.anlagen["anlage_hash"], werte.tolist(),
+                stand.anlagen["region"], stand.anlagen["kwp"].tolist(),
+            )
+            if not math.isnan(wert)
+        ]
+
     anlagen_result = await db.execute(select(Anlage))
     anlagen = anlagen_result.scalars().all()
 
@@ -617,7 +634,7 @@ async def _berechne_ranking_wert(db: AsyncSession, anlage, category: str) -> flo
         monate_result = await db.execute(
             select(Monatswert.ertrag_kwh)
             .where(Monatswert.anlage_id == anlage.id)
-            .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
+            .order_by(Monatswert.periode.desc())
             .limit(12)
         )
         ertraege = [r[0] for r in monate_result.all() if r[0] is not None]
@@ -706,42 +723,48 @@ async def _berechne_ranking_wert(db: AsyncSession, anlage, category: str) -> flo
     return None
 
 
-# =============================================================================
-# Hilfsfunktionen
-# =============================================================================
+def _ranking_werte(stand, category: str):
+    """Ranking-Wert je Anlage aus dem Analytik-Stand (NaN = kein Wert).
 
-async def berechne_community_jahresertrag(db: AsyncSession) -> float:
+    Dieselben Regeln wie `_berechne_ranking_wert`, nur für alle Anlagen auf
+    einmal statt einer Abfrage je Anlage.
     """
-    Berechnet den durchschnittlichen spezifischen Jahresertrag der Community.
-    """
-    # Hole alle Anlagen
-    anlagen_result = await db.execute(select(Anlage))
-    anlagen = anlagen_result.scalars().all()
+    anlagen = stand.anlagen
 
-    if not anlagen:
-        return 0
+    if category == "spez_ertrag":
+        maske = stand.letzte_monate(12) & stand.gesetzt("ertrag_kwh")
+        monate = stand.anzahl_je_anlage(maske)
+        jahres_ertrag = quotient(stand.summe_je_anlage("ertrag_kwh", maske), monate) * 12
+        gueltig = (anlagen["kwp"] > 0) & (monate >= 6)
+        return np.where(gueltig, quotient(jahres_ertrag, anlagen["kwp"]), np.nan)
 
-    jahresertraege = []
+    elif category == "autarkie":
+        return stand.mittel_je_anlage("autarkie_prozent")
 
-    for anlage in anlagen:
-        # Letzte 12 Monate für diese Anlage holen
-        monate_detail = await db.execute(
-            select(Monatswert.ertrag_kwh)
-            .where(Monatswert.anlage_id == anlage.id)
-            .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-            .limit(12)
+    elif category == "speicher_effizienz":
+        from api.components import (
+            WIRKUNGSGRAD_MAX_PROZENT,
+            WIRKUNGSGRAD_MIN_PROZENT,
         )
-        ertraege = [row[0] for row in monate_detail.all() if row[0] is not None]
 
-        if ertraege and anlage.kwp and anlage.kwp > 0:
-            summe_ertrag = sum(ertraege)
-            anzahl_monate = len(ertraege)
-            if anzahl_monate >= 6:  # Mindestens 6 Monate für sinnvolle Hochrechnung
-                jahres_ertrag_hochgerechnet = (summe_ertrag / anzahl_monate) * 12
-                spez_ertrag = jahres_ertrag_hochgerechnet / anlage.kwp
-                jahresertraege.append(spez_ertrag)
+        maske = stand.gesetzt("speicher_ladung_kwh") & stand.gesetzt("speicher_entladung_kwh")
+        ladung = stand.summe_je_anlage("speicher_ladung_kwh", maske)
+        entladung = stand.summe_je_anlage("speicher_entladung_kwh", maske)
+        wirkungsgrad = quotient(entladung, ladung) * 100
+        gueltig = (
+            (anlagen["speicher_kwh"] > 0) & (ladung > 0) & (entladung != 0)
+            & (wirkungsgrad >= WIRKUNGSGRAD_MIN_PROZENT)
+            & (wirkungsgrad <= WIRKUNGSGRAD_MAX_PROZENT)
+        )
+        return np.where(gueltig, wirkungsgrad, np.nan)
 
-    if not jahresertraege:
-        return 0
+    elif category == "jaz":
+        return np.where(anlagen["hat_waermepumpe"], jaz_je_anlage(stand), np.nan)
 
-    return sum(jahresertraege) / len(jahresertraege)
+    elif category == "eauto_pv_anteil":
+        maske = stand.gesetzt("eauto_ladung_gesamt_kwh")
+        ladung = stand.summe_je_anlage("eauto_ladung_gesamt_kwh", maske)
+        pv = stand.summe_je_anlage("eauto_ladung_pv_kwh", maske)
+        return np.where(anlagen["hat_eauto"] & (ladung > 0), quotient(pv, ladung) * 100, np.nan)
+
+    return None
@@ -3,35 +3,61 @@ EEDC Community - Statistiken API
 """
 
 from datetime import datetime
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func, case, distinct
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core import get_db
-from models import Anlage, Monatswert
+from core import get_read_db, schnappschuss
+from core.parallel import parallel_lesen, skalar
+from models import Anlage, CommunityMonat, Monatswert
 from schemas import (
     GesamtStatistik,
+    KpiVerteilung,
     MonatsStatistik,
     RegionStatistik,
     SpeicherStatistik,
     VerfuegbareMonate,
     VerfuegbarerMonat,
 )
-from .aggregations import compute_speicher_stats
+from .aggregations import compute_speicher_stats, durchschnitt_spez_jahresertrag
+from .rollup import (
+    KPI_NAMEN,
+    lade_buckets,
+    lade_buckets_zeitraum,
+    letzte_monate,
+    nach_monat,
+    vereinigte_kpis,
+)
 
 router = APIRouter(prefix="/stats", tags=["Statistiken"])
 
 
 @router.get("", response_model=GesamtStatistik)
-async def get_statistiken(db: AsyncSession = Depends(get_db)):
+async def get_statistiken(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert aggregierte Statistiken über alle Anlagen.
     """
-    # Anzahl Anlagen
-    result = await db.execute(select(func.count(Anlage.id)))
-    anzahl_anlagen = result.scalar() or 0
+    vorberechnet = schnappschuss.holen("stats")
+    if vorberechnet is not None:
+        return vorberechnet
+    # Alle Teile sind voneinander unabhängig — nebenläufig (core/parallel.py)
+    (
+        anzahl_anlagen, anzahl_monatswerte, durchschnitt_kwp, speicher,
+        durchschnitt_spez_ertrag_jahr, regionen, letzte_monate,
+    ) = await parallel_lesen(
+        db,
+        skalar(select(func.count(Anlage.id))),
+        skalar(select(func.count(Monatswert.id))),
+        skalar(select(func.avg(Anlage.kwp))),
+        # Speicher-Statistik (SoT-Helper: avg + median + IQR + kWh/kWp)
+        compute_speicher_stats,
+        # Ø spez. Jahresertrag: je Anlage die letzten 12 Monate, dann Durchschnitt
+        berechne_jahresertrag,
+        get_regionen_statistiken,
+        lambda s: get_monats_statistiken(s, limit=12),
+    )
 
-    if anzahl_anlagen == 0:
+    if not anzahl_anlagen:
         return GesamtStatistik(
             anzahl_anlagen=0,
             anzahl_monatswerte=0,
@@ -43,17 +69,6 @@ async def get_statistiken(db: AsyncSession = Depends(get_db)):
             letzte_monate=[],
         )
 
-    # Anzahl Monatswerte
-    result = await db.execute(select(func.count(Monatswert.id)))
-    anzahl_monatswerte = result.scalar() or 0
-
-    # Durchschnitt kWp
-    result = await db.execute(select(func.avg(Anlage.kwp)))
-    durchschnitt_kwp = result.scalar() or 0
-
-    # Speicher-Statistik (SoT-Helper: avg + median + IQR + kWh/kWp)
-    speicher = await compute_speicher_stats(db)
-
     speicher_schema = SpeicherStatistik(
         anzahl_anlagen_mit_speicher=speicher.n_mit_speicher,
         durchschnitt_kwh=round(speicher.avg_kwh, 1) if speicher.avg_kwh is not None else None,
@@ -65,20 +80,10 @@ async def get_statistiken(db: AsyncSession = Depends(get_db)):
         ),
     )
 
-    # Durchschnittlicher spez. Jahresertrag
-    # Berechnung: Für jede Anlage die letzten 12 Monate summieren, dann Durchschnitt
-    durchschnitt_spez_ertrag_jahr = await berechne_jahresertrag(db)
-
-    # Regionen-Statistiken
-    regionen = await get_regionen_statistiken(db)
-
-    # Letzte 12 Monate
-    letzte_monate = await get_monats_statistiken(db, limit=12)
-
     return GesamtStatistik(
         anzahl_anlagen=anzahl_anlagen,
-        anzahl_monatswerte=anzahl_monatswerte,
-        durchschnitt_kwp=round(durchschnitt_kwp, 1),
+        anzahl_monatswerte=anzahl_monatswerte or 0,
+        durchschnitt_kwp=round(durchschnitt_kwp or 0, 1),
         durchschnitt_speicher_kwh=speicher_schema.durchschnitt_kwh,
         speicher_stats=speicher_schema,
         durchschnitt_spez_ertrag_jahr=round(durchschnitt_spez_ertrag_jahr, 0),
@@ -94,38 +99,7 @@ async def berechne_jahresertrag(db: AsyncSession) -> float:
     Für jede Anlage: Summe der letzten 12 Monate / kWp
     Dann Durchschnitt über alle Anlagen.
     """
-    # Hole alle Anlagen
-    anlagen_result = await db.execute(select(Anlage))
-    anlagen = anlagen_result.scalars().all()
-
-    if not anlagen:
-        return 0
-
-    jahresertraege = []
-
-    for anlage in anlagen:
-        # Letzte 12 Monate für diese Anlage holen
-        monate_detail = await db.execute(
-            select(Monatswert.ertrag_kwh)
-            .where(Monatswert.anlage_id == anlage.id)
-            .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-            .limit(12)
-        )
-        ertraege = [row[0] for row in monate_detail.all() if row[0] is not None]
-
-        if ertraege and anlage.kwp and anlage.kwp > 0:
-            summe_ertrag = sum(ertraege)
-            # Auf 12 Monate hochrechnen wenn weniger vorhanden
-            anzahl_monate = len(ertraege)
-            if anzahl_monate >= 6:  # Mindestens 6 Monate für sinnvolle Hochrechnung
-                jahres_ertrag_hochgerechnet = (summe_ertrag / anzahl_monate) * 12
-                spez_ertrag = jahres_ertrag_hochgerechnet / anlage.kwp
-                jahresertraege.append(spez_ertrag)
-
-    if not jahresertraege:
-        return 0
-
-    return sum(jahresertraege) / len(jahresertraege)
+    return await durchschnitt_spez_jahresertrag(db)
 
 
 async def get_regionen_statistiken(db: AsyncSession) -> list[RegionStatistik]:
@@ -155,224 +129,175 @@ async def get_regionen_statistiken(db: AsyncSession) -> list[RegionStatistik]:
         .order_by(func.count(Anlage.id).desc())
     )
 
-    regionen = []
-    for row in result.all():
-        # Spez. Jahresertrag für diese Region (letzte 12 Monate, hochgerechnet)
-        spez_ertrag = await berechne_region_jahresertrag(db, row.region)
-
-        # Durchschnittliche Autarkie (alle verfügbaren Monatswerte)
-        autarkie_result = await db.execute(
-            select(func.avg(Monatswert.autarkie_prozent))
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.autarkie_prozent.isnot(None))
-        )
-        avg_autarkie = autarkie_result.scalar()
-
-        # Performance: Speicher Ladung + Entladung (getrennt, Ø pro Monat)
-        speicher_result = await db.execute(
-            select(
-                func.avg(Monatswert.speicher_ladung_kwh),
-                func.avg(Monatswert.speicher_entladung_kwh),
-            )
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.speicher_ladung_kwh.isnot(None))
-            .where(Monatswert.speicher_entladung_kwh.isnot(None))
-            .where(Monatswert.speicher_ladung_kwh + Monatswert.speicher_entladung_kwh > 0)
-        )
-        sp = speicher_result.one()
-        avg_speicher_ladung = round(sp[0], 1) if sp[0] else None
-        avg_speicher_entladung = round(sp[1], 1) if sp[1] else None
-
-        # Performance: WP JAZ (Σ Wärme / Σ Strom)
-        wp_result = await db.execute(
-            select(
-                func.sum(Monatswert.wp_heizwaerme_kwh + func.coalesce(Monatswert.wp_warmwasser_kwh, 0)),
-                func.sum(Monatswert.wp_stromverbrauch_kwh),
-            )
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.wp_stromverbrauch_kwh > 0)
-            .where(Monatswert.wp_heizwaerme_kwh.isnot(None))
-        )
-        wp_row = wp_result.one()
-        avg_wp_jaz = round(wp_row[0] / wp_row[1], 2) if wp_row[0] and wp_row[1] else None
-
-        # Performance: E-Auto km + kWh zuhause geladen (gesamt − extern)
-        eauto_result = await db.execute(
-            select(
-                func.avg(Monatswert.eauto_km),
-                func.avg(
-                    Monatswert.eauto_ladung_gesamt_kwh
-                    - func.coalesce(Monatswert.eauto_ladung_extern_kwh, 0)
-                ),
-            )
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.eauto_km.isnot(None))
-            .where(Monatswert.eauto_km > 0)
-        )
-        ea = eauto_result.one()
-        avg_eauto_km = round(ea[0], 0) if ea[0] else None
-        avg_eauto_ladung = round(ea[1], 1) if ea[1] and ea[1] > 0 else None
-
-        # Performance: Wallbox kWh + PV-Anteil (Σ PV / Σ Gesamt)
-        wallbox_result = await db.execute(
-            select(
-                func.avg(Monatswert.wallbox_ladung_kwh),
-                func.sum(Monatswert.wallbox_ladung_pv_kwh),
-                func.sum(Monatswert.wallbox_ladung_kwh),
-            )
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.wallbox_ladung_kwh.isnot(None))
-            .where(Monatswert.wallbox_ladung_kwh > 0)
-        )
-        wb = wallbox_result.one()
-        avg_wallbox_kwh = round(wb[0], 1) if wb[0] else None
-        avg_wallbox_pv_anteil = (
-            round(wb[1] / wb[2] * 100, 1)
-            if wb[1] and wb[2] and wb[2] > 0
-            else None
-        )
+    # Je Region sieben Abfragen; die Regionen sind unabhängig voneinander
+    return await parallel_lesen(
+        db, *(lambda s, row=row: _region_statistik(s, row) for row in result.all())
+    )
 
-        # Performance: BKW Ertrag (Ø pro Monat)
-        bkw_result = await db.execute(
-            select(func.avg(Monatswert.bkw_erzeugung_kwh))
-            .join(Anlage)
-            .where(Anlage.region == row.region)
-            .where(Monatswert.bkw_erzeugung_kwh.isnot(None))
-            .where(Monatswert.bkw_erzeugung_kwh > 0)
-        )
-        avg_bkw_kwh = bkw_result.scalar()
-
-        regionen.append(RegionStatistik(
-            region=row.region,
-            anzahl_anlagen=row.anzahl,
-            durchschnitt_kwp=round(row.avg_kwp, 1),
-            durchschnitt_spez_ertrag=round(spez_ertrag, 0),
-            durchschnitt_autarkie=round(avg_autarkie, 1) if avg_autarkie else None,
-            anteil_mit_speicher=round(row.anteil_speicher * 100, 0),
-            anteil_mit_waermepumpe=round(row.anteil_wp * 100, 0),
-            anteil_mit_eauto=round(row.anteil_eauto * 100, 0),
-            anteil_mit_wallbox=round(row.anteil_wallbox * 100, 0),
-            anteil_mit_balkonkraftwerk=round(row.anteil_bkw * 100, 0),
-            avg_speicher_ladung_kwh=avg_speicher_ladung,
-            avg_speicher_entladung_kwh=avg_speicher_entladung,
-            avg_wp_jaz=avg_wp_jaz,
-            avg_eauto_km=avg_eauto_km,
-            avg_eauto_ladung_kwh=avg_eauto_ladung,
-            avg_wallbox_kwh=avg_wallbox_kwh,
-            avg_wallbox_pv_anteil=avg_wallbox_pv_anteil,
-            avg_bkw_kwh=round(avg_bkw_kwh, 1) if avg_bkw_kwh else None,
-        ))
-
-    return regionen
 
+async def _region_statistik(db: AsyncSession, row) -> RegionStatistik:
+    """Statistik einer Region; `row` aus der Gruppierung in `get_regionen_statistiken`."""
+    # Spez. Jahresertrag für diese Region (letzte 12 Monate, hochgerechnet)
+    spez_ertrag = await berechne_region_jahresertrag(db, row.region)
 
-async def berechne_region_jahresertrag(db: AsyncSession, region: str) -> float:
-    """Berechnet den spezifischen Jahresertrag für eine Region."""
-    # Hole alle Anlagen dieser Region
-    anlagen_result = await db.execute(
-        select(Anlage).where(Anlage.region == region)
+    # Durchschnittliche Autarkie (alle verfügbaren Monatswerte)
+    autarkie_result = await db.execute(
+        select(func.avg(Monatswert.autarkie_prozent))
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.autarkie_prozent.isnot(None))
     )
-    anlagen = anlagen_result.scalars().all()
-
-    if not anlagen:
-        return 0
+    avg_autarkie = autarkie_result.scalar()
 
-    jahresertraege = []
+    # Performance: Speicher Ladung + Entladung (getrennt, Ø pro Monat)
+    speicher_result = await db.execute(
+        select(
+            func.avg(Monatswert.speicher_ladung_kwh),
+            func.avg(Monatswert.speicher_entladung_kwh),
+        )
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.speicher_ladung_kwh.isnot(None))
+        .where(Monatswert.speicher_entladung_kwh.isnot(None))
+        .where(Monatswert.speicher_ladung_kwh + Monatswert.speicher_entladung_kwh > 0)
+    )
+    sp = speicher_result.one()
+    avg_speicher_ladung = round(sp[0], 1) if sp[0] else None
+    avg_speicher_entladung = round(sp[1], 1) if sp[1] else None
 
-    for anlage in anlagen:
-        monate_detail = await db.execute(
-            select(Monatswert.ertrag_kwh)
-            .where(Monatswert.anlage_id == anlage.id)
-            .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-            .limit(12)
+    # Performance: WP JAZ (Σ Wärme / Σ Strom)
+    wp_result = await db.execute(
+        select(
+            func.sum(Monatswert.wp_heizwaerme_kwh + func.coalesce(Monatswert.wp_warmwasser_kwh, 0)),
+            func.sum(Monatswert.wp_stromverbrauch_kwh),
         )
-        ertraege = [row[0] for row in monate_detail.all() if row[0] is not None]
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.wp_stromverbrauch_kwh > 0)
+        .where(Monatswert.wp_heizwaerme_kwh.isnot(None))
+    )
+    wp_row = wp_result.one()
+    avg_wp_jaz = round(wp_row[0] / wp_row[1], 2) if wp_row[0] and wp_row[1] else None
 
-        if ertraege and anlage.kwp and anlage.kwp > 0:
-            summe_ertrag = sum(ertraege)
-            anzahl_monate = len(ertraege)
-            if anzahl_monate >= 6:
-                jahres_ertrag_hochgerechnet = (summe_ertrag / anzahl_monate) * 12
-                spez_ertrag = jahres_ertrag_hochgerechnet / anlage.kwp
-                jahresertraege.append(spez_ertrag)
+    # Performance: E-Auto km + kWh zuhause geladen (gesamt − extern)
+    eauto_result = await db.execute(
+        select(
+            func.avg(Monatswert.eauto_km),
+            func.avg(
+                Monatswert.eauto_ladung_gesamt_kwh
+                - func.coalesce(Monatswert.eauto_ladung_extern_kwh, 0)
+            ),
+        )
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.eauto_km.isnot(None))
+        .where(Monatswert.eauto_km > 0)
+    )
+    ea = eauto_result.one()
+    avg_eauto_km = round(ea[0], 0) if ea[0] else None
+    avg_eauto_ladung = round(ea[1], 1) if ea[1] and ea[1] > 0 else None
 
-    if not jahresertraege:
-        return 0
+    # Performance: Wallbox kWh + PV-Anteil (Σ PV / Σ Gesamt)
+    wallbox_result = await db.execute(
+        select(
+            func.avg(Monatswert.wallbox_ladung_kwh),
+            func.sum(Monatswert.wallbox_ladung_pv_kwh),
+            func.sum(Monatswert.wallbox_ladung_kwh),
+        )
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.wallbox_ladung_kwh.isnot(None))
+        .where(Monatswert.wallbox_ladung_kwh > 0)
+    )
+    wb = wallbox_result.one()
+    avg_wallbox_kwh = round(wb[0], 1) if wb[0] else None
+    avg_wallbox_pv_anteil = (
+        round(wb[1] / wb[2] * 100, 1)
+        if wb[1] and wb[2] and wb[2] > 0
+        else None
+    )
 
-    return sum(jahresertraege) / len(jahresertraege)
+    # Performance: BKW Ertrag (Ø pro Monat)
+    bkw_result = await db.execute(
+        select(func.avg(Monatswert.bkw_erzeugung_kwh))
+        .join(Anlage)
+        .where(Anlage.region == row.region)
+        .where(Monatswert.bkw_erzeugung_kwh.isnot(None))
+        .where(Monatswert.bkw_erzeugung_kwh > 0)
+    )
+    avg_bkw_kwh = bkw_result.scalar()
+
+    return RegionStatistik(
+        region=row.region,
+        anzahl_anlagen=row.anzahl,
+        durchschnitt_kwp=round(row.avg_kwp, 1),
+        durchschnitt_spez_ertrag=round(spez_ertrag, 0),
+        durchschnitt_autarkie=round(avg_autarkie, 1) if avg_autarkie else None,
+        anteil_mit_speicher=round(row.anteil_speicher * 100, 0),
+        anteil_mit_waermepumpe=round(row.anteil_wp * 100, 0),
+        anteil_mit_eauto=round(row.anteil_eauto * 100, 0),
+        anteil_mit_wallbox=round(row.anteil_wallbox * 100, 0),
+        anteil_mit_balkonkraftwerk=round(row.anteil_bkw * 100, 0),
+        avg_speicher_ladung_kwh=avg_speicher_ladung,
+        avg_speicher_entladung_kwh=avg_speicher_entladung,
+        avg_wp_jaz=avg_wp_jaz,
+        avg_eauto_km=avg_eauto_km,
+        avg_eauto_ladung_kwh=avg_eauto_ladung,
+        avg_wallbox_kwh=avg_wallbox_kwh,
+        avg_wallbox_pv_anteil=avg_wallbox_pv_anteil,
+        avg_bkw_kwh=round(avg_bkw_kwh, 1) if avg_bkw_kwh else None,
+    )
 
 
-async def get_monats_statistiken(db: AsyncSession, limit: int = 12) -> list[MonatsStatistik]:
-    """Statistiken pro Monat (letzte X Monate)."""
-    # Letzte Monate ermitteln
-    result = await db.execute(
-        select(Monatswert.jahr, Monatswert.monat)
-        .distinct()
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
-        .limit(limit)
-    )
-    monate = result.all()
-
-    statistiken = []
-    for jahr, monat in monate:
-        # Hole alle Monatswerte für diesen Monat mit den zugehörigen Anlagen-kWp
-        result = await db.execute(
-            select(
-                Monatswert.ertrag_kwh,
-                Anlage.kwp
-            )
-            .join(Anlage)
-            .where(Monatswert.jahr == jahr)
-            .where(Monatswert.monat == monat)
-        )
-        rows = result.all()
+async def berechne_region_jahresertrag(db: AsyncSession, region: str) -> float:
+    """Berechnet den spezifischen Jahresertrag für eine Region."""
+    return await durchschnitt_spez_jahresertrag(db, region)
 
-        if not rows:
-            continue
 
-        # Berechne Statistiken
-        anzahl = len(rows)
-        ertraege = [r[0] for r in rows if r[0] is not None]
-        spez_ertraege = [r[0] / r[1] for r in rows if r[0] is not None and r[1] and r[1] > 0]
+async def get_monats_statistiken(db: AsyncSession, limit: int = 12) -> list[MonatsStatistik]:
+    """Statistiken pro Monat (letzte X Monate), aus dem Monats-Rollup."""
+    monate = await letzte_monate(db, limit)
+    buckets = nach_monat(await lade_buckets(db, monate))
+
+    return [
+        _monats_statistik(jahr, monat, buckets[(jahr, monat)])
+        for jahr, monat in monate
+        if (jahr, monat) in buckets
+    ]
 
-        avg_ertrag = sum(ertraege) / len(ertraege) if ertraege else 0
-        avg_spez = sum(spez_ertraege) / len(spez_ertraege) if spez_ertraege else 0
-        min_spez = min(spez_ertraege) if spez_ertraege else 0
-        max_spez = max(spez_ertraege) if spez_ertraege else 0
 
-        statistiken.append(MonatsStatistik(
-            jahr=jahr,
-            monat=monat,
-            anzahl_anlagen=anzahl,
-            durchschnitt_ertrag_kwh=round(avg_ertrag, 1),
-            durchschnitt_spez_ertrag=round(avg_spez, 1),
-            median_spez_ertrag=round(avg_spez, 1),  # Vereinfacht
-            min_spez_ertrag=round(min_spez, 1),
-            max_spez_ertrag=round(max_spez, 1),
-        ))
+def _monats_statistik(jahr: int, monat: int, buckets: list) -> MonatsStatistik:
+    """Verdichtet die Regionen-Buckets eines Monats zu einer MonatsStatistik."""
+    kpis = vereinigte_kpis(buckets)
+    ertrag = kpis.get("ertrag")
+    spez = kpis.get("spez_ertrag")
 
-    return statistiken
+    return MonatsStatistik(
+        jahr=jahr,
+        monat=monat,
+        anzahl_anlagen=sum(b.anzahl_anlagen for b in buckets),
+        durchschnitt_ertrag_kwh=round(ertrag.durchschnitt, 1) if ertrag else 0,
+        durchschnitt_spez_ertrag=round(spez.durchschnitt, 1) if spez else 0,
+        median_spez_ertrag=round(spez.median, 1) if spez else 0,
+        min_spez_ertrag=round(spez.minimum, 1) if spez else 0,
+        max_spez_ertrag=round(spez.maximum, 1) if spez else 0,
+    )
 
 
 @router.get("/verfuegbare-monate", response_model=VerfuegbareMonate)
-async def get_verfuegbare_monate(db: AsyncSession = Depends(get_db)):
+async def get_verfuegbare_monate(db: AsyncSession = Depends(get_read_db)):
     """
     Liefert alle Monate, für die Community-Daten vorliegen.
     Sortiert chronologisch (neuester zuerst).
     """
     result = await db.execute(
         select(
-            Monatswert.jahr,
-            Monatswert.monat,
-            func.count(distinct(Monatswert.anlage_id)).label("anzahl"),
+            CommunityMonat.jahr,
+            CommunityMonat.monat,
+            func.sum(CommunityMonat.anzahl_anlagen).label("anzahl"),
         )
-        .group_by(Monatswert.jahr, Monatswert.monat)
-        .order_by(Monatswert.jahr.desc(), Monatswert.monat.desc())
+        .group_by(CommunityMonat.jahr, CommunityMonat.monat)
+        .order_by(CommunityMonat.jahr.desc(), CommunityMonat.monat.desc())
     )
     rows = result.all()
 
@@ -392,7 +317,7 @@ async def get_verfuegbare_monate(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/regionen")
-async def get_regionen(db: AsyncSession = Depends(get_db)):
+async def get_regionen(db: AsyncSession = Depends(get_read_db)):
     """Liefert alle Regionen mit Anlagenzahl."""
     result = await db.execute(
         select(Anlage.region, func.count(Anlage.id).label("anzahl"))
@@ -406,14 +331,12 @@ async def get_regionen(db: AsyncSession = Depends(get_db)):
 async def get_monat_detail(
     jahr: int,
     monat: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Detaillierte Statistik für einen bestimmten Monat."""
-    monate = await get_monats_statistiken(db, limit=100)
-
-    for m in monate:
-        if m.jahr == jahr and m.monat == monat:
-            return m
+    buckets = await lade_buckets(db, [(jahr, monat)])
+    if buckets:
+        return _monats_statistik(jahr, monat, buckets)
 
     return MonatsStatistik(
         jahr=jahr,
@@ -425,3 +348,46 @@ async def get_monat_detail(
         min_spez_ertrag=0,
         max_spez_ertrag=0,
     )
+
+
+@router.get("/verteilung/{kpi}", response_model=KpiVerteilung)
+async def get_kpi_verteilung(
+    kpi: str,
+    von_jahr: int = Query(..., ge=2010, le=2050),
+    von_monat: int = Query(1, ge=1, le=12),
+    bis_jahr: int = Query(..., ge=2010, le=2050),
+    bis_monat: int = Query(12, ge=1, le=12),
+    region: str | None = Query(None, min_length=2, max_length=2),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """
+    Median, p25 und p75 eines Monats-KPI für einen beliebigen Zeitraum.
+
+    Vereinigt die Quantil-Sketches der Rollup-Buckets — keine Rohdaten.
+    """
+    if kpi not in KPI_NAMEN:
+        raise HTTPException(status_code=400, detail=f"Unbekannter KPI: {kpi}")
+    if (von_jahr, von_monat) > (bis_jahr, bis_monat):
+        raise HTTPException(status_code=400, detail="Zeitraum-Beginn liegt nach dem Ende")
+
+    buckets = await lade_buckets_zeitraum(
+        db, (von_jahr, von_monat), (bis_jahr, bis_monat), region.upper() if region else None
+    )
+    sketch = vereinigte_kpis(buckets).get(kpi)
+
+    def _r(wert: float | None) -> float | None:
+        return round(wert, 1) if wert is not None else None
+
+    return KpiVerteilung(
+        kpi=kpi,
+        von=f"{von_jahr}-{von_monat:02d}",
+        bis=f"{bis_jahr}-{bis_monat:02d}",
+        region=region.upper() if region else None,
+        anzahl_werte=sketch.n if sketch else 0,
+        durchschnitt=_r(sketch.durchschnitt) if sketch else None,
+        p25=_r(sketch.quantil(0.25)) if sketch else None,
+        median=_r(sketch.median) if sketch else None,
+        p75=_r(sketch.quantil(0.75)) if sketch else None,
+        min=_r(sketch.minimum) if sketch else None,
+        max=_r(sketch.maximum) if sketch else None,
+    )
@@ -3,15 +3,29 @@ EEDC Community - Daten einreichen
 """
 
 import hashlib
+import json
 import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Request
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Awaitable, Callable
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core import settings, get_db
+from core import settings, get_db, async_session, daten_geaendert, daten_version_erhoehen
+from core.idempotenz import idempotenz
+from core.parallel import ohne_zusatzverbindungen
+from core.sammelcommit import Sammelcommit
 from models import Anlage, Monatswert, RateLimit
-from schemas import AnlageSubmitInput, SubmitResponse, BenchmarkData, DeleteResponse
+from schemas import (
+    AnlageSubmitInput, MonatswertInput, SubmitResponse, BenchmarkData, DeleteResponse,
+    MonatsFingerabdruecke,
+)
+from .analytik import analytik
+from .rollup import ROHSPALTEN, beitrag, rollup_anwenden
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/submit", tags=["Einreichen"])
@@ -47,9 +61,8 @@ async def check_rate_limit(db: AsyncSession, ip: str) -> bool:
 
 
 async def record_request(db: AsyncSession, ip: str):
-    """Speichert einen Request für Rate-Limiting."""
+    """Merkt einen Request für Rate-Limiting vor; committet wird mit dem Schreibvorgang."""
     db.add(RateLimit(ip_address=ip))
-    await db.commit()
 
 
 def validate_monatswerte_plausibility(data: AnlageSubmitInput) -> list[str]:
@@ -95,27 +108,24 @@ def validate_monatswerte_plausibility(data: AnlageSubmitInput) -> list[str]:
 async def calculate_benchmark(db: AsyncSession, anlage: Anlage) -> BenchmarkData | None:
     """Berechnet Vergleichsdaten für eine Anlage.
 
-    Nutzt dieselben SoT-Helper wie das Dashboard (`/api/benchmark/anlage/...`),
+    Nutzt dieselbe Grundlage wie das Dashboard (`/api/benchmark/anlage/...`),
     damit Submit-Confirmation und Dashboard konsistent rechnen (rollende letzte
     12 Monate, Mittelwert über pro-Anlage spez. Jahreserträge, echter Rang).
+    `anzahl_anlagen_*` zählt hier alle Anlagen, auch ohne Daten.
     """
-    from .benchmark import (
-        berechne_spez_jahresertrag,
-        berechne_community_durchschnitt,
-        berechne_region_durchschnitt,
-        berechne_rang_und_anzahl,
-    )
+    from .benchmark import lade_benchmark_basis
 
-    spez_ertrag_anlage = await berechne_spez_jahresertrag(db, anlage.id, anlage.kwp)
+    basis = await lade_benchmark_basis(db)
+    spez_ertrag_anlage = basis.spez_ertrag.get(anlage.id, 0)
     if spez_ertrag_anlage <= 0:
         return None
 
-    spez_ertrag_durchschnitt = await berechne_community_durchschnitt(db)
-    spez_ertrag_region = await berechne_region_durchschnitt(db, anlage.region)
-    (rang_gesamt, anzahl_gesamt, _,
-     rang_region, anzahl_region, _) = await berechne_rang_und_anzahl(
-        db, anlage.id, anlage.region
-    )
+    spez_ertrag_durchschnitt = basis.durchschnitt()
+    spez_ertrag_region = basis.durchschnitt(anlage.region)
+    rang_gesamt, _ = basis.rang(anlage.id)
+    rang_region, _ = basis.rang(anlage.id, anlage.region)
+    anzahl_gesamt = basis.anzahl() or 1
+    anzahl_region = basis.anzahl(anlage.region) or 1
 
     return BenchmarkData(
         spez_ertrag_anlage=round(spez_ertrag_anlage, 1),
@@ -128,237 +138,504 @@ async def calculate_benchmark(db: AsyncSession, anlage: Anlage) -> BenchmarkData
     )
 
 
+#: Anlagen-Felder, die jeder Submit vollständig setzt
+ANLAGE_FELDER = (
+    "region", "kwp", "ausrichtung", "neigung_grad", "speicher_kwh", "installation_jahr",
+    "soll_jahr_kwh", "hat_waermepumpe", "wp_art", "hat_eauto", "hat_wallbox",
+    "hat_balkonkraftwerk", "hat_sonstiges", "wallbox_kw", "bkw_wp", "sonstiges_bezeichnung",
+)
+
+#: Monatswert-Felder aus dem Payload. Bewusst alle, auch wenn der Client None
+#: schickt: der Submit ist ein Voll-Submit — der Client sagt, was gilt. Ein
+#: alter Client räumt damit z. B. das SOLL (ab v4.0.22, #387/F-47) ab; das ist
+#: heilbar, ein stehengebliebener falscher Maßstab wäre es nicht.
+MONATS_FELDER = tuple(MonatswertInput.model_fields)
+
+#: Inhalt eines Monats ohne seinen Schlüssel — Grundlage des Fingerabdrucks
+INHALT_FELDER = tuple(feld for feld in MONATS_FELDER if feld not in ("jahr", "monat"))
+
+
+def monats_schluessel(jahr: int, monat: int) -> str:
+    return f"{jahr:04d}-{monat:02d}"
+
+
+def _kanonische_zahl(wert: float) -> str:
+    """Zahl mit genau drei Nachkommastellen, Hälfte vom Betrag her aufgerundet."""
+    text = str(Decimal(wert).quantize(Decimal("0.001"), rounding=ROUND_HALF_UP))
+    return "0.000" if text == "-0.000" else text
+
+
+def monats_fingerabdruck(mw) -> str:
+    """Inhalts-Hash eines Monats — aus `MonatswertInput` oder gespeicherter Zeile.
+
+    SHA-256 über das kompakte JSON der gesetzten Felder (ohne jahr/monat,
+    None weggelassen, Schlüssel sortiert), davon die ersten 16 Hex-Zeichen.
+    Jeder Wert steht darin als String mit genau drei Nachkommastellen
+    (`_kanonische_zahl`, auch Ganzzahlen: `"12.000"`) — so hängt der Hash
+    nicht an der Zahlendarstellung von Python oder dem Client, etwa
+    `{"ertrag_kwh":"412.500","wallbox_ladevorgaenge":"12.000"}`.
+    Der Client rechnet denselben Hash über seinen Payload; ein Feld, das eine
+    Seite noch nicht kennt, ändert ihn nur, wenn es gesetzt ist.
+    """
+    inhalt = {
+        feld: _kanonische_zahl(wert)
+        for feld in INHALT_FELDER if (wert := getattr(mw, feld)) is not None
+    }
+    roh = json.dumps(inhalt, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(roh.encode()).hexdigest()[:16]
+
+
+@dataclass
+class SubmitAuftrag:
+    """Ein validierter Submit, bereit zum Schreiben."""
+    data: AnlageSubmitInput
+    anlage_hash: str
+    warnings: list[str]
+    #: Idempotenz-Schlüssel: Antwort als Quittung in der Schreib-Transaktion ablegen
+    quittung: str | None = None
+
+
+@dataclass
+class SubmitErgebnis:
+    anlage: Anlage
+    message: str
+    #: Alle Monatswerte der Anlage nach dem Submit (für die Analytik)
+    monatswerte: list
+    #: False bei einem Re-Submit ohne jede Änderung — dann wurde nichts geschrieben
+    geaendert: bool = True
+    monate_geaendert: int = 0
+    monate_unveraendert: int = 0
+    monate_geloescht: int = 0
+    #: Inkrementeller Submit: gelistete Monate, die der Server nicht hat
+    fehlende_monate: list[str] = field(default_factory=list)
+    #: Schon vor dem Commit gebaute Antwort (mit Quittung), sonst None
+    antwort: SubmitResponse | None = None
+
+
+async def submits_schreiben(
+    db: AsyncSession, auftraege: list[SubmitAuftrag]
+) -> list[SubmitErgebnis | HTTPException]:
+    """Schreibt Submits in die laufende Transaktion — ohne Commit.
+
+    Je Auftrag ein Ergebnis oder die `HTTPException`, mit der er abgelehnt
+    wurde. Mehrere Aufträge gehen gemeinsam: eine Abfrage für die Anlagen, eine
+    für ihre Monatswerte, ein mehrzeiliges Upsert, ein Rollup-Abgleich. Kommt
+    ein Hash mehrfach vor, laufen seine Aufträge in Runden nacheinander — der
+    spätere gewinnt, wie bei zwei Submits hintereinander.
+    """
+    ergebnisse: list = [None] * len(auftraege)
+    offen = list(enumerate(auftraege))
+    while offen:
+        runde, spaeter, hashes = [], [], set()
+        for i, auftrag in offen:
+            (spaeter if auftrag.anlage_hash in hashes else runde).append((i, auftrag))
+            hashes.add(auftrag.anlage_hash)
+        for (i, _), ergebnis in zip(runde, await _runde_schreiben(db, [a for _, a in runde])):
+            ergebnisse[i] = ergebnis
+        offen = spaeter
+    return ergebnisse
+
+
+async def _runde_schreiben(
+    db: AsyncSession, auftraege: list[SubmitAuftrag]
+) -> list[SubmitErgebnis | HTTPException]:
+    """Wie `submits_schreiben`, jeder Hash höchstens einmal."""
+    result = await db.execute(
+        select(Anlage).where(Anlage.anlage_hash.in_([a.anlage_hash for a in auftraege]))
+    )
+    anlagen = {a.anlage_hash: a for a in result.scalars()}
+
+    # Bisherige Monatswerte einmal laden — für den Abgleich mit dem Payload und
+    # für den Monats-Rollup, der den alten Stand (mit alter Region/kWp) herausrechnet.
+    vorhandene: dict[int, dict[tuple[int, int], Monatswert]] = defaultdict(dict)
+    if anlagen:
+        result = await db.execute(
+            select(Monatswert)
+            .where(Monatswert.anlage_id.in_([a.id for a in anlagen.values()]))
+            .execution_options(populate_existing=True)
+        )
+        for m in result.scalars():
+            vorhandene[m.anlage_id][(m.jahr, m.monat)] = m
+
+    ergebnisse: list = []
+    geschrieben: list[tuple[SubmitAuftrag, SubmitErgebnis, _Abgleich]] = []
+    alt_beitraege = []
+    now = datetime.utcnow()
+    for auftrag in auftraege:
+        data = auftrag.data
+        anlage = anlagen.get(auftrag.anlage_hash)
+        abgleich = _abgleichen(data, vorhandene.get(anlage.id, {}) if anlage else {})
+        if anlage:
+            # Update: Rate-Limit-Fenster rollend 24h prüfen. Wenn das letzte Fenster
+            # leer (Neuanlage / Migration aus Monatszähler-Logik) oder älter als 24h
+            # ist, frisches Fenster starten. Damit sind Reparatur-/Nachpflege-
+            # Sessions möglich, ohne den Spam-Schutz pro Hash aufzugeben.
+            # Issue #254 (kingcap1).
+            window_start = anlage.update_window_start
+            neues_fenster = window_start is None or (now - window_start) > timedelta(hours=24)
+            update_count = 0 if neues_fenster else anlage.update_count
+
+            if update_count >= settings.max_updates_per_24h:
+                logger.warning(
+                    "submit 429 Anlagen-Limit hash=%s update_count=%s window_start=%s",
+                    auftrag.anlage_hash[:12], anlage.update_count, anlage.update_window_start,
+                )
+                ergebnisse.append(HTTPException(
+                    status_code=429,
+                    detail=(
+                        f"Maximale Anzahl Updates ({settings.max_updates_per_24h}) "
+                        f"im 24-Stunden-Fenster erreicht. Bitte später erneut versuchen."
+                    ),
+                ))
+                continue
+
+            # Nur tatsächlich Geändertes schreiben: ein unveränderter Re-Submit
+            # fasst weder Anlage noch Monatswerte an und zählt nicht als Update.
+            felder = [feld for feld in ANLAGE_FELDER if getattr(anlage, feld) != getattr(data, feld)]
+            if felder or abgleich.geaendert or abgleich.entfernt:
+                if {"region", "kwp"} & set(felder):
+                    # Region/kWp stecken in jedem Beitrag — alle Monate neu einrechnen
+                    abgleich.betroffen = set(abgleich.bisher)
+                alt_beitraege += [
+                    beitrag(abgleich.bisher[key], anlage.region, anlage.kwp) for key in abgleich.betroffen
+                ]
+                for feld in felder:
+                    setattr(anlage, feld, getattr(data, feld))
+                if neues_fenster:
+                    anlage.update_window_start = now
+                anlage.update_count = update_count + 1
+                message = "Anlage aktualisiert"
+            else:
+                abgleich.unveraendert = True
+                message = "Anlage unverändert"
+        elif data.monats_schluessel is not None:
+            # Inkrementell heißt "nur die Änderungen" — ohne gespeicherten Stand
+            # entstünde sonst stillschweigend eine Anlage mit fast keinen Monaten
+            ergebnisse.append(HTTPException(
+                status_code=404,
+                detail=(
+                    "Anlage nicht gefunden. Inkrementeller Submit nur für bestehende "
+                    "Anlagen — bitte alle Monate ohne monats_schluessel einreichen."
+                ),
+            ))
+            continue
+        else:
+            anlage = Anlage(
+                anlage_hash=auftrag.anlage_hash,
+                **{feld: getattr(data, feld) for feld in ANLAGE_FELDER},
+            )
+            db.add(anlage)
+            message = "Anlage erstellt"
+        ergebnis = SubmitErgebnis(
+            anlage=anlage,
+            message=message,
+            monatswerte=[],
+            geaendert=not abgleich.unveraendert,
+            monate_geaendert=len(abgleich.geaendert),
+            monate_unveraendert=len(data.monatswerte) - len(abgleich.geaendert),
+            monate_geloescht=len(abgleich.entfernt),
+        )
+        ergebnisse.append(ergebnis)
+        geschrieben.append((auftrag, ergebnis, abgleich))
+
+    if any(ergebnis.geaendert for _, ergebnis, _ in geschrieben):
+        await db.flush()  # IDs neuer Anlagen
+
+    # Geänderte und neue Monatswerte einfügen/aktualisieren — ein Upsert für alle Aufträge
+    upsert = insert(Monatswert.__table__)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["anlage_id", "jahr", "monat"],
+        set_={feld: upsert.excluded[feld] for feld in INHALT_FELDER},
+    ).returning(*Monatswert.__table__.columns)
+    zeilen = [
+        {"anlage_id": ergebnis.anlage.id, **mw.model_dump(include=set(MONATS_FELDER))}
+        for _, ergebnis, abgleich in geschrieben
+        for mw in abgleich.geaendert
+    ]
+    neue_zeilen: dict[int, dict[tuple[int, int], Any]] = defaultdict(dict)
+    if zeilen:
+        for zeile in (await db.execute(upsert, zeilen)).all():
+            neue_zeilen[zeile.anlage_id][(zeile.jahr, zeile.monat)] = zeile
+
+    # N18-2: Vollständigkeits-Submit — Monate dieses Hashes, die im Payload fehlen,
+    # wurden client-seitig entfernt (Datensatz gelöscht oder Korrektur filtert ihn
+    # raus) und werden hier gelöscht. Nur mit explizitem Flag; alte Clients ohne
+    # `monate_vollstaendig` behalten das reine Upsert-Verhalten. Der inkrementelle
+    # Submit sagt dasselbe über `monats_schluessel`, ohne die Werte mitzuschicken.
+    zu_loeschen = []
+    neu_beitraege = []
+    for auftrag, ergebnis, abgleich in geschrieben:
+        anlage = ergebnis.anlage
+        aktuelle = {**abgleich.bisher, **neue_zeilen[anlage.id]}
+        warnings = list(auftrag.warnings)
+        for key in abgleich.entfernt:
+            zu_loeschen.append((aktuelle.pop(key).id, key[0]))
+        if abgleich.entfernt:
+            warnings.append(f"{len(abgleich.entfernt)} rückwirkend entfernte(r) Monat(e) gelöscht")
+        if abgleich.gelistet is not None:
+            ergebnis.fehlende_monate = sorted(abgleich.gelistet - {monats_schluessel(*key) for key in aktuelle})
+            if ergebnis.fehlende_monate:
+                warnings.append(f"{len(ergebnis.fehlende_monate)} Monat(e) fehlen, bitte vollständig senden")
+        ergebnis.message += f" (Hinweise: {', '.join(warnings)})" if warnings else ""
+        ergebnis.monatswerte = list(aktuelle.values())
+        neu_beitraege += [
+            beitrag(m, anlage.region, anlage.kwp) for key, m in aktuelle.items()
+            if key in abgleich.betroffen or key in neue_zeilen[anlage.id]
+        ]
+    if zu_loeschen:
+        # Mit den Jahren, damit nur deren Partitionen durchsucht werden
+        ids, jahre = zip(*zu_loeschen)
+        await db.execute(
+            delete(Monatswert).where(Monatswert.id.in_(ids), Monatswert.jahr.in_(set(jahre)))
+        )
+
+    # Monats-Rollup in derselben Transaktion nachführen
+    if alt_beitraege or neu_beitraege:
+        await db.flush()
+        await rollup_anwenden(db, alt_beitraege, neu_beitraege)
+    return ergebnisse
+
+
+@dataclass
+class _Abgleich:
+    """Payload gegen gespeicherten Stand einer Anlage."""
+    bisher: dict[tuple[int, int], Monatswert]
+    #: Neue oder inhaltlich geänderte Monate aus dem Payload
+    geaendert: list[MonatswertInput]
+    #: Gespeicherte Monate, die laut Client nicht mehr existieren
+    entfernt: list[tuple[int, int]]
+    #: Alle Monate laut Client ("JJJJ-MM"), None ohne Löschabgleich
+    gelistet: set[str] | None
+    #: Gespeicherte Monate, deren Rollup-Beitrag sich ändert
+    betroffen: set[tuple[int, int]]
+    unveraendert: bool = False
+
+
+def _abgleichen(data: AnlageSubmitInput, bisher: dict[tuple[int, int], Monatswert]) -> _Abgleich:
+    """Ein Durchgang über den Payload: was ist neu, geändert, entfernt?"""
+    geaendert = [
+        mw for mw in data.monatswerte
+        if (alt := bisher.get((mw.jahr, mw.monat))) is None
+        or any(getattr(alt, feld) != getattr(mw, feld) for feld in INHALT_FELDER)
+    ]
+    if data.monats_schluessel is not None:
+        gelistet = set(data.monats_schluessel)
+    elif data.monate_vollstaendig:
+        gelistet = {monats_schluessel(mw.jahr, mw.monat) for mw in data.monatswerte}
+    else:
+        gelistet = None
+    entfernt = [] if gelistet is None else [key for key in bisher if monats_schluessel(*key) not in gelistet]
+    betroffen = {(mw.jahr, mw.monat) for mw in geaendert if (mw.jahr, mw.monat) in bisher} | set(entfernt)
+    return _Abgleich(bisher, geaendert, entfernt, gelistet, betroffen)
+
+
+async def submits_festschreiben(
+    db: AsyncSession, auftraege: list[SubmitAuftrag]
+) -> list[SubmitErgebnis | HTTPException]:
+    """`submits_schreiben` plus Datenversion, Commit und Analytik-Delta.
+
+    Die Datenversion steigt nur, wenn wirklich etwas geändert wurde — ein
+    unveränderter Re-Submit lässt alle Caches stehen.
+    """
+    ergebnisse = await submits_schreiben(db, auftraege)
+    for auftrag, ergebnis in zip(auftraege, ergebnisse):
+        if auftrag.quittung is not None and isinstance(ergebnis, SubmitErgebnis):
+            # Antwort samt Benchmark schon jetzt bauen und mit den Daten
+            # festschreiben — jeder Worker liefert bei der Wiederholung dieselbe
+            with ohne_zusatzverbindungen():
+                ergebnis.antwort = await _antwort(db, auftrag, ergebnis)
+            await idempotenz.quittung_ablegen(
+                db, auftrag.quittung, ergebnis.antwort.model_dump(mode="json")
+            )
+    geschrieben = [e for e in ergebnisse if isinstance(e, SubmitErgebnis) and e.geaendert]
+    if not geschrieben:
+        # Nichts geschrieben: die Lese-Transaktion beenden. Commit statt
+        # Rollback, damit die geladenen Anlagen für den Benchmark gültig bleiben.
+        await db.commit()
+        return ergebnisse
+
+    version = await daten_version_erhoehen(db, (e.anlage.id for e in geschrieben))
+    await db.commit()
+    daten_geaendert(version)
+    analytik.anlagen_geaendert([(e.anlage, e.monatswerte) for e in geschrieben], version)
+    return ergebnisse
+
+
+async def _sammel_festschreiben(auftraege: list[SubmitAuftrag]) -> list:
+    async with async_session() as db:
+        return await submits_festschreiben(db, auftraege)
+
+
+#: Gruppen-Commit der Submits (nur mit SAMMELCOMMIT_AKTIV=true)
+sammelcommit = Sammelcommit(
+    _sammel_festschreiben,
+    max_auftraege=settings.sammelcommit_max_auftraege,
+    wartezeit=settings.sammelcommit_wartezeit_ms / 1000,
+)
+
+
+async def _idempotent(
+    request: Request,
+    response: Response,
+    idempotency_key: str | None,
+    ausfuehren: Callable[[str | None], Awaitable[Any]],
+    quittung_db: AsyncSession | None = None,
+) -> Any:
+    """Mit `Idempotency-Key`: gespeicherte Antwort einer früheren gleichen Anfrage
+    liefern statt erneut auszuführen (core/idempotenz.py).
+
+    Mit `quittung_db` auch die Quittung aus der Datenbank, die ein anderer
+    Worker abgelegt hat; `ausfuehren` bekommt dann den Schlüssel, um seine
+    eigene in der Schreib-Transaktion abzulegen.
+    """
+    if idempotency_key is None:
+        return await ausfuehren(None)
+    schluessel = idempotenz.schluessel(
+        request.method, request.url.path, idempotency_key, await request.body()
+    )
+    aus_quittung = False
+
+    async def erzeugen() -> Any:
+        nonlocal aus_quittung
+        if quittung_db is not None:
+            quittung = await idempotenz.quittung_holen(quittung_db, schluessel)
+            if quittung is not None:
+                aus_quittung = True
+                return quittung
+        return await ausfuehren(schluessel)
+
+    antwort, wiederholt = await idempotenz.ausfuehren(schluessel, erzeugen)
+    if wiederholt or aus_quittung:
+        response.headers["Idempotent-Replayed"] = "true"
+    return antwort
+
+
 @router.post("", response_model=SubmitResponse)
 async def submit_anlage(
     data: AnlageSubmitInput,
     request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Reicht Anlagendaten ein oder aktualisiert bestehende.
 
     - Neue Anlage: Wird erstellt mit generiertem Hash
-    - Bestehende Anlage (gleicher Hash): Monatswerte werden ergänzt/aktualisiert
+    - Bestehende Anlage (gleicher Hash): Monatswerte werden ergänzt/aktualisiert;
+      geschrieben wird nur, was sich gegenüber dem gespeicherten Stand ändert
+
+    Inkrementell (`monats_schluessel` gesetzt): nur geänderte Monate senden,
+    Abgleich vorher über `GET /api/submit/{hash}/fingerabdruecke`. Nur für
+    bestehende Anlagen (sonst 404).
+
+    Mit `SAMMELCOMMIT_AKTIV=true` schreibt ein gemeinsamer Task gleichzeitige
+    Submits in einer Transaktion (core/sammelcommit.py); die Antwort ist
+    dieselbe.
+
+    Mit Header `Idempotency-Key` liefert eine Wiederholung mit gleichem Body
+    die gespeicherte Antwort, ohne erneut zu schreiben — auch auf einem
+    anderen Worker (Quittung in der Datenbank).
     """
+    return await _idempotent(
+        request, response, idempotency_key,
+        lambda quittung: _submit(data, db, quittung), quittung_db=db,
+    )
+
+
+async def _submit(data: AnlageSubmitInput, db: AsyncSession, quittung: str | None = None) -> SubmitResponse:
     # Hash generieren falls nicht angegeben
     anlage_hash = data.anlage_hash or generate_anlage_hash(data)
 
-    # Bestehende Anlage suchen
-    result = await db.execute(
-        select(Anlage).where(Anlage.anlage_hash == anlage_hash)
-    )
-    anlage = result.scalar_one_or_none()
-
     # Plausibilität prüfen
     warnings = validate_monatswerte_plausibility(data)
+    auftrag = SubmitAuftrag(data=data, anlage_hash=anlage_hash, warnings=warnings, quittung=quittung)
 
-    if anlage:
-        # Update: Rate-Limit-Fenster rollend 24h prüfen. Wenn das letzte Fenster
-        # leer (Neuanlage / Migration aus Monatszähler-Logik) oder älter als 24h
-        # ist, frisches Fenster starten. Damit sind Reparatur-/Nachpflege-
-        # Sessions möglich, ohne den Spam-Schutz pro Hash aufzugeben.
-        # Issue #254 (kingcap1).
-        now = datetime.utcnow()
-        window_start = anlage.update_window_start
-        if window_start is None or (now - window_start) > timedelta(hours=24):
-            anlage.update_window_start = now
-            anlage.update_count = 0
-
-        if anlage.update_count >= settings.max_updates_per_24h:
-            logger.warning(
-                "submit 429 Anlagen-Limit hash=%s update_count=%s window_start=%s",
-                anlage_hash[:12], anlage.update_count, anlage.update_window_start,
-            )
-            raise HTTPException(
-                status_code=429,
-                detail=(
-                    f"Maximale Anzahl Updates ({settings.max_updates_per_24h}) "
-                    f"im 24-Stunden-Fenster erreicht. Bitte später erneut versuchen."
-                ),
-            )
-
-        # Anlagendaten aktualisieren (alle Felder, nicht nur Komponenten)
-        anlage.region = data.region
-        anlage.kwp = data.kwp
-        anlage.ausrichtung = data.ausrichtung
-        anlage.neigung_grad = data.neigung_grad
-        anlage.speicher_kwh = data.speicher_kwh
-        anlage.installation_jahr = data.installation_jahr
-        anlage.soll_jahr_kwh = data.soll_jahr_kwh
-        anlage.hat_waermepumpe = data.hat_waermepumpe
-        anlage.wp_art = data.wp_art
-        anlage.hat_eauto = data.hat_eauto
-        anlage.hat_wallbox = data.hat_wallbox
-        anlage.hat_balkonkraftwerk = data.hat_balkonkraftwerk
-        anlage.hat_sonstiges = data.hat_sonstiges
-        anlage.wallbox_kw = data.wallbox_kw
-        anlage.bkw_wp = data.bkw_wp
-        anlage.sonstiges_bezeichnung = data.sonstiges_bezeichnung
-        anlage.update_count += 1
-        message = "Anlage aktualisiert"
+    if settings.sammelcommit_aktiv:
+        ergebnis = await sammelcommit.einreihen(auftrag)
     else:
-        # Neue Anlage erstellen
-        anlage = Anlage(
-            anlage_hash=anlage_hash,
-            region=data.region,
-            kwp=data.kwp,
-            ausrichtung=data.ausrichtung,
-            neigung_grad=data.neigung_grad,
-            speicher_kwh=data.speicher_kwh,
-            installation_jahr=data.installation_jahr,
-            soll_jahr_kwh=data.soll_jahr_kwh,
-            hat_waermepumpe=data.hat_waermepumpe,
-            wp_art=data.wp_art,
-            hat_eauto=data.hat_eauto,
-            hat_wallbox=data.hat_wallbox,
-            hat_balkonkraftwerk=data.hat_balkonkraftwerk,
-            hat_sonstiges=data.hat_sonstiges,
-            wallbox_kw=data.wallbox_kw,
-            bkw_wp=data.bkw_wp,
-            sonstiges_bezeichnung=data.sonstiges_bezeichnung,
-        )
-        db.add(anlage)
-        await db.flush()  # ID generieren
-        message = "Anlage erstellt"
-
-    # Monatswerte einfügen/aktualisieren
-    for mw in data.monatswerte:
-        # Bestehenden Monatswert suchen
-        result = await db.execute(
-            select(Monatswert)
-            .where(Monatswert.anlage_id == anlage.id)
-            .where(Monatswert.jahr == mw.jahr)
-            .where(Monatswert.monat == mw.monat)
-        )
-        existing = result.scalar_one_or_none()
-
-        if existing:
-            # Aktualisieren - Basis
-            existing.ertrag_kwh = mw.ertrag_kwh
-            existing.einspeisung_kwh = mw.einspeisung_kwh
-            existing.netzbezug_kwh = mw.netzbezug_kwh
-            existing.autarkie_prozent = mw.autarkie_prozent
-            existing.eigenverbrauch_prozent = mw.eigenverbrauch_prozent
-            # Maßstab + Kanon-Größen (ab eedc v4.0.22, #387/F-47). Bewusst auch
-            # dann gesetzt, wenn der Client None schickt: der Submit ist ein
-            # Voll-Submit — der Client sagt, was gilt. Ein alter Client räumt das
-            # SOLL damit ab; das ist heilbar, ein stehengebliebener falscher
-            # Maßstab wäre es nicht.
-            existing.soll_ertrag_kwh = mw.soll_ertrag_kwh
-            existing.co2_vermieden_kg = mw.co2_vermieden_kg
-            existing.eigenverbrauch_kwh = mw.eigenverbrauch_kwh
-            # Speicher
-            existing.speicher_ladung_kwh = mw.speicher_ladung_kwh
-            existing.speicher_entladung_kwh = mw.speicher_entladung_kwh
-            existing.speicher_ladung_netz_kwh = mw.speicher_ladung_netz_kwh
-            # Wärmepumpe
-            existing.wp_stromverbrauch_kwh = mw.wp_stromverbrauch_kwh
-            existing.wp_heizwaerme_kwh = mw.wp_heizwaerme_kwh
-            existing.wp_warmwasser_kwh = mw.wp_warmwasser_kwh
-            # E-Auto
-            existing.eauto_ladung_gesamt_kwh = mw.eauto_ladung_gesamt_kwh
-            existing.eauto_ladung_pv_kwh = mw.eauto_ladung_pv_kwh
-            existing.eauto_ladung_extern_kwh = mw.eauto_ladung_extern_kwh
-            existing.eauto_km = mw.eauto_km
-            existing.eauto_v2h_kwh = mw.eauto_v2h_kwh
-            # Wallbox
-            existing.wallbox_ladung_kwh = mw.wallbox_ladung_kwh
-            existing.wallbox_ladung_pv_kwh = mw.wallbox_ladung_pv_kwh
-            existing.wallbox_ladevorgaenge = mw.wallbox_ladevorgaenge
-            # Balkonkraftwerk
-            existing.bkw_erzeugung_kwh = mw.bkw_erzeugung_kwh
-            existing.bkw_eigenverbrauch_kwh = mw.bkw_eigenverbrauch_kwh
-            existing.bkw_speicher_ladung_kwh = mw.bkw_speicher_ladung_kwh
-            existing.bkw_speicher_entladung_kwh = mw.bkw_speicher_entladung_kwh
-            # Sonstiges
-            existing.sonstiges_verbrauch_kwh = mw.sonstiges_verbrauch_kwh
-        else:
-            # Neu erstellen
-            db.add(Monatswert(
-                anlage_id=anlage.id,
-                jahr=mw.jahr,
-                monat=mw.monat,
-                ertrag_kwh=mw.ertrag_kwh,
-                einspeisung_kwh=mw.einspeisung_kwh,
-                netzbezug_kwh=mw.netzbezug_kwh,
-                autarkie_prozent=mw.autarkie_prozent,
-                eigenverbrauch_prozent=mw.eigenverbrauch_prozent,
-                # Maßstab + Kanon-Größen vom Client (ab eedc v4.0.22, #387/F-47).
-                # Werden ab dem 01.09.2026 ausgewertet; bis dahin nur gespeichert.
-                soll_ertrag_kwh=mw.soll_ertrag_kwh,
-                co2_vermieden_kg=mw.co2_vermieden_kg,
-                eigenverbrauch_kwh=mw.eigenverbrauch_kwh,
-                # Speicher
-                speicher_ladung_kwh=mw.speicher_ladung_kwh,
-                speicher_entladung_kwh=mw.speicher_entladung_kwh,
-                speicher_ladung_netz_kwh=mw.speicher_ladung_netz_kwh,
-                # Wärmepumpe
-                wp_stromverbrauch_kwh=mw.wp_stromverbrauch_kwh,
-                wp_heizwaerme_kwh=mw.wp_heizwaerme_kwh,
-                wp_warmwasser_kwh=mw.wp_warmwasser_kwh,
-                # E-Auto
-                eauto_ladung_gesamt_kwh=mw.eauto_ladung_gesamt_kwh,
-                eauto_ladung_pv_kwh=mw.eauto_ladung_pv_kwh,
-                eauto_ladung_extern_kwh=mw.eauto_ladung_extern_kwh,
-                eauto_km=mw.eauto_km,
-                eauto_v2h_kwh=mw.eauto_v2h_kwh,
-                # Wallbox
-                wallbox_ladung_kwh=mw.wallbox_ladung_kwh,
-                wallbox_ladung_pv_kwh=mw.wallbox_ladung_pv_kwh,
-                wallbox_ladevorgaenge=mw.wallbox_ladevorgaenge,
-                # Balkonkraftwerk
-                bkw_erzeugung_kwh=mw.bkw_erzeugung_kwh,
-                bkw_eigenverbrauch_kwh=mw.bkw_eigenverbrauch_kwh,
-                bkw_speicher_ladung_kwh=mw.bkw_speicher_ladung_kwh,
-                bkw_speicher_entladung_kwh=mw.bkw_speicher_entladung_kwh,
-                # Sonstiges
-                sonstiges_verbrauch_kwh=mw.sonstiges_verbrauch_kwh,
-            ))
-
-    # N18-2: Vollständigkeits-Submit — Monate dieses Hashes, die im Payload fehlen,
-    # wurden client-seitig entfernt (Datensatz gelöscht oder Korrektur filtert ihn
-    # raus) und werden hier gelöscht. Nur mit explizitem Flag; alte Clients ohne
-    # `monate_vollstaendig` behalten das reine Upsert-Verhalten.
-    geloescht = 0
-    if data.monate_vollstaendig:
-        gesendet = {(mw.jahr, mw.monat) for mw in data.monatswerte}
-        result = await db.execute(
-            select(Monatswert).where(Monatswert.anlage_id == anlage.id)
-        )
-        for vorhandenen_monat in result.scalars():
-            if (vorhandenen_monat.jahr, vorhandenen_monat.monat) not in gesendet:
-                await db.delete(vorhandenen_monat)
-                geloescht += 1
-    if geloescht:
-        warnings.append(f"{geloescht} rückwirkend entfernte(r) Monat(e) gelöscht")
+        ergebnis = (await submits_festschreiben(db, [auftrag]))[0]
+    if isinstance(ergebnis, Exception):
+        raise ergebnis
+    return ergebnis.antwort or await _antwort(db, auftrag, ergebnis)
 
-    await db.commit()
-    await db.refresh(anlage)
 
+async def _antwort(db: AsyncSession, auftrag: SubmitAuftrag, ergebnis: SubmitErgebnis) -> SubmitResponse:
     # Benchmark berechnen
-    benchmark = await calculate_benchmark(db, anlage)
+    benchmark = await calculate_benchmark(db, ergebnis.anlage)
 
     return SubmitResponse(
         success=True,
-        message=message + (f" (Hinweise: {', '.join(warnings)})" if warnings else ""),
-        anlage_hash=anlage_hash,
-        anzahl_monate=len(data.monatswerte),
+        message=ergebnis.message,
+        anlage_hash=auftrag.anlage_hash,
+        anzahl_monate=len(ergebnis.monatswerte),
         benchmark=benchmark,
+        monate_geaendert=ergebnis.monate_geaendert,
+        monate_unveraendert=ergebnis.monate_unveraendert,
+        monate_geloescht=ergebnis.monate_geloescht,
+        fehlende_monate=ergebnis.fehlende_monate,
+    )
+
+
+@router.get("/{anlage_hash}/fingerabdruecke", response_model=MonatsFingerabdruecke)
+async def monats_fingerabdruecke(
+    anlage_hash: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Inhalts-Hash je gespeichertem Monat einer Anlage.
+
+    Grundlage des inkrementellen Submits: Der Client vergleicht mit
+    `monats_fingerabdruck` über seine eigenen Monate und schickt nur die
+    abweichenden, dazu alle Monatsschlüssel in `monats_schluessel`.
+
+    Hash je Monat: erste 16 Hex-Zeichen von SHA-256 über das kompakte JSON
+    (Schlüssel sortiert, ohne Leerzeichen) der gesetzten Felder außer
+    jahr/monat; jeder Wert als String mit genau drei Nachkommastellen,
+    Hälfte vom Betrag her aufgerundet, `-0.000` als `0.000`.
+    """
+    anlage_id = (await db.execute(
+        select(Anlage.id).where(Anlage.anlage_hash == anlage_hash)
+    )).scalar_one_or_none()
+    if anlage_id is None:
+        raise HTTPException(status_code=404, detail="Anlage nicht gefunden")
+
+    result = await db.execute(
+        select(Monatswert.jahr, Monatswert.monat, *(getattr(Monatswert, feld) for feld in INHALT_FELDER))
+        .where(Monatswert.anlage_id == anlage_id)
+        .order_by(Monatswert.periode)
     )
+    monate = {monats_schluessel(row.jahr, row.monat): monats_fingerabdruck(row) for row in result}
+    return MonatsFingerabdruecke(anlage_hash=anlage_hash, anzahl_monate=len(monate), monate=monate)
 
 
 @router.delete("/{anlage_hash}", response_model=DeleteResponse)
 async def delete_anlage(
     anlage_hash: str,
     request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key", max_length=255),
 ):
     """
     Löscht eine Anlage und alle zugehörigen Monatswerte.
 
     Der Anlage-Hash dient als Authentifizierung - nur wer den Hash kennt,
     kann die Daten löschen. Der Hash wird nur beim Teilen zurückgegeben.
+    Mit `Idempotency-Key` bekommt eine Wiederholung die ursprüngliche
+    Bestätigung statt 404 — auch von einem anderen Worker, die Quittung
+    liegt in der Datenbank.
     """
+    return await _idempotent(
+        request, response, idempotency_key,
+        lambda quittung: _loeschen(anlage_hash, request, db, quittung),
+        quittung_db=db,
+    )
+
+
+async def _loeschen(
+    anlage_hash: str, request: Request, db: AsyncSession, quittung: str | None = None
+) -> DeleteResponse:
     # Rate Limiting
     client_ip = request.client.host if request.client else "unknown"
     if not await check_rate_limit(db, client_ip):
@@ -379,11 +656,17 @@ async def delete_anlage(
             detail="Anlage nicht gefunden. Ungültiger Hash oder bereits gelöscht."
         )
 
-    # Anzahl der Monatswerte für Rückmeldung
+    # Beiträge zum Monats-Rollup herausrechnen, solange die Rohdaten noch da sind
     result = await db.execute(
-        select(func.count(Monatswert.id)).where(Monatswert.anlage_id == anlage.id)
+        select(*ROHSPALTEN).where(Monatswert.anlage_id == anlage.id)
+    )
+    rows = result.all()
+    await rollup_anwenden(
+        db, [beitrag(row, anlage.region, anlage.kwp) for row in rows], []
     )
-    anzahl_monate = result.scalar() or 0
+
+    # Anzahl der Monatswerte für Rückmeldung
+    anzahl_monate = len(rows)
 
     # Monatswerte löschen (CASCADE sollte das auch machen, aber explizit ist sicherer)
     await db.execute(
@@ -393,13 +676,21 @@ async def delete_anlage(
     # Anlage löschen
     await db.delete(anlage)
 
-    # Request für Rate-Limiting speichern
-    await record_request(db, client_ip)
-
-    await db.commit()
-
-    return DeleteResponse(
+    antwort = DeleteResponse(
         success=True,
         message="Deine Anlage und alle Monatswerte wurden vollständig gelöscht.",
         anzahl_geloeschte_monate=anzahl_monate,
     )
+
+    # Request für Rate-Limiting und Idempotenz-Quittung speichern — alles in
+    # einer Transaktion mit der Versionserhöhung, sonst liefern die
+    # Antwort-Caches die Anlage weiter
+    await record_request(db, client_ip)
+    if quittung is not None:
+        await idempotenz.quittung_ablegen(db, quittung, antwort.model_dump())
+    version = await daten_version_erhoehen(db, [anlage.id])
+    await db.commit()
+    daten_geaendert(version)
+    analytik.anlage_entfernt(anlage.id, version)
+
+    return antwort
@@ -11,8 +11,10 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select, func, extract, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core import get_db
+from core import get_read_db, schnappschuss
 from models import Anlage, Monatswert
+from .aggregations import periode
+from .analytik import analytik, np
 from schemas import (
     TrendPunkt,
     TrendDaten,
@@ -26,7 +28,7 @@ router = APIRouter(prefix="/trends", tags=["Trends"])
 # WICHTIG: /degradation MUSS vor /{period} stehen, sonst wird es als period="degradation" gematcht!
 @router.get("/degradation", response_model=DegradationsAnalyse)
 async def get_degradation(
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Ertrags-Analyse nach Anlagenalter.
@@ -35,13 +37,53 @@ async def get_degradation(
     Anlagenalter (Jahre seit Installation). Ermöglicht Rückschlüsse
     auf die typische Degradation von PV-Anlagen.
     """
+    vorberechnet = schnappschuss.holen("trends/degradation")
+    if vorberechnet is not None:
+        return vorberechnet
     now = datetime.now()
-    aktuelles_jahr = now.year
 
     # Spezifischen Ertrag nach Anlagenalter berechnen
     # Nur Anlagen mit vollständigen Jahreswerten (mind. 3 Anlagen)
 
+    stand = await analytik.stand(db)
+    if stand is not None:
+        zeilen = _alter_zeilen(stand, now)
+    else:
+        zeilen = await _alter_zeilen_sql(db, now)
+
     alter_stats = []
+    for alter, anzahl, gesamt_erzeugung, gesamt_kwp in zeilen:
+        if anzahl and anzahl >= 3 and gesamt_kwp and gesamt_kwp > 0:
+            # Spezifischer Ertrag = Gesamterzeugung / Gesamt-kWp
+            spez_ertrag = gesamt_erzeugung / gesamt_kwp
+            alter_stats.append(AlterErtrag(
+                alter_jahre=alter,
+                anzahl=anzahl,
+                durchschnitt_spez_ertrag=round(spez_ertrag, 0)
+            ))
+
+    # Degradation berechnen (lineare Regression)
+    degradation_prozent = 0.0
+    if len(alter_stats) >= 3:
+        # Einfache lineare Approximation
+        erster_ertrag = alter_stats[0].durchschnitt_spez_ertrag if alter_stats else 0
+        letzter_ertrag = alter_stats[-1].durchschnitt_spez_ertrag if alter_stats else 0
+        jahre_diff = alter_stats[-1].alter_jahre - alter_stats[0].alter_jahre if len(alter_stats) > 1 else 1
+
+        if erster_ertrag > 0 and jahre_diff > 0:
+            gesamt_verlust = (erster_ertrag - letzter_ertrag) / erster_ertrag * 100
+            degradation_prozent = gesamt_verlust / jahre_diff
+
+    return DegradationsAnalyse(
+        nach_alter=alter_stats,
+        durchschnittliche_degradation_prozent_jahr=round(degradation_prozent, 2)
+    )
+
+
+async def _alter_zeilen_sql(db: AsyncSession, now: datetime) -> list[tuple]:
+    """(Alter, Anlagen, Summe Ertrag, Summe kWp) je Anlagenalter 1–15 Jahre."""
+    aktuelles_jahr = now.year
+    zeilen = []
 
     for alter in range(1, 16):  # 1 bis 15 Jahre
         installations_jahr = aktuelles_jahr - alter
@@ -59,45 +101,51 @@ async def get_degradation(
             Anlage.installation_jahr == installations_jahr,
             Anlage.kwp > 0,
             Monatswert.ertrag_kwh > 0,
-            # Letzte 12 Monate
-            ((Monatswert.jahr == aktuelles_jahr) |
-             ((Monatswert.jahr == aktuelles_jahr - 1) & (Monatswert.monat > now.month)))
+            # Letzte 12 Monate: Folgemonat vor einem Jahr bis Jahresende
+            # (Jahresgrenzen für das Partition-Pruning)
+            Monatswert.jahr.between(aktuelles_jahr - 1, aktuelles_jahr),
+            Monatswert.periode.between(
+                periode(aktuelles_jahr - 1, now.month) + 1, periode(aktuelles_jahr, 12)
+            ),
         )
 
         result = await db.execute(stmt)
         row = result.first()
+        if row:
+            zeilen.append((alter, row.anzahl, row.gesamt_erzeugung, row.gesamt_kwp))
 
-        if row and row.anzahl and row.anzahl >= 3 and row.gesamt_kwp and row.gesamt_kwp > 0:
-            # Spezifischer Ertrag = Gesamterzeugung / Gesamt-kWp
-            spez_ertrag = row.gesamt_erzeugung / row.gesamt_kwp
-            alter_stats.append(AlterErtrag(
-                alter_jahre=alter,
-                anzahl=row.anzahl,
-                durchschnitt_spez_ertrag=round(spez_ertrag, 0)
-            ))
+    return zeilen
 
-    # Degradation berechnen (lineare Regression)
-    degradation_prozent = 0.0
-    if len(alter_stats) >= 3:
-        # Einfache lineare Approximation
-        erster_ertrag = alter_stats[0].durchschnitt_spez_ertrag if alter_stats else 0
-        letzter_ertrag = alter_stats[-1].durchschnitt_spez_ertrag if alter_stats else 0
-        jahre_diff = alter_stats[-1].alter_jahre - alter_stats[0].alter_jahre if len(alter_stats) > 1 else 1
 
-        if erster_ertrag > 0 and jahre_diff > 0:
-            gesamt_verlust = (erster_ertrag - letzter_ertrag) / erster_ertrag * 100
-            degradation_prozent = gesamt_verlust / jahre_diff
-
-    return DegradationsAnalyse(
-        nach_alter=alter_stats,
-        durchschnittliche_degradation_prozent_jahr=round(degradation_prozent, 2)
+def _alter_zeilen(stand, now: datetime) -> list[tuple]:
+    """Wie `_alter_zeilen_sql`, aus dem Analytik-Stand in einem Durchgang."""
+    alter = now.year - stand.je_zeile("installation_jahr")
+    kwp = stand.je_zeile("kwp")
+    ertrag = stand.monatswerte["ertrag_kwh"]
+    maske = (
+        (alter >= 1) & (alter <= 15) & (kwp > 0) & (ertrag > 0)
+        & (stand.periode > periode(now.year - 1, now.month))
+        & (stand.periode <= periode(now.year, 12))
     )
+    gesamt_erzeugung = np.bincount(alter[maske], weights=ertrag[maske], minlength=16)
+    # kWp je Zeile summiert — wie `SUM(anlagen.kwp)` über den JOIN
+    gesamt_kwp = np.bincount(alter[maske], weights=kwp[maske], minlength=16)
+    # Anlagen je Alter: jede Anlage mit mindestens einer Zeile einmal
+    hat_zeilen = np.bincount(stand.anlage[maske], minlength=stand.anzahl_anlagen) > 0
+    anlagen_alter = now.year - stand.anlagen["installation_jahr"]
+    anzahl = np.bincount(anlagen_alter[hat_zeilen], minlength=16)
+
+    return [
+        (a, int(anzahl[a]), float(gesamt_erzeugung[a]) if anzahl[a] else None,
+         float(gesamt_kwp[a]) if anzahl[a] else None)
+        for a in range(1, 16)
+    ]
 
 
 @router.get("/{period}", response_model=TrendDaten)
 async def get_trends(
     period: Literal["12_monate", "24_monate", "gesamt"],
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Zeitliche Entwicklung der Community-Daten.
@@ -105,6 +153,9 @@ async def get_trends(
     Zeigt wie sich Anlagenzahl, durchschnittliche kWp, Speicher-Quote,
     Wärmepumpen-Quote und E-Auto-Quote über die Zeit entwickelt haben.
     """
+    vorberechnet = schnappschuss.holen(f"trends/{period}")
+    if vorberechnet is not None:
+        return vorberechnet
     now = datetime.now()
 
     # Zeitraum bestimmen
@@ -133,6 +184,12 @@ async def get_trends(
             current_monat = 1
             current_jahr += 1
 
+    stand = await analytik.stand(db)
+    if stand is not None:
+        zeilen = _monats_zeilen(stand, monate)
+    else:
+        zeilen = await _monats_zeilen_sql(db, monate)
+
     # Trend-Daten pro Monat sammeln
     anzahl_anlagen_trend = []
     durchschnitt_kwp_trend = []
@@ -140,16 +197,49 @@ async def get_trends(
     waermepumpe_quote_trend = []
     eauto_quote_trend = []
 
+    for monat_str, anzahl, avg_kwp, mit_speicher, mit_wp, mit_eauto in zeilen:
+        if anzahl and anzahl > 0:
+            anzahl_anlagen_trend.append(TrendPunkt(monat=monat_str, wert=anzahl))
+
+            if avg_kwp:
+                durchschnitt_kwp_trend.append(TrendPunkt(monat=monat_str, wert=round(avg_kwp, 1)))
+
+            # Quoten berechnen
+            if mit_speicher is not None:
+                quote = (mit_speicher / anzahl) * 100
+                speicher_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
+
+            if mit_wp is not None:
+                quote = (mit_wp / anzahl) * 100
+                waermepumpe_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
+
+            if mit_eauto is not None:
+                quote = (mit_eauto / anzahl) * 100
+                eauto_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
+
+    return TrendDaten(
+        period=period,
+        trends={
+            "anzahl_anlagen": anzahl_anlagen_trend,
+            "durchschnitt_kwp": durchschnitt_kwp_trend,
+            "speicher_quote": speicher_quote_trend,
+            "waermepumpe_quote": waermepumpe_quote_trend,
+            "eauto_quote": eauto_quote_trend,
+        }
+    )
+
+
+async def _monats_zeilen_sql(db: AsyncSession, monate: list[str]) -> list[tuple]:
+    """(Monat, Anlagen, Ø kWp, mit Speicher, mit WP, mit E-Auto) je Monat."""
+    zeilen = []
+
     for monat_str in monate:
         jahr, monat = map(int, monat_str.split("-"))
 
         # Anlagen die bis zu diesem Monat existierten (mind. ein Monatswert).
         existierende_anlagen = (
             select(Monatswert.anlage_id)
-            .where(
-                (Monatswert.jahr < jahr) |
-                ((Monatswert.jahr == jahr) & (Monatswert.monat <= monat))
-            )
+            .where(Monatswert.jahr <= jahr, Monatswert.periode <= periode(jahr, monat))
             .distinct()
             .scalar_subquery()
         )
@@ -171,34 +261,43 @@ async def get_trends(
 
         result = await db.execute(stmt)
         row = result.first()
+        if row:
+            zeilen.append((monat_str, row.anzahl, row.avg_kwp, row.mit_speicher, row.mit_wp, row.mit_eauto))
 
-        if row and row.anzahl and row.anzahl > 0:
-            anzahl = row.anzahl
-            anzahl_anlagen_trend.append(TrendPunkt(monat=monat_str, wert=anzahl))
+    return zeilen
 
-            if row.avg_kwp:
-                durchschnitt_kwp_trend.append(TrendPunkt(monat=monat_str, wert=round(row.avg_kwp, 1)))
 
-            # Quoten berechnen
-            if row.mit_speicher is not None:
-                quote = (row.mit_speicher / anzahl) * 100
-                speicher_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
+def _monats_zeilen(stand, monate: list[str]) -> list[tuple]:
+    """Wie `_monats_zeilen_sql`, als kumulatives Fenster über den Analytik-Stand.
 
-            if row.mit_wp is not None:
-                quote = (row.mit_wp / anzahl) * 100
-                waermepumpe_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
-
-            if row.mit_eauto is not None:
-                quote = (row.mit_eauto / anzahl) * 100
-                eauto_quote_trend.append(TrendPunkt(monat=monat_str, wert=round(quote, 1)))
-
-    return TrendDaten(
-        period=period,
-        trends={
-            "anzahl_anlagen": anzahl_anlagen_trend,
-            "durchschnitt_kwp": durchschnitt_kwp_trend,
-            "speicher_quote": speicher_quote_trend,
-            "waermepumpe_quote": waermepumpe_quote_trend,
-            "eauto_quote": eauto_quote_trend,
-        }
-    )
+    Eine Anlage existiert ab ihrem ersten Monatswert; nach diesem sortiert
+    sind die Kennzahlen eines Monats laufende Summen bis zur letzten Anlage,
+    die bis dahin dabei war.
+    """
+    erste = stand.erste_periode()
+    reihenfolge = np.argsort(erste, kind="stable")
+    erste = erste[reihenfolge]
+    anlagen = {name: werte[reihenfolge] for name, werte in stand.anlagen.items()}
+    kumuliert = {
+        "kwp": np.cumsum(anlagen["kwp"]),
+        "speicher": np.cumsum(anlagen["speicher_kwh"] > 0),
+        "wp": np.cumsum(anlagen["hat_waermepumpe"]),
+        "eauto": np.cumsum(anlagen["hat_eauto"]),
+    }
+
+    zeilen = []
+    for monat_str in monate:
+        jahr, monat = map(int, monat_str.split("-"))
+        anzahl = int(np.searchsorted(erste, periode(jahr, monat), side="right"))
+        if anzahl == 0:
+            zeilen.append((monat_str, 0, None, None, None, None))
+            continue
+        zeilen.append((
+            monat_str,
+            anzahl,
+            float(kumuliert["kwp"][anzahl - 1]) / anzahl,
+            int(kumuliert["speicher"][anzahl - 1]),
+            int(kumuliert["wp"][anzahl - 1]),
+            int(kumuliert["eauto"][anzahl - 1]),
+        ))
+    return zeilen
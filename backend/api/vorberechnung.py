@@ -0,0 +1,305 @@
+"""
+EEDC Community - Hintergrund-Vorberechnung häufig gelesener Aggregate
+
+Community-Durchschnitte, Rankings, Regionen, Trends und Komponenten-Deep-
+Dives werden um Größenordnungen öfter gelesen als sich die Daten ändern.
+Ein asyncio-Task (gestartet in `main.lifespan`) rechnet sie nach einer
+Änderung der Datenversion neu und veröffentlicht sie gemeinsam als
+`core.schnappschuss`; die Endpoints lesen zuerst dort und rechnen nur live,
+solange noch kein Schnappschuss existiert.
+
+- Ein Worker rechnet: wer die Advisory-Lock `rechen_sperre_versuchen`
+  (core/database.py) hält. Er legt jeden Lauf als JSON in
+  `vorberechnung_stand` ab; die übrigen Worker übernehmen ihn von dort, statt
+  dieselben Aggregate noch einmal gegen den Primary zu rechnen. Endet der
+  rechnende Worker, bekommt ein anderer die Sperre.
+- Beim Start rechnet ein Worker nur, wenn der abgelegte Stand nicht zur
+  aktuellen Datenversion passt (`aufwaermen`, unter `start_sperre`).
+
+- Entprellt: nach einer Änderung wird erst gerechnet, wenn
+  `vorberechnung_entprellen` Sekunden lang nichts mehr kam (eine Import-
+  Session schickt oft Dutzende Submits), spätestens aber nach
+  `vorberechnung_max_wartezeit`.
+- Gedrosselt: zwischen zwei Läufen liegen mindestens
+  `vorberechnung_min_abstand` Sekunden.
+- Konsistent: alle Aggregate eines Laufs lesen in einer REPEATABLE-READ-
+  Transaktion, also denselben Datenstand. Schlägt ein Aggregat fehl, bleibt
+  sein vorheriger Wert im Schnappschuss.
+
+`GET /api/vorberechnung/status` zeigt Zeitpunkt und Dauer je Aggregat.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from fastapi import APIRouter
+from pydantic import TypeAdapter
+from pydantic_core import to_jsonable_python
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from core import async_session, daten_version, daten_version_abgleichen, schnappschuss, settings
+from core.database import rechen_sperre_freigeben, rechen_sperre_versuchen
+from schemas import (
+    AggregatStatus, CommunityGesamtwerte, DegradationsAnalyse, GesamtStatistik, GlobaleStatistik,
+    RegionStatistik, TrendDaten, VorberechnungStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/vorberechnung", tags=["Betrieb"])
+
+
+def aggregate() -> dict[str, Callable[[AsyncSession], Awaitable[Any]]]:
+    """Schlüssel im Schnappschuss → Berechnung. Schlüssel = Pfad unter /api/."""
+    from . import components, statistics, stats, trends
+
+    berechnungen: dict[str, Callable[[AsyncSession], Awaitable[Any]]] = {
+        "stats": stats.get_statistiken,
+        "statistics/global": statistics.get_global_statistics,
+        "statistics/global/totals": statistics.get_global_totals,
+        "statistics/regional": statistics.get_regional_statistics,
+        "trends/degradation": trends.get_degradation,
+        "components/speicher/by-class": components.get_speicher_by_class,
+        "components/waermepumpe/by-region": components.get_wp_by_region,
+        "components/waermepumpe/by-art": components.get_wp_by_art,
+        "components/eauto/by-usage": components.get_eauto_by_usage,
+    }
+    for period in ("12_monate", "24_monate", "gesamt"):
+        berechnungen[f"trends/{period}"] = partial(trends.get_trends, period)
+    for category in statistics.RANKING_CONFIG:
+        berechnungen[f"statistics/rankings/{category}"] = partial(
+            statistics.sortiertes_ranking, category=category
+        )
+    return berechnungen
+
+
+def werttypen() -> dict[str, Any]:
+    """Schlüssel im Schnappschuss → Typ des Werts, zum Übernehmen aus JSON."""
+    from .components import EAutoByUsage, SpeicherByClass, WPByArt, WPByRegion
+    from .statistics import RANKING_CONFIG
+
+    typen: dict[str, Any] = {
+        "stats": GesamtStatistik,
+        "statistics/global": GlobaleStatistik,
+        "statistics/global/totals": CommunityGesamtwerte,
+        "statistics/regional": list[RegionStatistik],
+        "trends/degradation": DegradationsAnalyse,
+        "components/speicher/by-class": SpeicherByClass,
+        "components/waermepumpe/by-region": WPByRegion,
+        "components/waermepumpe/by-art": WPByArt,
+        "components/eauto/by-usage": EAutoByUsage,
+    }
+    for period in ("12_monate", "24_monate", "gesamt"):
+        typen[f"trends/{period}"] = TrendDaten
+    for category in RANKING_CONFIG:
+        typen[f"statistics/rankings/{category}"] = list[dict]
+    return typen
+
+
+@dataclass(frozen=True)
+class Lauf:
+    """Ergebnis der letzten Berechnung eines Aggregats."""
+    berechnet_am: datetime
+    dauer_ms: float
+    fehler: str | None = None
+
+
+class Vorberechnung:
+    """Rechnet bei neuer Datenversion alle Aggregate neu und veröffentlicht sie."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._laeufe: dict[str, Lauf] = {}
+        self._veroeffentlicht_am: datetime | None = None
+        self._letzte_laufdauer_ms: float | None = None
+        self._anzahl_laeufe = 0
+        self._anzahl_uebernommen = 0
+        # Verbindung mit der Rechen-Sperre, solange dieser Worker rechnet
+        self._sperre: AsyncConnection | None = None
+        self._typen: dict[str, TypeAdapter] | None = None
+
+    async def berechnen(self) -> None:
+        """Ein vollständiger Lauf; veröffentlicht erst, wenn alles durch ist."""
+        start = time.perf_counter()
+        berechnungen = aggregate()
+        # Fallback für fehlschlagende Aggregate: deren bisheriger Wert
+        bisher = {schluessel: schnappschuss.holen(schluessel) for schluessel in berechnungen}
+        werte: dict[str, Any] = {}
+        async with async_session() as db:
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            version = await daten_version_abgleichen(db, erzwingen=True)
+            with schnappschuss.umgehen():
+                for schluessel, berechnung in berechnungen.items():
+                    t0 = time.perf_counter()
+                    fehler = None
+                    try:
+                        async with db.begin_nested():
+                            werte[schluessel] = await berechnung(db)
+                    except Exception as e:
+                        logger.exception("Vorberechnung %s fehlgeschlagen", schluessel)
+                        fehler = f"{type(e).__name__}: {e}"
+                        if bisher[schluessel] is not None:
+                            werte[schluessel] = bisher[schluessel]
+                    self._laeufe[schluessel] = Lauf(
+                        berechnet_am=datetime.utcnow(),
+                        dauer_ms=(time.perf_counter() - t0) * 1000,
+                        fehler=fehler,
+                    )
+            await db.rollback()
+
+        schnappschuss.veroeffentlichen(version, werte)
+        self._veroeffentlicht_am = datetime.utcnow()
+        self._letzte_laufdauer_ms = (time.perf_counter() - start) * 1000
+        self._anzahl_laeufe += 1
+        await self._ablegen(version, werte)
+
+    async def _ablegen(self, version: int, werte: dict[str, Any]) -> None:
+        """Lauf für die anderen Worker ablegen; ein neuerer Stand bleibt stehen."""
+        async with async_session() as db:
+            await db.execute(
+                text(
+                    "INSERT INTO vorberechnung_stand (id, version, werte, berechnet_am) "
+                    "VALUES (1, :version, CAST(:werte AS JSON), now()) "
+                    "ON CONFLICT (id) DO UPDATE SET version = excluded.version, "
+                    "werte = excluded.werte, berechnet_am = excluded.berechnet_am "
+                    "WHERE vorberechnung_stand.version < excluded.version"
+                ),
+                {"version": version, "werte": json.dumps(to_jsonable_python(werte))},
+            )
+            await db.commit()
+
+    async def uebernehmen(self, nur_version: int | None = None) -> bool:
+        """Abgelegten Stand des rechnenden Workers veröffentlichen, wenn er neuer ist.
+
+        Mit `nur_version` nur genau diesen Stand.
+        """
+        bisher = schnappschuss.version
+        abfrage = "SELECT version, werte FROM vorberechnung_stand WHERE id = 1 AND version > :bisher"
+        if nur_version is not None:
+            abfrage += " AND version = :nur"
+        async with async_session() as db:
+            zeile = (await db.execute(
+                text(abfrage), {"bisher": -1 if bisher is None else bisher, "nur": nur_version}
+            )).one_or_none()
+        if zeile is None:
+            return False
+        if self._typen is None:
+            self._typen = {schluessel: TypeAdapter(typ) for schluessel, typ in werttypen().items()}
+        werte = {
+            schluessel: self._typen[schluessel].validate_python(wert)
+            for schluessel, wert in zeile.werte.items() if schluessel in self._typen
+        }
+        schnappschuss.veroeffentlichen(zeile.version, werte)
+        self._veroeffentlicht_am = datetime.utcnow()
+        self._anzahl_uebernommen += 1
+        return True
+
+    async def aufwaermen(self) -> None:
+        """Erster Stand beim Start: übernehmen, wenn abgelegt und aktuell, sonst rechnen."""
+        async with async_session() as db:
+            version = await daten_version_abgleichen(db, erzwingen=True)
+        if not await self.uebernehmen(nur_version=version):
+            await self.berechnen()
+
+    async def _rechnend(self) -> bool:
+        """Hält dieser Worker die Rechen-Sperre (noch)? Sonst einmal versuchen."""
+        if self._sperre is not None:
+            try:
+                await self._sperre.execute(text("SELECT 1"))
+                await self._sperre.commit()
+                return True
+            except Exception:
+                # Verbindung weg — mit ihr die Sperre
+                logger.warning("Vorberechnung: Rechen-Sperre verloren")
+                await self._sperre.close()
+                self._sperre = None
+        self._sperre = await rechen_sperre_versuchen()
+        return self._sperre is not None
+
+    async def _schleife(self) -> None:
+        letzte_version = schnappschuss.version
+        geaendert_seit = zuletzt_geaendert = None
+        letzter_lauf = time.monotonic()
+        while True:
+            await asyncio.sleep(min(1.0, settings.vorberechnung_entprellen))
+            try:
+                rechnend = await self._rechnend()
+                async with async_session() as db:
+                    version = await daten_version_abgleichen(db)
+                if not rechnend:
+                    if version != schnappschuss.version:
+                        await self.uebernehmen()
+                    continue
+                jetzt = time.monotonic()
+                if version == schnappschuss.version:
+                    geaendert_seit = zuletzt_geaendert = None
+                    continue
+                if version != letzte_version or zuletzt_geaendert is None:
+                    letzte_version = version
+                    zuletzt_geaendert = jetzt
+                    if geaendert_seit is None:
+                        geaendert_seit = jetzt
+                ruhig = jetzt - zuletzt_geaendert >= settings.vorberechnung_entprellen
+                ueberfaellig = jetzt - geaendert_seit >= settings.vorberechnung_max_wartezeit
+                if (ruhig or ueberfaellig) and jetzt - letzter_lauf >= settings.vorberechnung_min_abstand:
+                    await self.berechnen()
+                    letzter_lauf = time.monotonic()
+                    geaendert_seit = zuletzt_geaendert = None
+            except Exception:
+                # Weiterlaufen: die Endpoints liefern so lange den alten Stand
+                logger.exception("Vorberechnung: Lauf fehlgeschlagen")
+
+    def starten(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._schleife(), name="vorberechnung")
+
+    async def stoppen(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sperre is not None:
+            await rechen_sperre_freigeben(self._sperre)
+            self._sperre = None
+
+    def status(self) -> VorberechnungStatus:
+        return VorberechnungStatus(
+            aktiv=self._task is not None and not self._task.done(),
+            rechnend=self._sperre is not None,
+            daten_version=daten_version(),
+            schnappschuss_version=schnappschuss.version,
+            veroeffentlicht_am=self._veroeffentlicht_am,
+            letzte_laufdauer_ms=(
+                round(self._letzte_laufdauer_ms, 1) if self._letzte_laufdauer_ms is not None else None
+            ),
+            anzahl_laeufe=self._anzahl_laeufe,
+            anzahl_uebernommen=self._anzahl_uebernommen,
+            aggregate=[
+                AggregatStatus(
+                    schluessel=schluessel,
+                    berechnet_am=lauf.berechnet_am,
+                    dauer_ms=round(lauf.dauer_ms, 1),
+                    fehler=lauf.fehler,
+                )
+                for schluessel, lauf in sorted(self._laeufe.items())
+            ],
+        )
+
+
+vorberechnung = Vorberechnung()
+
+
+@router.get("/status", response_model=VorberechnungStatus)
+async def get_vorberechnung_status():
+    """Letzter Lauf je Aggregat (dieses Worker-Prozesses)."""
+    return vorberechnung.status()
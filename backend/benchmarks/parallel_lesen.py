@@ -0,0 +1,77 @@
+"""
+EEDC Community - Benchmark nebenläufiger Leseabfragen
+
+Ruft die Handler, deren unabhängige Abfragen über `core/parallel.py` laufen,
+direkt gegen die konfigurierte Datenbank auf — einmal alles nacheinander auf
+einer Session, einmal nebenläufig — und zeigt die beste Laufzeit je Variante:
+
+- stats             GET /api/stats (sieben Teilabfragen)
+- statistics/global GET /api/statistics/global (zwei Statements)
+- benchmark/anlage  GET /api/benchmark/anlage/{hash} (Grundlage, Monatswerte, Summen)
+
+Schnappschuss und Antwort-Cache werden dabei umgangen. Der Gewinn wächst mit
+der Latenz zur Datenbank; lokal über den Unix-Socket ist er am kleinsten.
+
+    python benchmarks/parallel_lesen.py [--runden 20]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import async_session, daten_geaendert, daten_version, schnappschuss  # noqa: E402
+from core import parallel  # noqa: E402
+from models import Anlage  # noqa: E402
+from api.benchmark import get_anlage_benchmark  # noqa: E402
+from api.statistics import get_global_statistics  # noqa: E402
+from api.stats import get_statistiken  # noqa: E402
+
+
+async def _messen(handler, runden: int) -> float:
+    """Beste Laufzeit in ms, je Runde eine frische Session."""
+    beste = float("inf")
+    for _ in range(runden):
+        daten_geaendert(daten_version() + 1)  # Antwort-Cache ungültig
+        async with async_session() as db:
+            start = time.perf_counter()
+            await handler(db)
+            beste = min(beste, (time.perf_counter() - start) * 1000)
+    return beste
+
+
+async def main(runden: int) -> None:
+    async with async_session() as db:
+        anlage_hash = (await db.execute(select(Anlage.anlage_hash).limit(1))).scalar()
+    if anlage_hash is None:
+        print("Keine Anlagen in der Datenbank")
+        return
+
+    handler = {
+        "stats": get_statistiken,
+        "statistics/global": get_global_statistics,
+        "benchmark/anlage": lambda db: get_anlage_benchmark(
+            anlage_hash, "letzte_12_monate", None, None, db
+        ),
+    }
+    verbindungen = parallel._frei
+    print(f"{'Handler':18} {'nacheinander':>12} {'nebenläufig':>12}")
+    with schnappschuss.umgehen():
+        for name, aufruf in handler.items():
+            parallel._frei = 0
+            nacheinander = await _messen(aufruf, runden)
+            parallel._frei = verbindungen
+            nebenlaeufig = await _messen(aufruf, runden)
+            print(f"{name:18} {nacheinander:>10.2f}ms {nebenlaeufig:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runden", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.runden))
@@ -0,0 +1,139 @@
+"""
+EEDC Community - Benchmark Partition-Pruning auf monatswerte
+
+Vergleicht die typischen Zeitfenster-Abfragen auf der nach `jahr`
+partitionierten `monatswerte` mit einer unpartitionierten Kopie
+`monatswerte_flach` (gleiche Indizes, gleiche Zeilen):
+
+- fenster_12    letzte 12 Monate über alle Anlagen (`im_zeitraum`)
+- einzelmonat   ein (jahr, monat), wie `/api/benchmark/monat/{jahr}/{monat}`
+- alter_trend   Ertrag nach Anlagenalter, letzte 12 Monate (trends)
+
+Je Abfrage: gelesene Tabellen/Partitionen, Puffer und beste Laufzeit aus
+`EXPLAIN (ANALYZE, BUFFERS)`. Mit `--historie N` werden die vorhandenen
+Monate zusätzlich N-mal in frühere Jahre kopiert — so sieht man, wie beide
+Varianten mit wachsender Historie skalieren.
+
+Alles läuft in einer Transaktion, die am Ende zurückgerollt wird. Trotzdem
+nicht gegen die Produktion: `--historie` schreibt bis dahin in die echte
+Tabelle und hält deren Sperren.
+
+    python benchmarks/partitionen.py [--historie 3] [--runden 5]
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.database import async_session  # noqa: E402
+from core.partitionen import PARTITION_JAHRE  # noqa: E402
+
+SPALTEN_SQL = (
+    "SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute "
+    "WHERE attrelid = 'monatswerte'::regclass AND attnum > 0 AND NOT attisdropped "
+    "AND attgenerated = ''"
+)
+
+
+def _abfragen(jahr: int, monat: int) -> dict[str, str]:
+    bis = jahr * 12 + monat - 1
+    von = bis - 11
+    fenster = f"m.jahr BETWEEN {von // 12} AND {jahr} AND m.periode BETWEEN {von} AND {bis}"
+    return {
+        "fenster_12": (
+            "SELECT m.anlage_id, sum(m.ertrag_kwh), avg(m.autarkie_prozent) "
+            f"FROM {{tabelle}} m WHERE {fenster} GROUP BY m.anlage_id"
+        ),
+        "einzelmonat": (
+            "SELECT count(*), avg(m.ertrag_kwh / a.kwp) FROM {tabelle} m "
+            f"JOIN anlagen a ON a.id = m.anlage_id WHERE m.jahr = {jahr} AND m.monat = {monat}"
+        ),
+        "alter_trend": (
+            f"SELECT {jahr} - a.installation_jahr AS alter, sum(m.ertrag_kwh), sum(a.kwp) "
+            f"FROM {{tabelle}} m JOIN anlagen a ON a.id = m.anlage_id WHERE {fenster} "
+            "GROUP BY 1"
+        ),
+    }
+
+
+def _tabellen(plan: dict) -> set[str]:
+    gefunden = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for unterplan in plan.get("Plans", []):
+        gefunden |= _tabellen(unterplan)
+    return gefunden
+
+
+def _puffer(plan: dict) -> int:
+    return plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0)
+
+
+async def _messen(db, sql: str, runden: int) -> tuple[int, int, float]:
+    """(gelesene Tabellen ohne `anlagen`, Puffer, beste Planung + Ausführung in ms)."""
+    beste = None
+    for _ in range(runden):
+        ergebnis = (await db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"))).scalar()
+        wurzel = ergebnis[0]
+        dauer = wurzel["Planning Time"] + wurzel["Execution Time"]
+        if beste is None or dauer < beste[2]:
+            tabellen = _tabellen(wurzel["Plan"]) - {"anlagen"}
+            beste = (len(tabellen), _puffer(wurzel["Plan"]), dauer)
+    return beste
+
+
+async def main(historie: int, runden: int) -> None:
+    async with async_session() as db:
+        spalten = (await db.execute(text(SPALTEN_SQL))).scalar()
+        jahre = (await db.execute(text("SELECT min(jahr), max(jahr) FROM monatswerte"))).one()
+        if jahre[0] is None:
+            print("monatswerte ist leer")
+            return
+        spanne = jahre[1] - jahre[0] + 1
+        for n in range(1, historie + 1):
+            versatz = n * spanne
+            if jahre[0] - versatz < PARTITION_JAHRE.start:
+                print(f"--historie auf {n - 1} begrenzt (Partitionen ab {PARTITION_JAHRE.start})")
+                break
+            quelle = ", ".join(
+                f"jahr - {versatz}" if spalte == "jahr" else spalte for spalte in spalten.split(", ")
+            )
+            await db.execute(text(
+                f"INSERT INTO monatswerte ({spalten}) SELECT {quelle} FROM monatswerte "
+                f"WHERE jahr BETWEEN {jahre[0]} AND {jahre[1]}"
+            ))
+        await db.execute(text("ANALYZE monatswerte"))
+
+        await db.execute(text(
+            "CREATE TABLE monatswerte_flach (LIKE monatswerte INCLUDING ALL)"
+        ))
+        await db.execute(text(
+            f"INSERT INTO monatswerte_flach ({spalten}) SELECT {spalten} FROM monatswerte"
+        ))
+        await db.execute(text("ANALYZE monatswerte_flach"))
+        bestand = (await db.execute(text("SELECT count(*), min(jahr) FROM monatswerte"))).one()
+        neuester = (await db.execute(text(
+            "SELECT jahr, monat FROM monatswerte ORDER BY periode DESC LIMIT 1"
+        ))).one()
+        print(f"{bestand[0]} Monatswerte, {bestand[1]}–{jahre[1]}, "
+              f"neuester Monat {neuester.jahr}-{neuester.monat:02d}\n")
+        print(f"{'Abfrage':14} {'Variante':14} {'Tabellen':>8} {'Puffer':>8} {'ms':>8}")
+        for name, sql in _abfragen(neuester.jahr, neuester.monat).items():
+            for variante, tabelle in (("partitioniert", "monatswerte"), ("flach", "monatswerte_flach")):
+                anzahl, puffer, dauer = await _messen(db, sql.format(tabelle=tabelle), runden)
+                print(f"{name:14} {variante:14} {anzahl:>8} {puffer:>8} {dauer:>8.2f}")
+        await db.rollback()
+        # ANALYZE schreibt die Statistik am Rollback vorbei — zurück auf den echten Stand
+        await db.execute(text("ANALYZE monatswerte"))
+        await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--historie", type=int, default=0)
+    parser.add_argument("--runden", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.historie, args.runden))
@@ -0,0 +1,95 @@
+"""
+EEDC Community - Benchmark JSON-Serialisierung
+
+Misst, was die Serialisierung der größten Antworten kostet — je Pfad:
+
+- jsonable_encoder  Dict-Antworten ohne response_model (jsonable_encoder + json.dumps)
+- dump_python       response_model über TypeAdapter → Dict → json.dumps
+                    (ältere FastAPI-Versionen, eigene response_class)
+- dump_json         response_model direkt per Pydantic-Core zu Bytes
+                    (neueres FastAPI mit Default-Response-Klasse)
+- orjson            Dict aus dump_python → orjson (SchnellJSONResponse bei Dicts)
+
+Die Payloads kommen von einem laufenden Server:
+
+    python benchmarks/serialization.py [--url http://localhost:8000] [--runden 200]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from schemas import (  # noqa: E402
+    CommunityGesamtwerte,
+    MonatsVergleich,
+    RegionStatistik,
+    TrendDaten,
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _endpunkte(client: httpx.Client) -> list[tuple[str, object]]:
+    monate = client.get("/api/stats/verfuegbare-monate").json()
+    neuester = monate.get("neuester") or "2025-01"
+    jahr, monat = neuester.split("-")
+    return [
+        (f"/api/benchmark/monat/{jahr}/{int(monat)}", MonatsVergleich),
+        ("/api/statistics/global/totals", CommunityGesamtwerte),
+        ("/api/trends/gesamt", TrendDaten),
+        ("/api/statistics/regional", list[RegionStatistik]),
+    ]
+
+
+def _messen(funktion, runden: int) -> float:
+    """Bester Durchlauf aus 5 Wiederholungen, in µs pro Aufruf."""
+    return min(timeit.repeat(funktion, number=runden, repeat=5)) / runden * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--runden", type=int, default=200)
+    args = parser.parse_args()
+
+    def _dumps(daten) -> bytes:
+        return json.dumps(
+            daten, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    with httpx.Client(base_url=args.url, timeout=60) as client:
+        endpunkte = _endpunkte(client)
+        print(f"{'Endpoint':45} {'KB':>6} {'jsonable':>10} {'dump_py':>10} {'dump_json':>10} {'orjson':>10}")
+        for pfad, typ in endpunkte:
+            antwort = client.get(pfad)
+            antwort.raise_for_status()
+            adapter = TypeAdapter(typ)
+            objekt = adapter.validate_python(antwort.json())
+
+            zeiten = [
+                _messen(lambda: _dumps(jsonable_encoder(objekt)), args.runden),
+                _messen(lambda: _dumps(adapter.dump_python(objekt, mode="json")), args.runden),
+                _messen(lambda: adapter.dump_json(objekt), args.runden),
+            ]
+            if orjson is not None:
+                zeiten.append(_messen(
+                    lambda: orjson.dumps(adapter.dump_python(objekt, mode="json")), args.runden
+                ))
+            spalten = " ".join(f"{z:>8.0f}µs" for z in zeiten)
+            print(f"{pfad:45} {len(antwort.content) / 1024:>6.1f} {spalten}"
+                  + ("" if orjson is not None else "        (orjson fehlt)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,12 @@
 from .config import settings
-from .database import Base, get_db, init_db, async_session
+from .database import Base, get_db, get_read_db, init_db, async_session, start_sperre
+from .cache import (
+    antwort_cache, daten_geaendert, daten_version, daten_version_abgleichen,
+    daten_version_erhoehen, schnappschuss,
+)
 
-__all__ = ["settings", "Base", "get_db", "init_db", "async_session"]
+__all__ = [
+    "settings", "Base", "get_db", "get_read_db", "init_db", "async_session", "start_sperre",
+    "antwort_cache", "daten_geaendert", "daten_version", "daten_version_abgleichen",
+    "daten_version_erhoehen", "schnappschuss",
+]
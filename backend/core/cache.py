@@ -0,0 +1,152 @@
+"""
+EEDC Community - Antwort-Cache je Datenstand
+
+Community-Aggregate ändern sich nur, wenn jemand einreicht oder löscht. Jede
+Schreiboperation erhöht in ihrer Transaktion die Datenversion in der Tabelle
+`daten_stand` (`daten_version_erhoehen`) und übernimmt sie nach dem Commit
+lokal (`daten_geaendert`); gecachte Antworten gelten, solange ihre Version der
+aktuellen entspricht. Kein TTL nötig — es gibt keinen Fall, in dem eine
+Antwort ohne Schreibvorgang veraltet.
+
+Mit mehreren Worker-Prozessen (`serve.py`) hat jeder Worker seinen eigenen
+Cache. Schreibt Worker A, erfahren die anderen davon über die DB: vor dem
+Cache-Zugriff gleichen sie ihre lokale Version höchstens alle
+`settings.daten_version_intervall` Sekunden mit `daten_stand` ab
+(`daten_version_abgleichen`, ein Primärschlüssel-Lookup). Länger kann ein
+anderer Worker eine veraltete Antwort nicht liefern.
+
+Zusätzlich hält `schnappschuss` die im Hintergrund vorberechneten Aggregate
+(`api/vorberechnung.py`). Anders als der Antwort-Cache wird er nicht beim
+Versionswechsel ungültig, sondern erst durch den nächsten fertigen Lauf
+ersetzt — bis dahin liefern die Endpoints den vorherigen Stand.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+
+_daten_version = 0
+_abgeglichen_um = 0.0
+
+
+def daten_version() -> int:
+    """Aktuelle Datenversion dieses Prozesses."""
+    return _daten_version
+
+
+async def daten_version_erhoehen(db: AsyncSession, anlagen: Iterable[int] = ()) -> int:
+    """Erhöht die gemeinsame Datenversion; vor dem Commit aufrufen.
+
+    Läuft in der Transaktion des Schreibvorgangs: wird zurückgerollt, bleibt
+    auch die Version stehen. `anlagen`: IDs der geänderten oder gelöschten
+    Anlagen, landen mit der Version in `daten_aenderungen`.
+    """
+    version = (await db.execute(text(
+        "UPDATE daten_stand SET version = version + 1, geaendert_am = now() "
+        "WHERE id = 1 RETURNING version"
+    ))).scalar_one()
+    await db.execute(
+        text("DELETE FROM daten_aenderungen WHERE version <= :grenze"),
+        {"grenze": version - settings.daten_aenderungen_behalten},
+    )
+    await db.execute(
+        text("INSERT INTO daten_aenderungen (version, anlage_ids) VALUES (:version, CAST(:ids AS JSON))"),
+        {"version": version, "ids": json.dumps(sorted(set(anlagen)))},
+    )
+    return version
+
+
+def daten_geaendert(version: int) -> None:
+    """Nach jedem Commit aufrufen, der Anlagen oder Monatswerte ändert."""
+    global _daten_version
+    _daten_version = max(_daten_version, version)
+
+
+async def daten_version_abgleichen(db: AsyncSession, erzwingen: bool = False) -> int:
+    """Übernimmt Schreibvorgänge anderer Prozesse (gedrosselt)."""
+    global _daten_version, _abgeglichen_um
+    jetzt = time.monotonic()
+    if erzwingen or jetzt - _abgeglichen_um >= settings.daten_version_intervall:
+        _abgeglichen_um = jetzt
+        version = (await db.execute(
+            text("SELECT version FROM daten_stand WHERE id = 1")
+        )).scalar_one_or_none()
+        if version is not None:
+            _daten_version = max(_daten_version, version)
+    return _daten_version
+
+
+class AntwortCache:
+    """Schlüssel → (Datenversion, Antwort). Veraltete Einträge gelten als Fehlschlag."""
+
+    def __init__(self):
+        self._eintraege: dict[str, tuple[int, Any]] = {}
+
+    def holen(self, schluessel: str) -> Any | None:
+        eintrag = self._eintraege.get(schluessel)
+        if eintrag is None or eintrag[0] != _daten_version:
+            return None
+        return eintrag[1]
+
+    def ablegen(self, schluessel: str, antwort: Any, version: int) -> Any:
+        """Legt eine Antwort unter der Version ab, die *vor* der Berechnung galt.
+
+        Kam währenddessen ein Schreibvorgang dazwischen, ist der Eintrag damit
+        sofort veraltet statt fälschlich als aktuell markiert.
+        """
+        self._eintraege[schluessel] = (version, antwort)
+        return antwort
+
+    def leeren(self) -> None:
+        self._eintraege.clear()
+
+
+antwort_cache = AntwortCache()
+
+
+_schnappschuss_umgehen: ContextVar[bool] = ContextVar("schnappschuss_umgehen", default=False)
+
+
+class Schnappschuss:
+    """Vorberechnete Aggregate eines Datenstands, nur als Ganzes ausgetauscht.
+
+    `veroeffentlichen` ersetzt die Referenz in einem Schritt: ein Leser sieht
+    immer entweder den alten oder den neuen Stand, nie eine Mischung.
+    """
+
+    def __init__(self):
+        self._stand: tuple[int, dict[str, Any]] | None = None
+
+    @property
+    def version(self) -> int | None:
+        stand = self._stand
+        return None if stand is None else stand[0]
+
+    def holen(self, schluessel: str) -> Any | None:
+        stand = self._stand
+        if stand is None or _schnappschuss_umgehen.get():
+            return None
+        return stand[1].get(schluessel)
+
+    def veroeffentlichen(self, version: int, werte: dict[str, Any]) -> None:
+        self._stand = (version, dict(werte))
+
+    @staticmethod
+    @contextmanager
+    def umgehen() -> Iterator[None]:
+        """Im aktuellen Task live rechnen statt zu lesen (für die Vorberechnung selbst)."""
+        token = _schnappschuss_umgehen.set(True)
+        try:
+            yield
+        finally:
+            _schnappschuss_umgehen.reset(token)
+
+
+schnappschuss = Schnappschuss()
@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     # Datenbank
     database_url: str = "postgresql+asyncpg://eedc:password@db:5432/eedc_community"
 
+    # Optionale Lese-Replika für die Auswertungs-Endpoints (core/database.py).
+    # Genutzt nur, wenn ihre Datenversion mit der des Primary mithält; die
+    # wird höchstens alle `replika_pruef_intervall` Sekunden abgefragt.
+    database_read_url: str | None = None
+    replika_pruef_intervall: float = 1.0
+
     # Sicherheit
     secret_key: str = "change-me-in-production"
 
@@ -30,6 +36,83 @@ class Settings(BaseSettings):
     # tolerant, bleibt Spam-Schutz pro Hash.
     max_updates_per_24h: int = 50
 
+    # Antworten per Pydantic-Core/orjson statt json.dumps serialisieren
+    # (core/responses.py). Opt-in; orjson ist optional.
+    schnelle_json_antworten: bool = False
+
+    # JSON-Antworten unter /api/ ab dieser Größe gzip-komprimieren
+    gzip_min_bytes: int = 1024
+
+    # Douglas–Peucker-Toleranzen (Grad) für die Kartenvarianten der
+    # Bundesländer-Karte (core/geo.py), Auswahl per ?toleranz=. Unter ~0,02°
+    # fällt auf dieser Karte kaum ein Punkt weg; bei der Heatmap-Größe
+    # (≈ 49 px je Grad) sind 0,03° gut 1 px, 0,05° gut 2 px.
+    karten_toleranzen: str = "0.03,0.05,0.08"
+
+    @property
+    def karten_toleranzen_liste(self) -> list[float]:
+        return [float(t) for t in self.karten_toleranzen.split(",") if t.strip()]
+
+    # Worker-Prozesse für `python serve.py` (Produktion); 0 = automatisch
+    # nach CPU-Kernen, gedeckelt — jeder Worker hält einen eigenen DB-Pool.
+    workers: int = 0
+    max_workers: int = 8
+
+    @property
+    def worker_anzahl(self) -> int:
+        if self.workers > 0:
+            return self.workers
+        return max(1, min(os.cpu_count() or 1, self.max_workers))
+
+    # Sekunden, nach denen ein Worker seine Datenversion mit der DB abgleicht
+    # (core/cache.py) — so lange kann er nach einem Schreibvorgang in einem
+    # anderen Worker noch gecachte Antworten liefern.
+    daten_version_intervall: float = 1.0
+    # Versionen, die `daten_aenderungen` zurückreicht — liegt der Stand der
+    # Analytik eines Workers weiter zurück, lädt er alles neu.
+    daten_aenderungen_behalten: int = 1000
+
+    # Hintergrund-Vorberechnung der häufig gelesenen Aggregate
+    # (api/vorberechnung.py): nach einer Datenänderung erst rechnen, wenn
+    # `entprellen` Sekunden Ruhe war, spätestens aber nach `max_wartezeit`;
+    # zwischen zwei Läufen mindestens `min_abstand` Sekunden. Es rechnet nur
+    # ein Worker; die übrigen übernehmen sein Ergebnis aus der Datenbank.
+    vorberechnung_aktiv: bool = True
+    vorberechnung_entprellen: float = 2.0
+    vorberechnung_max_wartezeit: float = 30.0
+    vorberechnung_min_abstand: float = 10.0
+
+    # Gleichzeitige identische GET-Anfragen unter /api/ bündeln
+    # (core/singleflight.py); größere Antworten werden nicht geteilt.
+    buendelung_aktiv: bool = True
+    buendelung_max_bytes: int = 4 * 1024 * 1024
+
+    # Datensatz-Export (api/export.py): Zeilen je Abruf vom serverseitigen
+    # Cursor, zugleich Größe einer Parquet-Row-Group.
+    export_batch_groesse: int = 5000
+
+    # Spaltenbasierte In-Memory-Analytik (api/analytik.py, braucht numpy):
+    # Rankings, Komponenten und Trends ohne Abfrage je Anlage.
+    analytik_aktiv: bool = True
+
+    # Gruppen-Commit für Submits (core/sammelcommit.py): ein Schreib-Task fasst
+    # bis zu `max_auftraege` gleichzeitige Submits bzw. alles, was innerhalb
+    # von `wartezeit_ms` eintrifft, zu einer Transaktion zusammen.
+    sammelcommit_aktiv: bool = False
+    sammelcommit_max_auftraege: int = 50
+    sammelcommit_wartezeit_ms: float = 5.0
+
+    # Idempotency-Key für Submit/Delete (core/idempotenz.py): erfolgreiche
+    # Antworten je Worker so lange bzw. so viele, wie Clients wiederholen;
+    # Delete-Quittungen ebenso lange in der Datenbank, für alle Worker.
+    idempotenz_ttl_s: int = 3600
+    idempotenz_max_eintraege: int = 10000
+
+    # Unabhängige Aggregat-Abfragen eines Handlers auf eigenen Verbindungen
+    # (core/parallel.py): so viele zusätzliche Verbindungen je Worker und
+    # Datenbank, neben dem Pool der Anfragen. 0 = alles nacheinander.
+    parallel_lesen_verbindungen: int = 4
+
     class Config:
         env_file = ".env"
 
@@ -1,12 +1,29 @@
 """
 EEDC Community - Datenbank-Konfiguration
+
+Optional mit Lese-Replika (`settings.database_read_url`): die reinen
+Auswertungs-Endpoints holen ihre Session über `get_read_db` und lesen von der
+Replika, solange sie aktuell ist — sonst vom Primary. „Aktuell“ heißt: ihre
+Datenversion (`daten_stand`, core/cache.py) ist mindestens die des Primary.
+Eine Antwort von der Replika passt damit immer zu der Version, unter der sie
+im Antwort-Cache landet. Geprüft wird höchstens alle
+`settings.replika_pruef_intervall` Sekunden; ist die Replika nicht
+erreichbar, geht bis zur nächsten Prüfung alles an den Primary.
 """
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
+from core.cache import daten_geaendert, daten_version
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_async_engine(settings.database_url, echo=False)
 
 async_session = async_sessionmaker(
@@ -15,6 +32,18 @@ async_session = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# Kurzer Verbindungs-Timeout: eine unerreichbare Replika soll die Prüfung
+# nicht lange aufhalten, danach geht es ohnehin an den Primary
+read_engine = (
+    create_async_engine(settings.database_read_url, echo=False, connect_args={"timeout": 2})
+    if settings.database_read_url else None
+)
+
+async_read_session = (
+    async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    if read_engine is not None else None
+)
+
 
 class Base(DeclarativeBase):
     pass
@@ -29,50 +58,128 @@ async def get_db():
             await session.close()
 
 
+class LeseReplika:
+    """Entscheidet je Anfrage zwischen Replika und Primary, nach Datenversion."""
+
+    def __init__(self, engine, pruef_intervall: float):
+        self.engine = engine
+        self.pruef_intervall = pruef_intervall
+        self.version: int | None = None
+        self.primary_version: int | None = None
+        self._geprueft_um = float("-inf")
+        self.metriken = {"replika": 0, "primary": 0, "pruefungen": 0, "fehler": 0}
+
+    async def _pruefen(self) -> None:
+        abfrage = text("SELECT version FROM daten_stand WHERE id = 1")
+        self.metriken["pruefungen"] += 1
+        try:
+            async with engine.connect() as conn:
+                self.primary_version = (await conn.execute(abfrage)).scalar_one_or_none()
+            async with self.engine.connect() as conn:
+                self.version = (await conn.execute(abfrage)).scalar_one_or_none()
+        except Exception as e:
+            self.metriken["fehler"] += 1
+            self.version = None
+            logger.warning("Lese-Replika nicht nutzbar: %r", e)
+            return
+        if self.primary_version is not None:
+            # Nebenbei: Schreibvorgänge anderer Worker übernehmen
+            daten_geaendert(self.primary_version)
+
+    async def nutzbar(self) -> bool:
+        jetzt = time.monotonic()
+        if jetzt - self._geprueft_um >= self.pruef_intervall:
+            self._geprueft_um = jetzt
+            await self._pruefen()
+        # Auch ein eigener Schreibvorgang nach der Prüfung zählt (daten_version)
+        nutzbar = self.version is not None and self.version >= daten_version()
+        self.metriken["replika" if nutzbar else "primary"] += 1
+        return nutzbar
+
+    def als_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "primary_version": self.primary_version,
+            "anfragen": dict(self.metriken),
+        }
+
+
+lese_replika = (
+    LeseReplika(read_engine, settings.replika_pruef_intervall)
+    if read_engine is not None else None
+)
+
+
+async def get_read_db():
+    """Dependency für reine Lese-Endpoints — Replika, wenn aktuell, sonst Primary."""
+    sessions = async_session
+    if lese_replika is not None and await lese_replika.nutzbar():
+        sessions = async_read_session
+    async with sessions() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+# Beliebige, feste Kennungen für pg_advisory_lock
+_START_SPERRE = 0x4545_4443
+_RECHEN_SPERRE = 0x4545_4444
+
+
+@asynccontextmanager
+async def start_sperre():
+    """Serialisiert den Start mehrerer Worker (Schema, Migrationen, Rollup).
+
+    Hält eine Postgres-Advisory-Lock auf eigener Verbindung; der zweite
+    Worker wartet, bis der erste fertig ist, und findet dann alles vor.
+    """
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _START_SPERRE})
+        await conn.commit()
+        try:
+            yield
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _START_SPERRE})
+            await conn.commit()
+
+
+async def rechen_sperre_versuchen() -> AsyncConnection | None:
+    """Versucht, der rechnende Worker der Vorberechnung zu werden (api/vorberechnung.py).
+
+    Gelingt es, hält die zurückgegebene Verbindung die Advisory-Lock, bis
+    `rechen_sperre_freigeben` sie löst — oder die Verbindung bzw. der Prozess
+    wegbricht, dann bekommt sie der nächste Worker. Sonst None.
+    """
+    conn = await engine.connect()
+    try:
+        erhalten = (await conn.execute(
+            text("SELECT pg_try_advisory_lock(:k)"), {"k": _RECHEN_SPERRE}
+        )).scalar()
+        await conn.commit()
+    except BaseException:
+        await conn.close()
+        raise
+    if erhalten:
+        return conn
+    await conn.close()
+    return None
+
+
+async def rechen_sperre_freigeben(conn: AsyncConnection) -> None:
+    """Löst die Sperre vor dem Schließen — sonst bliebe sie am Pool-Eintrag hängen."""
+    try:
+        await conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _RECHEN_SPERRE})
+        await conn.commit()
+    finally:
+        await conn.close()
+
+
 async def init_db():
-    """Erstellt alle Tabellen und führt Migrationen aus."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        await run_migrations(conn)
-
-
-async def run_migrations(conn):
-    """Führt Schema-Migrationen durch (neue Spalten zu bestehenden Tabellen)."""
-    from sqlalchemy import text, inspect
-
-    def _run(connection):
-        inspector = inspect(connection)
-        if "anlagen" in inspector.get_table_names():
-            existing = {col["name"] for col in inspector.get_columns("anlagen")}
-            # v3.5.x: Wärmepumpenart für fairen JAZ-Vergleich
-            if "wp_art" not in existing:
-                connection.execute(text("ALTER TABLE anlagen ADD COLUMN wp_art VARCHAR(20)"))
-            # v3.30.2 (Issue #254): Rate-Limit-Fenster rollend 24h statt
-            # Monatswechsel. Bestehende Anlagen starten mit NULL — beim
-            # nächsten Submit beginnt ein frisches 24h-Fenster, der alte
-            # Monatszähler wird ignoriert. Damit sind alle Anlagen, die am
-            # Monats-Limit hingen, nach Deploy automatisch entsperrt.
-            if "update_window_start" not in existing:
-                connection.execute(text(
-                    "ALTER TABLE anlagen ADD COLUMN update_window_start TIMESTAMP"
-                ))
-            # v4.0.22 (eedc #387): Jahres-SOLL der Anlage aus der Client-PVGIS-
-            # Prognose. Nenner der saisonalen Hochrechnung; NULL bis der Besitzer
-            # einmal mit einer aktuellen eedc-Version geteilt hat.
-            if "soll_jahr_kwh" not in existing:
-                connection.execute(text(
-                    "ALTER TABLE anlagen ADD COLUMN soll_jahr_kwh FLOAT"
-                ))
-        if "monatswerte" in inspector.get_table_names():
-            existing_mw = {col["name"] for col in inspector.get_columns("monatswerte")}
-            # v4.0.22 (eedc #387 / F-47): Maßstab und Kanon-Größen vom Client.
-            # `soll_ertrag_kwh` trägt den tagesgenau gekürzten Anschaffungsmonat
-            # mit; `co2_vermieden_kg` und `eigenverbrauch_kwh` ersetzen die zwei
-            # Stellen, an denen der Server bisher selbst gerechnet hat.
-            for spalte in ("soll_ertrag_kwh", "co2_vermieden_kg", "eigenverbrauch_kwh"):
-                if spalte not in existing_mw:
-                    connection.execute(text(
-                        f"ALTER TABLE monatswerte ADD COLUMN {spalte} FLOAT"
-                    ))
-
-    await conn.run_sync(_run)
+    """Bringt das Schema auf den aktuellen Stand (core/migrationen.py).
+
+    Steht die Datenbank schon dort, ist das eine einzige Abfrage.
+    """
+    from core.migrationen import migrieren
+
+    return await migrieren(engine, Base.metadata)
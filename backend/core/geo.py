@@ -0,0 +1,284 @@
+"""
+EEDC Community - Kartenvarianten der Bundesländer-Karte
+
+Aus `deutschland-bundeslaender.geo.json` (volle Genauigkeit, ~100 KB) werden
+beim Start kleinere Varianten abgeleitet und im Speicher gehalten:
+
+- **TopoJSON:** gemeinsame Grenzen zweier Länder stehen nur einmal drin
+  (Arcs), Koordinaten quantisiert und delta-kodiert. `react-simple-maps`
+  liest TopoJSON direkt.
+- **Vereinfachtes GeoJSON:** Douglas–Peucker je Toleranz (Grad).
+
+Vereinfacht wird immer auf der Topologie, also Arc für Arc mit festen
+Endpunkten an den Dreiländerecken — dadurch bleiben Nachbarländer
+lückenlos, es entstehen keine Spalten oder Überlappungen an den Grenzen.
+Ringe, die dabei zu weniger als drei Punkten zusammenfallen würden (kleine
+Inseln), behalten ihre Originalpunkte.
+
+Auswahl per Query-Parameter, siehe `main.serve_geojson`.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+from pathlib import Path
+
+Punkt = tuple[float, float]
+
+QUANTISIERUNG = 10_000  # Rasterpunkte je Achse für TopoJSON
+
+
+# =============================================================================
+# Douglas–Peucker
+# =============================================================================
+
+def _abstand(p: Punkt, a: Punkt, b: Punkt) -> float:
+    """Abstand von `p` zur Strecke a–b (bei a == b: zum Punkt a)."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    laenge2 = dx * dx + dy * dy
+    if laenge2 == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / laenge2))
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def douglas_peucker(punkte: list[Punkt], toleranz: float) -> list[Punkt]:
+    """Vereinfacht eine Linie; Anfangs- und Endpunkt bleiben immer erhalten."""
+    if len(punkte) < 3 or toleranz <= 0:
+        return list(punkte)
+    behalten = [False] * len(punkte)
+    behalten[0] = behalten[-1] = True
+    stapel = [(0, len(punkte) - 1)]
+    while stapel:
+        anfang, ende = stapel.pop()
+        max_abstand, max_index = 0.0, None
+        for i in range(anfang + 1, ende):
+            d = _abstand(punkte[i], punkte[anfang], punkte[ende])
+            if d > max_abstand:
+                max_abstand, max_index = d, i
+        if max_index is not None and max_abstand > toleranz:
+            behalten[max_index] = True
+            stapel.append((anfang, max_index))
+            stapel.append((max_index, ende))
+    return [p for p, b in zip(punkte, behalten) if b]
+
+
+# =============================================================================
+# Topologie
+# =============================================================================
+
+def _polygone(geometrie: dict) -> list[list[list[Punkt]]]:
+    """Polygon/MultiPolygon → Liste von Polygonen (Liste von Ringen)."""
+    if geometrie["type"] == "Polygon":
+        polygone = [geometrie["coordinates"]]
+    else:
+        polygone = geometrie["coordinates"]
+    return [[[tuple(p) for p in ring] for ring in polygon] for polygon in polygone]
+
+
+class Topologie:
+    """Zerlegt alle Ringe in gemeinsam genutzte Arcs (wie topojson-server).
+
+    Ein Arc ist eine Punktfolge zwischen zwei Knoten (Punkten mit mehr als
+    zwei verschiedenen Nachbarn). Gemeinsame Grenzen landen als ein Arc im
+    Index; der zweite Ring referenziert ihn rückwärts (`~i`).
+    """
+
+    def __init__(self, features: list[dict]):
+        self.features = features
+        self.geometrien = [_polygone(f["geometry"]) for f in features]
+        ringe = [ring for polygone in self.geometrien for polygon in polygone for ring in polygon]
+
+        nachbarn: dict[Punkt, set[Punkt]] = {}
+        for ring in ringe:
+            offen = ring[:-1]
+            for i, p in enumerate(offen):
+                n = nachbarn.setdefault(p, set())
+                n.add(offen[i - 1])
+                n.add(offen[(i + 1) % len(offen)])
+        self._knoten = {p for p, n in nachbarn.items() if len(n) > 2}
+
+        self.arcs: list[list[Punkt]] = []
+        self._arc_index: dict[tuple[Punkt, ...], int] = {}
+        # Je Feature: Polygone → Ringe → Arc-Referenzen
+        self.referenzen = [
+            [[self._ring_zerlegen(ring) for ring in polygon] for polygon in polygone]
+            for polygone in self.geometrien
+        ]
+
+    def _arc_referenz(self, arc: list[Punkt]) -> int:
+        schluessel = tuple(arc)
+        if schluessel in self._arc_index:
+            return self._arc_index[schluessel]
+        rueckwaerts = tuple(reversed(arc))
+        if rueckwaerts in self._arc_index:
+            return ~self._arc_index[rueckwaerts]
+        self._arc_index[schluessel] = len(self.arcs)
+        self.arcs.append(arc)
+        return len(self.arcs) - 1
+
+    def _ring_zerlegen(self, ring: list[Punkt]) -> list[int]:
+        offen = ring[:-1]
+        knoten = [i for i, p in enumerate(offen) if p in self._knoten]
+        if not knoten:
+            # Ring ohne Knoten (Insel, Enklave): als ganzer Arc, kanonisch ab
+            # dem kleinsten Punkt, damit Berlin und das Brandenburg-Loch
+            # denselben Arc treffen.
+            start = offen.index(min(offen))
+            gedreht = offen[start:] + offen[:start]
+            return [self._arc_referenz(gedreht + [gedreht[0]])]
+
+        gedreht = offen[knoten[0]:] + offen[:knoten[0]]
+        gedreht.append(gedreht[0])
+        schnitte = [i - knoten[0] for i in knoten] + [len(gedreht) - 1]
+        return [
+            self._arc_referenz(gedreht[a:b + 1])
+            for a, b in zip(schnitte, schnitte[1:])
+        ]
+
+    @staticmethod
+    def ring_punkte(referenzen: list[int], arcs: list[list[Punkt]]) -> list[Punkt]:
+        punkte: list[Punkt] = []
+        for ref in referenzen:
+            arc = arcs[ref] if ref >= 0 else list(reversed(arcs[~ref]))
+            punkte.extend(arc if not punkte else arc[1:])
+        return punkte
+
+    def vereinfachte_arcs(self, toleranz: float) -> list[list[Punkt]]:
+        """Arcs nach Douglas–Peucker; entartete Ringe behalten ihre Originale."""
+        arcs = [douglas_peucker(arc, toleranz) for arc in self.arcs]
+        for polygone in self.referenzen:
+            for polygon in polygone:
+                for ring in polygon:
+                    if len(set(self.ring_punkte(ring, arcs))) < 3:
+                        for ref in ring:
+                            i = ref if ref >= 0 else ~ref
+                            arcs[i] = self.arcs[i]
+        return arcs
+
+
+# =============================================================================
+# Ausgabeformate
+# =============================================================================
+
+def als_geojson(topologie: Topologie, arcs: list[list[Punkt]], stellen: int) -> dict:
+    """GeoJSON aus (vereinfachten) Arcs, Koordinaten auf `stellen` gerundet."""
+    features = []
+    for feature, polygone in zip(topologie.features, topologie.referenzen):
+        koordinaten = [
+            [
+                [[round(x, stellen), round(y, stellen)] for x, y in Topologie.ring_punkte(ring, arcs)]
+                for ring in polygon
+            ]
+            for polygon in polygone
+        ]
+        geometrie = (
+            {"type": "Polygon", "coordinates": koordinaten[0]}
+            if feature["geometry"]["type"] == "Polygon"
+            else {"type": "MultiPolygon", "coordinates": koordinaten}
+        )
+        features.append({**feature, "geometry": geometrie})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def als_topojson(topologie: Topologie, arcs: list[list[Punkt]], objekt: str) -> dict:
+    """TopoJSON mit quantisierten, delta-kodierten Arcs."""
+    xs = [p[0] for arc in arcs for p in arc]
+    ys = [p[1] for arc in arcs for p in arc]
+    x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+    kx = (x1 - x0) / (QUANTISIERUNG - 1) or 1
+    ky = (y1 - y0) / (QUANTISIERUNG - 1) or 1
+
+    kodiert = []
+    for arc in arcs:
+        quantisiert = [(round((x - x0) / kx), round((y - y0) / ky)) for x, y in arc]
+        # Nach dem Quantisieren zusammenfallende Nachbarpunkte entfernen
+        punkte = [quantisiert[0]]
+        for p in quantisiert[1:]:
+            if p != punkte[-1]:
+                punkte.append(p)
+        if len(punkte) < 2:
+            punkte.append(quantisiert[-1])
+        delta = [list(punkte[0])]
+        for (ax, ay), (bx, by) in zip(punkte, punkte[1:]):
+            delta.append([bx - ax, by - ay])
+        kodiert.append(delta)
+
+    geometrien = []
+    for feature, polygone in zip(topologie.features, topologie.referenzen):
+        geometrie = {"id": feature.get("id"), "properties": feature.get("properties", {})}
+        if feature["geometry"]["type"] == "Polygon":
+            geometrie.update(type="Polygon", arcs=polygone[0])
+        else:
+            geometrie.update(type="MultiPolygon", arcs=polygone)
+        geometrien.append(geometrie)
+
+    return {
+        "type": "Topology",
+        "bbox": [x0, y0, x1, y1],
+        "transform": {"scale": [kx, ky], "translate": [x0, y0]},
+        "objects": {objekt: {"type": "GeometryCollection", "geometries": geometrien}},
+        "arcs": kodiert,
+    }
+
+
+# =============================================================================
+# Varianten-Cache
+# =============================================================================
+
+@dataclass(frozen=True)
+class Kartenvariante:
+    """Fertig serialisierte Variante samt gzip-Form und ETag."""
+    inhalt: bytes
+    gzip: bytes
+    etag: str
+    media_type: str
+
+
+def _variante(daten: dict, media_type: str) -> Kartenvariante:
+    inhalt = json.dumps(daten, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Kartenvariante(
+        inhalt=inhalt,
+        gzip=gzip.compress(inhalt, compresslevel=9, mtime=0),
+        etag=f'"{hashlib.md5(inhalt, usedforsecurity=False).hexdigest()}"',
+        media_type=media_type,
+    )
+
+
+class Kartenvarianten:
+    """Alle Varianten einer GeoJSON-Datei, beim Start einmal berechnet.
+
+    Schlüssel: (`format`, `toleranz`) mit format ∈ {"geojson", "topojson"} und
+    toleranz ∈ `toleranzen` oder None (nicht vereinfacht). Das unvereinfachte
+    GeoJSON ist die Originaldatei und wird nicht hier, sondern statisch
+    ausgeliefert.
+    """
+
+    FORMATE = ("geojson", "topojson")
+
+    def __init__(self, pfad: Path, toleranzen: list[float]):
+        daten = json.loads(pfad.read_text(encoding="utf-8"))
+        topologie = Topologie(daten["features"])
+        objekt = pfad.name.split(".")[0]
+
+        self.toleranzen = sorted(toleranzen)
+        self.varianten: dict[tuple[str, float | None], Kartenvariante] = {
+            ("topojson", None): _variante(
+                als_topojson(topologie, topologie.arcs, objekt), "application/json"
+            ),
+        }
+        for toleranz in self.toleranzen:
+            arcs = topologie.vereinfachte_arcs(toleranz)
+            # Eine Nachkommastelle feiner als die Toleranz reicht
+            stellen = max(3, math.ceil(-math.log10(toleranz)) + 1)
+            self.varianten[("geojson", toleranz)] = _variante(
+                als_geojson(topologie, arcs, stellen), "application/json"
+            )
+            self.varianten[("topojson", toleranz)] = _variante(
+                als_topojson(topologie, arcs, objekt), "application/json"
+            )
+
+    def holen(self, format: str, toleranz: float | None) -> Kartenvariante | None:
+        return self.varianten.get((format, toleranz))
@@ -0,0 +1,132 @@
+"""
+EEDC Community - Idempotency-Key für wiederholte Schreibanfragen
+
+Home-Assistant-Clients an wackeligen Leitungen wiederholen `POST /api/submit`
+bzw. `DELETE /api/submit/{hash}`, wenn die Antwort ausbleibt — obwohl der
+Server längst geschrieben hat. Schickt der Client einen `Idempotency-Key`
+mit, merkt sich `IdempotenzSpeicher` die erfolgreiche Antwort unter
+SHA-256(Methode, Pfad, Key, Body); die Wiederholung bekommt sie zurück, ohne
+Datenbank und Benchmark-Berechnung (Header `Idempotent-Replayed: true`).
+
+- Nur Erfolge werden gespeichert. Eine Ablehnung (400/429) oder ein Fehler
+  läuft bei der Wiederholung erneut.
+- Gleicher Key mit anderem Body ist ein anderer Eintrag, also eine neue
+  Anfrage.
+- Läuft die erste Anfrage noch, wartet die Wiederholung auf deren Ergebnis
+  statt parallel zu schreiben.
+- Begrenzt: höchstens `max_eintraege`, jeder `ttl` Sekunden gültig; der
+  älteste fliegt zuerst. Der Speicher gilt je Worker-Prozess.
+- Damit eine Wiederholung auf einem anderen Worker dieselbe Antwort bekommt,
+  legen Submit und DELETE ihre Antwort zusätzlich als Quittung in
+  `idempotenz_quittungen` ab, in derselben Transaktion wie die Daten
+  (`quittung_ablegen`). Jeder Worker findet sie dort (`quittung_holen`),
+  ebenfalls `ttl` Sekunden lang. Sonst bekäme ein wiederholter Submit
+  "Anlage unverändert" statt der ursprünglichen Antwort, ein DELETE 404.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+
+
+class IdempotenzSpeicher:
+    """Schlüssel → gespeicherte Antwort, mit TTL und Obergrenze."""
+
+    def __init__(self, max_eintraege: int = 10000, ttl: float = 3600.0):
+        self.max_eintraege = max_eintraege
+        self.ttl = ttl
+        self._eintraege: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._laufend: dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def schluessel(methode: str, pfad: str, key: str, body: bytes) -> str:
+        h = hashlib.sha256()
+        for teil in (methode.encode(), pfad.encode(), key.encode()):
+            h.update(teil)
+            h.update(b"\0")
+        h.update(body)
+        return h.hexdigest()
+
+    def holen(self, schluessel: str) -> Any | None:
+        eintrag = self._eintraege.get(schluessel)
+        if eintrag is None:
+            return None
+        if eintrag[0] < time.monotonic():
+            del self._eintraege[schluessel]
+            return None
+        return eintrag[1]
+
+    def ablegen(self, schluessel: str, antwort: Any) -> None:
+        self._eintraege[schluessel] = (time.monotonic() + self.ttl, antwort)
+        self._eintraege.move_to_end(schluessel)
+        while len(self._eintraege) > self.max_eintraege:
+            self._eintraege.popitem(last=False)
+
+    async def ausfuehren(
+        self, schluessel: str, erzeugen: Callable[[], Awaitable[Any]]
+    ) -> tuple[Any, bool]:
+        """Gespeicherte Antwort oder `erzeugen()`; zweiter Wert: wiederholt?"""
+        while True:
+            antwort = self.holen(schluessel)
+            if antwort is not None:
+                return antwort, True
+            laufend = self._laufend.get(schluessel)
+            if laufend is None:
+                break
+            # Erste Anfrage noch in Arbeit: abwarten. Scheitert sie, läuft
+            # diese hier selbst (nächste Runde findet nichts Gespeichertes).
+            await asyncio.shield(laufend)
+
+        fertig = asyncio.get_running_loop().create_future()
+        self._laufend[schluessel] = fertig
+        try:
+            antwort = await erzeugen()
+            self.ablegen(schluessel, antwort)
+            return antwort, False
+        finally:
+            del self._laufend[schluessel]
+            fertig.set_result(None)
+
+    async def quittung_holen(self, db: AsyncSession, schluessel: str) -> dict | None:
+        """Gespeicherte Antwort aus der Datenbank, solange gültig."""
+        return (await db.execute(
+            text(
+                "SELECT antwort FROM idempotenz_quittungen WHERE schluessel = :schluessel "
+                "AND angelegt_am > now() - make_interval(secs => :ttl)"
+            ),
+            {"schluessel": schluessel, "ttl": self.ttl},
+        )).scalar()
+
+    async def quittung_ablegen(self, db: AsyncSession, schluessel: str, antwort: dict) -> None:
+        """Legt die Antwort in der laufenden Transaktion ab — ohne Commit.
+
+        Abgelaufene Quittungen fallen dabei weg.
+        """
+        await db.execute(
+            text("DELETE FROM idempotenz_quittungen WHERE angelegt_am <= now() - make_interval(secs => :ttl)"),
+            {"ttl": self.ttl},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO idempotenz_quittungen (schluessel, antwort) "
+                "VALUES (:schluessel, CAST(:antwort AS JSON)) ON CONFLICT (schluessel) DO NOTHING"
+            ),
+            {"schluessel": schluessel, "antwort": json.dumps(antwort)},
+        )
+
+    def __len__(self) -> int:
+        return len(self._eintraege)
+
+
+idempotenz = IdempotenzSpeicher(
+    max_eintraege=settings.idempotenz_max_eintraege,
+    ttl=settings.idempotenz_ttl_s,
+)
@@ -0,0 +1,214 @@
+"""
+EEDC Community - Versionierte Schema-Migrationen
+
+Beim Start wird genau eine Zeile gelesen: die höchste Version in
+`schema_version`. Ist sie aktuell, passiert sonst nichts — kein
+`create_all`, keine Inspektion der Spalten, keine Sperren auf Tabellen.
+Nur wenn sie zurückliegt, laufen die fehlenden Schritte aus `MIGRATIONEN`
+in einer Transaktion (beim Serverstart unter `start_sperre`).
+
+- Neue Datenbank: `create_all` legt das aktuelle Schema an, die Version
+  steht danach direkt auf der neuesten.
+- Bestand ohne `schema_version` (vor der Versionierung): `create_all` für
+  fehlende Tabellen, dann alle Schritte. 1–4 sind idempotent
+  (`IF NOT EXISTS`), weil ein Teil davon früher schon per Inspektion lief.
+  Ab 5 läuft jeder Schritt genau einmal (5 baut `monatswerte` partitioniert
+  neu auf, das geht nicht idempotent).
+- Neuer Schritt: unten anhängen, Version + 1, nie einen bestehenden ändern.
+  Die SQL-Dateien unter `backend/migrations/` bleiben Dokumentation für
+  manuelle Audits und Restores.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    beschreibung: str
+    sql: tuple[str, ...]
+
+
+MIGRATIONEN: tuple[Migration, ...] = (
+    Migration(1, "v3.5.x: Wärmepumpenart für fairen JAZ-Vergleich", (
+        "ALTER TABLE anlagen ADD COLUMN IF NOT EXISTS wp_art VARCHAR(20)",
+    )),
+    # Issue #254: bestehende Anlagen starten mit NULL — beim nächsten Submit
+    # beginnt ein frisches 24h-Fenster, der alte Monatszähler wird ignoriert.
+    Migration(2, "v3.30.2: Rate-Limit-Fenster rollend 24h", (
+        "ALTER TABLE anlagen ADD COLUMN IF NOT EXISTS update_window_start TIMESTAMP",
+    )),
+    # eedc #387 / F-47: Jahres-SOLL der Anlage, Monats-SOLL und Kanon-Größen
+    # vom Client. NULL = Altbestand oder Client < v4.0.22.
+    Migration(3, "v4.0.22: SOLL-Maßstab und Kanon-Größen vom Client", (
+        "ALTER TABLE anlagen ADD COLUMN IF NOT EXISTS soll_jahr_kwh FLOAT",
+        "ALTER TABLE monatswerte ADD COLUMN IF NOT EXISTS soll_ertrag_kwh FLOAT",
+        "ALTER TABLE monatswerte ADD COLUMN IF NOT EXISTS co2_vermieden_kg FLOAT",
+        "ALTER TABLE monatswerte ADD COLUMN IF NOT EXISTS eigenverbrauch_kwh FLOAT",
+    )),
+    Migration(4, "Monatsindex monatswerte.periode mit Perioden-Indizes", (
+        "ALTER TABLE monatswerte ADD COLUMN IF NOT EXISTS periode INTEGER "
+        "GENERATED ALWAYS AS (jahr * 12 + monat - 1) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_monatswerte_anlage_periode "
+        "ON monatswerte (anlage_id, periode) INCLUDE ("
+        "ertrag_kwh, autarkie_prozent, speicher_ladung_kwh, speicher_entladung_kwh, "
+        "speicher_ladung_netz_kwh, wp_stromverbrauch_kwh, wp_heizwaerme_kwh, "
+        "wp_warmwasser_kwh, eauto_ladung_gesamt_kwh, eauto_ladung_pv_kwh, eauto_km)",
+        "CREATE INDEX IF NOT EXISTS ix_monatswerte_periode "
+        "ON monatswerte (periode) INCLUDE ("
+        "anlage_id, ertrag_kwh, autarkie_prozent, speicher_ladung_kwh, speicher_entladung_kwh, "
+        "speicher_ladung_netz_kwh, wp_stromverbrauch_kwh, wp_heizwaerme_kwh, "
+        "wp_warmwasser_kwh, eauto_ladung_gesamt_kwh, eauto_ladung_pv_kwh, eauto_km)",
+    )),
+    # Bestandstabelle umkopieren: eine partitionierte Tabelle lässt sich nicht
+    # per ALTER erzeugen. Indizes erst nach dem Kopieren; die ID-Sequenz zieht
+    # mit um, damit neue IDs nicht von vorn beginnen.
+    Migration(5, "monatswerte nach Jahr partitioniert", (
+        "ALTER TABLE monatswerte RENAME TO monatswerte_alt",
+        "ALTER INDEX monatswerte_pkey RENAME TO monatswerte_alt_pkey",
+        "DROP INDEX IF EXISTS ix_monatswerte_anlage_zeit",
+        "DROP INDEX IF EXISTS ix_monatswerte_anlage_periode",
+        "DROP INDEX IF EXISTS ix_monatswerte_periode",
+        "CREATE TABLE monatswerte (LIKE monatswerte_alt INCLUDING DEFAULTS INCLUDING GENERATED) "
+        "PARTITION BY RANGE (jahr)",
+        "ALTER TABLE monatswerte ADD CONSTRAINT monatswerte_pkey PRIMARY KEY (id, jahr)",
+        "ALTER TABLE monatswerte ADD CONSTRAINT monatswerte_anlage_id_fkey "
+        "FOREIGN KEY (anlage_id) REFERENCES anlagen (id) ON DELETE CASCADE",
+        *(
+            f"CREATE TABLE monatswerte_{jahr} PARTITION OF monatswerte "
+            f"FOR VALUES FROM ({jahr}) TO ({jahr + 1})"
+            for jahr in range(2010, 2051)
+        ),
+        "CREATE TABLE monatswerte_default PARTITION OF monatswerte DEFAULT",
+        """
+        DO $$
+        DECLARE
+            sequenz text;
+            spalten text;
+        BEGIN
+            sequenz := pg_get_serial_sequence('monatswerte_alt', 'id');
+            EXECUTE 'ALTER SEQUENCE ' || sequenz || ' OWNED BY monatswerte.id';
+            SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO spalten
+            FROM pg_attribute
+            WHERE attrelid = 'monatswerte_alt'::regclass
+              AND attnum > 0 AND NOT attisdropped AND attgenerated = '';
+            EXECUTE 'INSERT INTO monatswerte (' || spalten || ') '
+                 || 'SELECT ' || spalten || ' FROM monatswerte_alt';
+        END $$
+        """,
+        "CREATE UNIQUE INDEX ix_monatswerte_anlage_zeit ON monatswerte (anlage_id, jahr, monat)",
+        "CREATE INDEX ix_monatswerte_anlage_periode "
+        "ON monatswerte (anlage_id, periode) INCLUDE ("
+        "ertrag_kwh, autarkie_prozent, speicher_ladung_kwh, speicher_entladung_kwh, "
+        "speicher_ladung_netz_kwh, wp_stromverbrauch_kwh, wp_heizwaerme_kwh, "
+        "wp_warmwasser_kwh, eauto_ladung_gesamt_kwh, eauto_ladung_pv_kwh, eauto_km)",
+        "CREATE INDEX ix_monatswerte_periode "
+        "ON monatswerte (periode) INCLUDE ("
+        "anlage_id, ertrag_kwh, autarkie_prozent, speicher_ladung_kwh, speicher_entladung_kwh, "
+        "speicher_ladung_netz_kwh, wp_stromverbrauch_kwh, wp_heizwaerme_kwh, "
+        "wp_warmwasser_kwh, eauto_ladung_gesamt_kwh, eauto_ladung_pv_kwh, eauto_km)",
+        "DROP TABLE monatswerte_alt",
+        "ANALYZE monatswerte",
+    )),
+    Migration(6, "Idempotenz-Quittungen für DELETE über alle Worker", (
+        "CREATE TABLE IF NOT EXISTS idempotenz_quittungen ("
+        "schluessel VARCHAR(64) PRIMARY KEY, "
+        "antwort JSON NOT NULL, "
+        "angelegt_am TIMESTAMP NOT NULL DEFAULT now())",
+        "CREATE INDEX IF NOT EXISTS ix_idempotenz_quittungen_angelegt_am "
+        "ON idempotenz_quittungen (angelegt_am)",
+    )),
+    Migration(7, "Vorberechnung: ein rechnender Worker, Schnappschuss für alle", (
+        "CREATE TABLE IF NOT EXISTS vorberechnung_stand ("
+        "id SERIAL PRIMARY KEY, "
+        "version BIGINT NOT NULL, "
+        "werte JSON NOT NULL, "
+        "berechnet_am TIMESTAMP NOT NULL DEFAULT now())",
+    )),
+    Migration(8, "Änderungsprotokoll je Datenversion für die Analytik", (
+        "CREATE TABLE IF NOT EXISTS daten_aenderungen ("
+        "version BIGINT PRIMARY KEY, "
+        "anlage_ids JSON NOT NULL)",
+    )),
+)
+
+SCHEMA_VERSION = MIGRATIONEN[-1].version
+
+
+@dataclass
+class SchemaStand:
+    """Ergebnis von `migrieren`: Version danach und die dabei gelaufenen Schritte."""
+    version: int
+    angewendet: list[int] = field(default_factory=list)
+    angelegt: bool = False
+
+
+async def schema_version_lesen(engine: AsyncEngine) -> int | None:
+    """Höchste angewendete Version; None, wenn es `schema_version` noch nicht gibt."""
+    async with engine.connect() as conn:
+        try:
+            return (await conn.execute(text("SELECT max(version) FROM schema_version"))).scalar() or 0
+        except DBAPIError:
+            return None
+
+
+async def migrieren(engine: AsyncEngine, metadata) -> SchemaStand:
+    """Bringt das Schema auf `SCHEMA_VERSION` — oder tut nichts, wenn es dort steht."""
+    version = await schema_version_lesen(engine)
+    if version is not None and version >= SCHEMA_VERSION:
+        if version > SCHEMA_VERSION:
+            logger.warning(
+                "Schema-Version %s ist neuer als dieser Code (%s)", version, SCHEMA_VERSION
+            )
+        return SchemaStand(version=version)
+
+    async with engine.begin() as conn:
+        return await _nachziehen(conn, metadata, version)
+
+
+async def _nachziehen(conn: AsyncConnection, metadata, version: int | None) -> SchemaStand:
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "beschreibung TEXT NOT NULL, "
+        "angewendet_am TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+    angelegt = False
+    if version is None:
+        # Neue Datenbank: create_all liefert schon das aktuelle Schema
+        angelegt = (await conn.execute(text("SELECT to_regclass('anlagen')"))).scalar() is None
+        version = SCHEMA_VERSION if angelegt else 0
+
+    await conn.run_sync(metadata.create_all)
+    # Einzeilige Tabelle mit der gemeinsamen Datenversion (core/cache.py)
+    await conn.execute(text(
+        "INSERT INTO daten_stand (id, version, geaendert_am) VALUES (1, 0, now()) "
+        "ON CONFLICT (id) DO NOTHING"
+    ))
+
+    angewendet = []
+    for migration in MIGRATIONEN:
+        if migration.version <= version:
+            continue
+        for anweisung in migration.sql:
+            await conn.execute(text(anweisung))
+        angewendet.append(migration.version)
+        logger.info("Schema-Migration %s: %s", migration.version, migration.beschreibung)
+
+    # Alle Schritte als erledigt vermerken — bei einer neuen Datenbank auch
+    # die, die create_all überflüssig gemacht hat
+    await conn.execute(
+        text(
+            "INSERT INTO schema_version (version, beschreibung) VALUES (:version, :beschreibung) "
+            "ON CONFLICT (version) DO NOTHING"
+        ),
+        [{"version": m.version, "beschreibung": m.beschreibung} for m in MIGRATIONEN],
+    )
+    return SchemaStand(version=SCHEMA_VERSION, angewendet=angewendet, angelegt=angelegt)
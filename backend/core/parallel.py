@@ -0,0 +1,146 @@
+"""
+EEDC Community - Unabhängige Leseabfragen nebenläufig
+
+Eine AsyncSession führt ihre Abfragen nacheinander aus; ein Handler mit fünf
+voneinander unabhängigen Aggregaten wartet also fünf Roundtrips ab.
+`parallel_lesen(db, *abfragen)` verteilt solche Abfragen auf eigene
+Verbindungen und sammelt die Ergebnisse mit `asyncio.gather` ein — die Dauer
+nähert sich der langsamsten Einzelabfrage.
+
+- Eine Abfrage ist eine Koroutinenfunktion `abfrage(session)`, etwa
+  `compute_speicher_stats`; für ein einzelnes Statement gibt es `skalar()`,
+  `zeile()` und `zeilen()`. Sie darf nur lesen.
+- Die Abfragen werden reihum auf die Session der Anfrage und die gerade
+  freien der `settings.parallel_lesen_verbindungen` Zusatzverbindungen des
+  Worker-Prozesses verteilt; je Verbindung laufen sie nacheinander. Gewartet
+  wird nie auf eine Verbindung, auch nicht bei verschachtelten Aufrufen —
+  ist keine frei, läuft alles auf der Session der Anfrage.
+- Die zusätzlichen Verbindungen kommen aus einem eigenen kleinen Pool je
+  Datenbank (Primary bzw. Lese-Replika, core/database.py), nicht aus dem der
+  Anfragen.
+- In READ COMMITTED sieht ohnehin jede Abfrage ihren eigenen Stand, das
+  Aufteilen ändert daran nichts. Läuft `db` dagegen in einer Transaktion
+  mit fester Isolationsstufe (REPEATABLE READ der Vorberechnung), bleibt
+  alles nacheinander auf `db` — nur dort sehen alle Abfragen denselben Stand.
+- Ebenso innerhalb von `ohne_zusatzverbindungen()`: für Lesen in einer
+  Schreib-Transaktion, deren noch nicht festgeschriebene Änderungen die
+  Zusatzverbindungen nicht sähen.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator
+
+from sqlalchemy import Executable
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from core.config import settings
+
+Abfrage = Callable[[AsyncSession], Awaitable[Any]]
+
+#: Freie Zusatzverbindungen dieses Worker-Prozesses
+_frei = settings.parallel_lesen_verbindungen
+
+#: Pool für Zusatzverbindungen je Engine der Anfrage-Session
+_pools: dict[int, AsyncEngine] = {}
+
+_nur_session: ContextVar[bool] = ContextVar("parallel_nur_session", default=False)
+
+
+@contextmanager
+def ohne_zusatzverbindungen() -> Iterator[None]:
+    """Im aktuellen Task alles nacheinander auf der Session der Anfrage."""
+    token = _nur_session.set(True)
+    try:
+        yield
+    finally:
+        _nur_session.reset(token)
+
+
+def skalar(statement: Executable) -> Abfrage:
+    """Abfrage, die den ersten Wert der ersten Zeile liefert."""
+    async def abfrage(db: AsyncSession) -> Any:
+        return (await db.execute(statement)).scalar()
+    return abfrage
+
+
+def zeile(statement: Executable) -> Abfrage:
+    """Abfrage, die genau eine Zeile liefert."""
+    async def abfrage(db: AsyncSession) -> Any:
+        return (await db.execute(statement)).one()
+    return abfrage
+
+
+def zeilen(statement: Executable) -> Abfrage:
+    """Abfrage, die alle Zeilen als Liste liefert."""
+    async def abfrage(db: AsyncSession) -> Any:
+        return (await db.execute(statement)).all()
+    return abfrage
+
+
+def _pool(bind: AsyncEngine) -> AsyncEngine:
+    pool = _pools.get(id(bind))
+    if pool is None:
+        pool = _pools[id(bind)] = create_async_engine(
+            bind.url,
+            pool_size=max(settings.parallel_lesen_verbindungen, 1),
+            max_overflow=0,
+        )
+        # Verschachtelte Aufrufe aus einer Zusatzverbindung nutzen denselben Pool
+        _pools[id(pool)] = pool
+    return pool
+
+
+async def _fester_stand(db: AsyncSession) -> bool:
+    """Läuft `db` in einer Transaktion mit eigener Isolationsstufe?"""
+    if not db.in_transaction():
+        return False
+    verbindung = await db.connection()
+    return "isolation_level" in verbindung.sync_connection.get_execution_options()
+
+
+async def _nacheinander(db: AsyncSession, bahn: list[tuple[int, Abfrage]]) -> dict[int, Any]:
+    return {i: await abfrage(db) for i, abfrage in bahn}
+
+
+async def _eigene_verbindung(bind: AsyncEngine, bahn: list[tuple[int, Abfrage]]) -> dict[int, Any]:
+    async with AsyncSession(_pool(bind), expire_on_commit=False) as session:
+        return await _nacheinander(session, bahn)
+
+
+def _freigeben(_aufgabe: asyncio.Task) -> None:
+    # Als Callback, damit auch eine vor dem Start abgebrochene Aufgabe freigibt
+    global _frei
+    _frei += 1
+
+
+async def parallel_lesen(db: AsyncSession, *abfragen: Abfrage) -> list[Any]:
+    """Ergebnisse der Abfragen in Aufrufreihenfolge."""
+    global _frei
+    zusatz = min(_frei, len(abfragen) - 1)
+    if zusatz <= 0 or _nur_session.get() or await _fester_stand(db):
+        return [await abfrage(db) for abfrage in abfragen]
+
+    # Reihum auf die Session der Anfrage und die Zusatzverbindungen verteilen
+    _frei -= zusatz
+    bahnen: list[list[tuple[int, Abfrage]]] = [[] for _ in range(zusatz + 1)]
+    for i, abfrage in enumerate(abfragen):
+        bahnen[i % len(bahnen)].append((i, abfrage))
+    aufgaben = []
+    for bahn in bahnen[1:]:
+        aufgabe = asyncio.create_task(_eigene_verbindung(db.bind, bahn))
+        aufgabe.add_done_callback(_freigeben)
+        aufgaben.append(aufgabe)
+
+    # Erst zurückkehren, wenn alle fertig sind — auch im Fehlerfall, sonst
+    # liefe noch eine Abfrage auf `db`, während der Handler sie schließt
+    ergebnisse = await asyncio.gather(
+        _nacheinander(db, bahnen[0]), *aufgaben, return_exceptions=True
+    )
+    nach_index: dict[int, Any] = {}
+    for ergebnis in ergebnisse:
+        if isinstance(ergebnis, BaseException):
+            raise ergebnis
+        nach_index.update(ergebnis)
+    return [nach_index[i] for i in range(len(abfragen))]
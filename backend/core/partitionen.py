@@ -0,0 +1,81 @@
+"""
+EEDC Community - Jahrespartitionen von monatswerte
+
+`monatswerte` wächst um eine Zeile je Anlage und Monat, gelesen werden fast
+immer die letzten 12–24 Monate oder ein einzelner Monat. Die Tabelle ist
+deshalb nach `jahr` partitioniert (`PARTITION BY RANGE (jahr)`), eine
+Partition `monatswerte_JJJJ` je Jahr aus `PARTITION_JAHRE` plus
+`monatswerte_default` für alles außerhalb.
+
+- Angelegt werden alle Partitionen mit der Tabelle (`models.py`, Ereignis
+  `after_create`) bzw. von Migration 5 für den Bestand (core/migrationen.py).
+  Der Jahresbereich ist der von `MonatswertInput.jahr` — es muss nie zur
+  Laufzeit eine Partition nachgelegt werden.
+- Partition-Pruning greift nur auf `jahr`. Filter auf `periode` tragen
+  deshalb zusätzlich die Jahresgrenzen (`aggregations.im_zeitraum`).
+- Alte Jahre lassen sich abhängen (`python manage.py partitionen abhaengen
+  JJJJ`): die Partition bleibt als eigene Tabelle erhalten, fällt aber aus
+  allen Auswertungen. Reicht ein Client solche Monate erneut ein, landen sie
+  in `monatswerte_default`. `anhaengen` macht es rückgängig.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+#: Ein Jahr je Partition — derselbe Bereich wie `MonatswertInput.jahr`
+PARTITION_JAHRE = range(2010, 2051)
+
+
+def partition_name(jahr: int) -> str:
+    return f"monatswerte_{jahr}"
+
+
+def partitionen_sql() -> list[str]:
+    """DDL für alle Jahrespartitionen und die DEFAULT-Partition (idempotent)."""
+    return [
+        f"CREATE TABLE IF NOT EXISTS {partition_name(jahr)} PARTITION OF monatswerte "
+        f"FOR VALUES FROM ({jahr}) TO ({jahr + 1})"
+        for jahr in PARTITION_JAHRE
+    ] + ["CREATE TABLE IF NOT EXISTS monatswerte_default PARTITION OF monatswerte DEFAULT"]
+
+
+@dataclass
+class Partition:
+    name: str
+    zeilen: int
+    bytes: int
+    angehaengt: bool
+
+
+async def partitionen_auflisten(db: AsyncSession) -> list[Partition]:
+    """Angehängte Partitionen und abgehängte `monatswerte_JJJJ`-Tabellen."""
+    result = await db.execute(text(
+        "SELECT c.relname AS name, c.reltuples::bigint AS zeilen, "
+        "pg_total_relation_size(c.oid) AS bytes, "
+        "EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid "
+        "        AND i.inhparent = 'monatswerte'::regclass) AS angehaengt "
+        "FROM pg_class c "
+        "WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace "
+        "AND (c.relname ~ '^monatswerte_[0-9]{4}$' OR c.relname = 'monatswerte_default') "
+        "ORDER BY c.relname"
+    ))
+    return [Partition(row.name, max(row.zeilen, 0), row.bytes, row.angehaengt) for row in result]
+
+
+async def partition_abhaengen(db: AsyncSession, jahr: int) -> None:
+    """Nimmt ein Jahr aus `monatswerte` heraus; die Tabelle bleibt als Archiv."""
+    await db.execute(text(f"ALTER TABLE monatswerte DETACH PARTITION {partition_name(jahr)}"))
+
+
+async def partition_anhaengen(db: AsyncSession, jahr: int) -> None:
+    """Hängt ein zuvor abgehängtes Jahr wieder an.
+
+    Scheitert, solange `monatswerte_default` Zeilen dieses Jahres enthält
+    (nach dem Abhängen erneut eingereicht) — die müssen vorher weg.
+    """
+    await db.execute(text(
+        f"ALTER TABLE monatswerte ATTACH PARTITION {partition_name(jahr)} "
+        f"FOR VALUES FROM ({jahr}) TO ({jahr + 1})"
+    ))
@@ -0,0 +1,41 @@
+"""
+EEDC Community - Schnelle JSON-Antworten
+
+Opt-in über `settings.schnelle_json_antworten`. Dann wird `SchnellJSONResponse`
+App-Default (als `Default(...)`, damit FastAPI seinen eigenen Schnellpfad
+behält):
+
+- Endpoints mit `response_model` serialisiert neueres FastAPI direkt per
+  Pydantic-Core zu Bytes — ohne Zwischen-Dict. Ältere Versionen
+  liefern hier das Dict aus `TypeAdapter.dump_python`, das dann unten landet.
+- Alles andere (Dict-Antworten wie `/api/benchmark/anlage/...`) rendert
+  `orjson`, falls installiert, sonst `json.dumps` wie Starlette.
+- Wird ein Pydantic-Modell direkt übergeben (`return SchnellJSONResponse(m)`),
+  geht es über `model_dump_json` — ohne `jsonable_encoder`.
+
+Messung: `python benchmarks/serialization.py`.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional, siehe requirements.txt
+    orjson = None
+
+
+class SchnellJSONResponse(JSONResponse):
+    """JSONResponse mit Pydantic-/orjson-Serialisierung."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
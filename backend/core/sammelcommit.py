@@ -0,0 +1,126 @@
+"""
+EEDC Community - Gruppen-Commit für Schreibspitzen
+
+Erscheint ein neues eedc-Release, reichen tausende Installationen in
+derselben Stunde ein. Jeder Submit einzeln heißt: eigene Transaktion, eigene
+Rollup-Sperren, eigener Commit (fsync). `Sammelcommit` reiht Aufträge in eine
+asyncio-Queue; ein Schreib-Task nimmt, was innerhalb von `wartezeit`
+Sekunden (höchstens `max_auftraege`) zusammenkommt, und übergibt es als
+einen Stapel an `verarbeiten` — eine Transaktion für alle.
+
+- `verarbeiten(auftraege)` liefert je Auftrag ein Ergebnis oder eine
+  Exception (fachliche Ablehnung, z. B. 429), in derselben Reihenfolge.
+- Scheitert ein ganzer Stapel (DB-Fehler, Konflikt mit einem anderen
+  Worker), wird jeder Auftrag einzeln wiederholt — ein fehlerhafter Auftrag
+  reißt die anderen nicht mit.
+- Der Task startet beim ersten Auftrag; `stoppen()` arbeitet die Queue
+  noch ab.
+
+Zähler: `GET /api/health/sammelcommit`.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SammelMetriken:
+    auftraege: int = 0
+    stapel: int = 0
+    groesster_stapel: int = 0
+    einzeln_wiederholt: int = 0
+
+    def als_dict(self) -> dict:
+        return {
+            **vars(self),
+            "durchschnitt_stapel": round(self.auftraege / self.stapel, 2) if self.stapel else None,
+        }
+
+
+class Sammelcommit:
+    """Fasst gleichzeitige Aufträge zu Stapeln zusammen und verarbeitet sie gemeinsam."""
+
+    def __init__(
+        self,
+        verarbeiten: Callable[[list[Any]], Awaitable[list[Any]]],
+        max_auftraege: int = 50,
+        wartezeit: float = 0.005,
+    ):
+        self._verarbeiten = verarbeiten
+        self.max_auftraege = max_auftraege
+        self.wartezeit = wartezeit
+        self.metriken = SammelMetriken()
+        self._queue: asyncio.Queue[tuple[Any, asyncio.Future]] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def einreihen(self, auftrag: Any) -> Any:
+        """Auftrag einreihen und auf sein Ergebnis warten (Ergebnis oder Exception)."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._schleife())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((auftrag, future))
+        return await future
+
+    async def stoppen(self) -> None:
+        """Restliche Aufträge abarbeiten, dann den Schreib-Task beenden."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _schleife(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            stapel = [await self._queue.get()]
+            frist = loop.time() + self.wartezeit
+            while len(stapel) < self.max_auftraege:
+                rest = frist - loop.time()
+                if rest <= 0:
+                    break
+                try:
+                    stapel.append(await asyncio.wait_for(self._queue.get(), rest))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                self.metriken.stapel += 1
+                self.metriken.auftraege += len(stapel)
+                self.metriken.groesster_stapel = max(self.metriken.groesster_stapel, len(stapel))
+                await self._abarbeiten(stapel)
+            finally:
+                for _ in stapel:
+                    self._queue.task_done()
+
+    async def _abarbeiten(self, stapel: list[tuple[Any, asyncio.Future]]) -> None:
+        try:
+            ergebnisse = await self._verarbeiten([auftrag for auftrag, _ in stapel])
+        except Exception as e:
+            if len(stapel) == 1:
+                _setzen(stapel[0][1], exception=e)
+                return
+            logger.warning("Sammelcommit: Stapel mit %s Aufträgen gescheitert (%r), einzeln", len(stapel), e)
+            self.metriken.einzeln_wiederholt += len(stapel)
+            for einzeln in stapel:
+                await self._abarbeiten([einzeln])
+            return
+        for (_, future), ergebnis in zip(stapel, ergebnisse):
+            _setzen(future, ergebnis=ergebnis)
+
+
+def _setzen(future: asyncio.Future, ergebnis: Any = None, exception: Exception | None = None) -> None:
+    # Der Aufrufer kann inzwischen abgebrochen haben (Client weg)
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(ergebnis)
@@ -0,0 +1,193 @@
+"""
+EEDC Community - Bündelung gleichzeitiger, identischer GET-Anfragen
+
+Wird das Dashboard irgendwo prominent verlinkt, kommen Dutzende identische
+Anfragen (`/api/stats`, `/api/statistics/rankings/spez_ertrag`, ...) im
+selben Moment an, und jede rechnet alles unabhängig von vorn. Die
+`SingleFlightMiddleware` lässt pro Schlüssel nur eine Berechnung laufen:
+weitere Anfragen mit demselben Schlüssel warten auf sie und bekommen
+dieselbe Antwort.
+
+- Schlüssel: Pfad + Query-Parameter in sortierter Reihenfolge
+  (`?b=1&a=2` ≡ `?a=2&b=1`). Die gebündelten GET-Endpoints sind reine
+  Funktionen davon — nichts hängt an IP, Cookies oder Headern.
+- Nur GET unter `/api/`, ohne die `ausnahmen` (Standard: `/api/export/`,
+  dessen Antworten gestreamt werden und beliebig groß sind). Die Middleware
+  sitzt innerhalb von gzip, jede Anfrage wird also trotzdem nach ihrem
+  eigenen `Accept-Encoding` komprimiert.
+- Geteilt wird nur, was vollständig gepuffert werden kann
+  (`settings.buendelung_max_bytes`) und kein 5xx ist. Sobald feststeht, dass
+  eine Antwort nicht teilbar ist, rechnen die wartenden Anfragen selbst —
+  ebenso, wenn die erste Anfrage scheitert.
+- Kein Cache: ist die Berechnung fertig, rechnet die nächste Anfrage neu
+  (dafür gibt es `core/cache.py`).
+
+Zähler je Route: `GET /api/health/buendelung`.
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@dataclass
+class _Antwort:
+    start: Message
+    body: bytes
+    route: str
+
+
+@dataclass
+class RoutenZaehler:
+    anfragen: int = 0
+    berechnet: int = 0
+    gebuendelt: int = 0
+
+
+@dataclass
+class BuendelungsMetriken:
+    routen: dict[str, RoutenZaehler] = field(default_factory=dict)
+
+    def zaehlen(self, route: str, gebuendelt: bool) -> None:
+        zaehler = self.routen.setdefault(route, RoutenZaehler())
+        zaehler.anfragen += 1
+        if gebuendelt:
+            zaehler.gebuendelt += 1
+        else:
+            zaehler.berechnet += 1
+
+    def als_dict(self) -> dict:
+        gesamt = RoutenZaehler()
+        for z in self.routen.values():
+            gesamt.anfragen += z.anfragen
+            gesamt.berechnet += z.berechnet
+            gesamt.gebuendelt += z.gebuendelt
+        return {
+            "anfragen": gesamt.anfragen,
+            "berechnet": gesamt.berechnet,
+            "gebuendelt": gesamt.gebuendelt,
+            "routen": {
+                route: vars(z) for route, z in sorted(self.routen.items())
+            },
+        }
+
+
+buendelung_metriken = BuendelungsMetriken()
+
+
+def anfrage_schluessel(scope: Scope) -> str:
+    """Pfad + normalisierte Query (sortiert, leere Werte behalten)."""
+    query = scope.get("query_string", b"").decode("latin-1")
+    parameter = sorted(parse_qsl(query, keep_blank_values=True))
+    return scope["path"] + ("?" + urlencode(parameter) if parameter else "")
+
+
+def _route(scope: Scope) -> str:
+    """Routen-Template (`/api/benchmark/anlage/{anlage_hash}`), nach dem Routing gesetzt.
+
+    Bei eingebundenen Routern kennt die Route nur ihren Pfad ohne Präfix;
+    das Präfix kommt aus dem tatsächlichen Pfad (gleiche Segmentanzahl).
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return scope["path"]
+    segmente = scope["path"].split("/")
+    praefix = segmente[:len(segmente) - len(template.split("/")) + 1]
+    return "/".join(praefix) + template if len(praefix) > 1 else template
+
+
+class SingleFlightMiddleware:
+    """Eine Berechnung je Schlüssel; gleichzeitige Duplikate teilen ihr Ergebnis."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_bytes: int = 4 * 1024 * 1024,
+        metriken: BuendelungsMetriken = buendelung_metriken,
+        ausnahmen: tuple[str, ...] = ("/api/export/",),
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.ausnahmen = ausnahmen
+        self.metriken = metriken
+        self._laufend: dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not (
+            scope["type"] == "http"
+            and scope["method"] == "GET"
+            and scope["path"].startswith("/api/")
+            and not scope["path"].startswith(self.ausnahmen)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        schluessel = anfrage_schluessel(scope)
+        laufend = self._laufend.get(schluessel)
+        if laufend is not None:
+            try:
+                antwort = await asyncio.shield(laufend)
+            except Exception:
+                antwort = None
+            if antwort is not None:
+                self.metriken.zaehlen(antwort.route, gebuendelt=True)
+                await send({**antwort.start, "headers": list(antwort.start["headers"])})
+                await send({"type": "http.response.body", "body": antwort.body})
+                return
+            # Nicht teilbar (zu groß, 5xx, Fehler): selbst rechnen
+            await self.app(scope, receive, send)
+            self.metriken.zaehlen(_route(scope), gebuendelt=False)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._laufend[schluessel] = future
+        start: Message | None = None
+        teile: list[bytes] = []
+        groesse = 0
+        teilbar = True
+
+        def nicht_teilbar() -> None:
+            # Wartende sofort selbst rechnen lassen, neue gar nicht erst anhängen
+            nonlocal teilbar
+            teilbar = False
+            teile.clear()
+            if not future.done():
+                future.set_result(None)
+            if self._laufend.get(schluessel) is future:
+                del self._laufend[schluessel]
+
+        async def mitschreiben(message: Message) -> None:
+            nonlocal start, groesse
+            if message["type"] == "http.response.start":
+                # Kopie: gzip weiter außen ändert die Header-Liste in place
+                start = {**message, "headers": list(message.get("headers", []))}
+                if message["status"] >= 500:
+                    nicht_teilbar()
+            elif message["type"] == "http.response.body" and teilbar:
+                groesse += len(message.get("body", b""))
+                if groesse > self.max_bytes:
+                    nicht_teilbar()
+                else:
+                    teile.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, mitschreiben)
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else RuntimeError(repr(e)))
+                future.exception()  # als abgerufen markieren, falls niemand wartet
+            raise
+        else:
+            route = _route(scope)
+            self.metriken.zaehlen(route, gebuendelt=False)
+            if not future.done():
+                future.set_result(
+                    _Antwort(start=start, body=b"".join(teile), route=route)
+                    if start is not None and teilbar else None
+                )
+        finally:
+            if self._laufend.get(schluessel) is future:
+                del self._laufend[schluessel]
@@ -0,0 +1,215 @@
+"""
+EEDC Community - Statische Dateien und Kompression
+
+- JSON-Antworten unter `/api/` werden ab `settings.gzip_min_bytes` per gzip
+  komprimiert (`ApiGZipMiddleware`).
+- Das Frontend-Verzeichnis wird beim Start einmal indexiert
+  (`StatischerIndex`): URL-Pfad → Größe, mtime, ETag, vorkomprimierte
+  Varianten. Eine Anfrage ist danach ein Dict-Lookup — kein `exists()`/
+  `is_file()` pro Bot-Request, und ein Pfad wie `../core/config.py` kann gar
+  nicht getroffen werden, weil er nicht im Index steht.
+- Statische Dateien werden nicht zur Laufzeit komprimiert: `precompress.py`
+  legt beim Docker-Build `.br`/`.gz`-Geschwister an, ausgeliefert wird die
+  beste Variante, die der Client per `Accept-Encoding` annimmt.
+- Gehashte Vite-Assets (`/assets/index-<hash>.js`) sind unveränderlich und
+  bekommen ein Jahr `immutable`; `index.html` muss dagegen immer revalidiert
+  werden, sonst sieht der Browser neue Asset-Hashes nicht.
+- Bedingte Anfragen (`If-None-Match`, `If-Modified-Since`) → 304, `HEAD`
+  liefert nur die Header.
+
+Der Index sieht nur, was beim Start da war — das Image ist unveränderlich.
+"""
+
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi.responses import FileResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDIEREN = "no-cache"
+
+# Reihenfolge = Vorzug: Brotli ist bei JS/CSS ~15–20 % kleiner als gzip
+VARIANTEN = (("br", ".br"), ("gzip", ".gz"))
+
+
+class ApiGZipMiddleware:
+    """gzip nur für `/api/`-Antworten; statische Dateien kommen vorkomprimiert."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+def _akzeptierte_encodings(accept_encoding: str) -> set[str]:
+    """Encodings aus `Accept-Encoding`, ohne solche mit `q=0`."""
+    encodings = set()
+    for teil in accept_encoding.lower().split(","):
+        name, *parameter = (p.strip() for p in teil.split(";"))
+        q = 1.0
+        for p in parameter:
+            schluessel, _, wert = p.partition("=")
+            if schluessel == "q":
+                try:
+                    q = float(wert)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            encodings.add(name)
+    return encodings
+
+
+# =============================================================================
+# Index
+# =============================================================================
+
+@dataclass(frozen=True)
+class Darstellung:
+    """Eine ausgelieferte Datei: Original oder vorkomprimierte Variante."""
+    pfad: Path
+    stat: os.stat_result
+    etag: str
+    encoding: str | None = None
+
+
+@dataclass(frozen=True)
+class StatischeDatei:
+    """Indexeintrag einer Datei samt ihrer Varianten."""
+    original: Darstellung
+    media_type: str
+    last_modified: str
+    cache_control: str | None
+    varianten: dict[str, Darstellung] = field(default_factory=dict)
+
+    def darstellung(self, accept_encoding: str) -> Darstellung:
+        """Beste Variante für den Client, sonst das Original."""
+        if self.varianten:
+            akzeptiert = _akzeptierte_encodings(accept_encoding)
+            for encoding, _ in VARIANTEN:
+                if encoding in self.varianten and (encoding in akzeptiert or "*" in akzeptiert):
+                    return self.varianten[encoding]
+        return self.original
+
+
+def _darstellung(pfad: Path, encoding: str | None = None) -> Darstellung:
+    # Inhalts-Hash statt mtime: gleich über Container und Rebuilds hinweg
+    inhalt_hash = hashlib.md5(pfad.read_bytes(), usedforsecurity=False).hexdigest()
+    return Darstellung(pfad=pfad, stat=pfad.stat(), etag=f'"{inhalt_hash}"', encoding=encoding)
+
+
+class StatischerIndex:
+    """Einmal beim Start aufgebauter Index eines statischen Verzeichnisses."""
+
+    def __init__(self, verzeichnis: Path):
+        self.verzeichnis = verzeichnis.resolve()
+        self.dateien: dict[str, StatischeDatei] = {}
+        varianten_endungen = tuple(endung for _, endung in VARIANTEN)
+
+        for pfad in sorted(self.verzeichnis.rglob("*")):
+            if not pfad.is_file() or pfad.name.endswith(varianten_endungen):
+                continue
+            # Symlinks, die aus dem Verzeichnis herauszeigen, nicht aufnehmen
+            if not pfad.resolve().is_relative_to(self.verzeichnis):
+                continue
+
+            schluessel = pfad.relative_to(self.verzeichnis).as_posix()
+            original = _darstellung(pfad)
+            varianten = {}
+            for encoding, endung in VARIANTEN:
+                variante = pfad.with_name(pfad.name + endung)
+                if variante.is_file():
+                    varianten[encoding] = _darstellung(variante, encoding)
+
+            if schluessel.startswith("assets/"):
+                cache_control = CACHE_IMMUTABLE
+            elif schluessel == "index.html":
+                cache_control = CACHE_REVALIDIEREN
+            else:
+                cache_control = None
+
+            self.dateien[schluessel] = StatischeDatei(
+                original=original,
+                media_type=mimetypes.guess_type(pfad.name)[0] or "text/plain",
+                last_modified=formatdate(original.stat.st_mtime, usegmt=True),
+                cache_control=cache_control,
+                varianten=varianten,
+            )
+
+    def __len__(self) -> int:
+        return len(self.dateien)
+
+    def finden(self, url_pfad: str) -> StatischeDatei | None:
+        """O(1)-Lookup; alles, was nicht im Index steht, gibt es nicht."""
+        return self.dateien.get(url_pfad.lstrip("/"))
+
+    def antwort(self, headers: Headers, datei: StatischeDatei, media_type: str | None = None) -> Response:
+        """FileResponse bzw. 304 für eine Indexdatei. HEAD behandelt FileResponse."""
+        darstellung = datei.darstellung(headers.get("accept-encoding", ""))
+        antwort_headers = {
+            "ETag": darstellung.etag,
+            "Last-Modified": datei.last_modified,
+            "Vary": "Accept-Encoding",
+        }
+        if darstellung.encoding:
+            antwort_headers["Content-Encoding"] = darstellung.encoding
+        if datei.cache_control:
+            antwort_headers["Cache-Control"] = datei.cache_control
+
+        if _nicht_geaendert(headers, darstellung.etag, datei.original.stat.st_mtime):
+            antwort_headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=antwort_headers)
+
+        return FileResponse(
+            darstellung.pfad,
+            # Content-Type immer vom Original, nicht "application/gzip"
+            media_type=media_type or datei.media_type,
+            headers=antwort_headers,
+            stat_result=darstellung.stat,
+        )
+
+
+def speicher_antwort(
+    headers: Headers,
+    inhalt: bytes,
+    etag: str,
+    media_type: str,
+    gzip_inhalt: bytes | None = None,
+) -> Response:
+    """Antwort für im Speicher erzeugte Inhalte (z. B. Kartenvarianten)."""
+    antwort_headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if _nicht_geaendert(headers, etag, None):
+        return Response(status_code=304, headers=antwort_headers)
+    if gzip_inhalt is not None and "gzip" in _akzeptierte_encodings(headers.get("accept-encoding", "")):
+        antwort_headers["Content-Encoding"] = "gzip"
+        inhalt = gzip_inhalt
+    return Response(content=inhalt, media_type=media_type, headers=antwort_headers)
+
+
+def _nicht_geaendert(headers: Headers, etag: str, mtime: float | None) -> bool:
+    """RFC 9110 §13.1: If-None-Match hat Vorrang vor If-Modified-Since."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        kandidaten = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in kandidaten or etag in kandidaten
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and mtime is not None:
+        try:
+            seit = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= seit
+    return False
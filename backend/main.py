@@ -4,27 +4,90 @@ EEDC Community Server
 Anonyme Aggregation von PV-Anlagendaten für Community-Statistiken.
 """
 
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
+from typing import Literal
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
 
-from core import settings, init_db
-from api import submit_router, stats_router, benchmark_router, statistics_router, components_router, trends_router
+from core import settings, init_db, async_session, start_sperre, daten_version_abgleichen
+from core.database import lese_replika
+from core.responses import SchnellJSONResponse
+from core.geo import Kartenvarianten
+from core.singleflight import SingleFlightMiddleware, buendelung_metriken
+from core.static import ApiGZipMiddleware, StatischerIndex, speicher_antwort
+from api import (
+    submit_router, stats_router, benchmark_router, statistics_router, components_router,
+    trends_router, vorberechnung_router, dashboard_router, export_router,
+)
+from api.analytik import analytik
+from api.rollup import community_monat_sicherstellen
+from api.statistics import caches_aufwaermen
+from api.submit import sammelcommit
+from api.vorberechnung import vorberechnung
+
+
+#: Start dieses Worker-Prozesses: Schema-Stand und Dauer je Phase (GET /api/health)
+start_info: dict = {"schema_version": None, "migriert": [], "sekunden": {}}
+
+
+@contextmanager
+def _phase(name: str):
+    beginn = time.perf_counter()
+    yield
+    start_info["sekunden"][name] = round(time.perf_counter() - beginn, 3)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup/Shutdown Events."""
-    # Startup: Datenbank initialisieren
-    await init_db()
-    print("✓ Datenbank initialisiert")
+    with _phase("gesamt"):
+        # Startup: Datenbank initialisieren — mit mehreren Workern nacheinander
+        async with start_sperre():
+            with _phase("schema"):
+                schema = await init_db()
+            start_info["schema_version"] = schema.version
+            start_info["migriert"] = schema.angewendet
+            if schema.angelegt:
+                print(f"✓ Schema angelegt (Version {schema.version})")
+            elif schema.angewendet:
+                print(f"✓ Schema migriert auf Version {schema.version} ({len(schema.angewendet)} Schritte)")
+            else:
+                print(f"✓ Schema aktuell (Version {schema.version})")
+            with _phase("rollup"):
+                async with async_session() as db:
+                    if await community_monat_sicherstellen(db):
+                        print("✓ Monats-Rollup aufgebaut")
+        # Spalten laden, bevor die Vorberechnung sie braucht
+        if analytik.aktiv:
+            with _phase("analytik"):
+                async with async_session() as db:
+                    stand = await analytik.stand(db)
+            print(f"✓ Analytik geladen ({stand.anzahl_anlagen} Anlagen, {stand.anzahl_monatswerte} Monatswerte)")
+        # Jeder Worker hat seinen eigenen Antwort-Cache bzw. Schnappschuss.
+        # Nacheinander aufwärmen: rechnen muss nur der erste, die übrigen
+        # übernehmen seinen abgelegten Stand (api/vorberechnung.py).
+        with _phase("aufwaermen"):
+            if settings.vorberechnung_aktiv:
+                async with start_sperre():
+                    await vorberechnung.aufwaermen()
+                vorberechnung.starten()
+                print("✓ Aggregate vorberechnet, Hintergrund-Task läuft")
+            else:
+                async with async_session() as db:
+                    await daten_version_abgleichen(db, erzwingen=True)
+                    await caches_aufwaermen(db)
+                print("✓ Caches aufgewärmt")
+    print(f"✓ Start in {start_info['sekunden']['gesamt']:.2f} s")
     yield
     # Shutdown
+    await sammelcommit.stoppen()
+    await vorberechnung.stoppen()
     print("Server wird beendet...")
 
 
@@ -33,11 +96,24 @@ app = FastAPI(
     description="Anonyme PV-Anlagen-Statistiken für die Community",
     version="0.1.0",
     lifespan=lifespan,
+    # Als Default(...) gesetzt, damit FastAPI für response_model-Endpoints
+    # seinen direkten Pydantic-Serialisierungspfad behält.
+    default_response_class=Default(
+        SchnellJSONResponse if settings.schnelle_json_antworten else JSONResponse
+    ),
 )
 
 # Proxy-Headers: X-Forwarded-For → request.client.host (hinter Nginx Proxy Manager)
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts=["*"])
 
+# Identische gleichzeitige GETs einmal rechnen — innerhalb von gzip, damit
+# jede Anfrage nach ihrem eigenen Accept-Encoding komprimiert wird
+if settings.buendelung_aktiv:
+    app.add_middleware(SingleFlightMiddleware, max_bytes=settings.buendelung_max_bytes)
+
+# gzip für JSON-Antworten ab Mindestgröße (statische Dateien: vorkomprimiert)
+app.add_middleware(ApiGZipMiddleware, minimum_size=settings.gzip_min_bytes)
+
 # CORS für Frontend
 app.add_middleware(
     CORSMiddleware,
@@ -54,13 +130,34 @@ app.include_router(benchmark_router, prefix="/api")
 app.include_router(statistics_router, prefix="/api")
 app.include_router(components_router, prefix="/api")
 app.include_router(trends_router, prefix="/api")
+app.include_router(vorberechnung_router, prefix="/api")
+app.include_router(dashboard_router, prefix="/api")
+app.include_router(export_router, prefix="/api")
 
 
 # Health-Check
 @app.get("/api/health")
 async def health():
-    """Health-Check Endpoint."""
-    return {"status": "ok", "version": "0.1.0"}
+    """Health-Check Endpoint, mit Schema-Version und Startdauer dieses Workers."""
+    return {"status": "ok", "version": "0.1.0", "start": start_info}
+
+
+@app.get("/api/health/buendelung")
+async def health_buendelung():
+    """Zähler der Anfrage-Bündelung dieses Worker-Prozesses (core/singleflight.py)."""
+    return {"aktiv": settings.buendelung_aktiv, **buendelung_metriken.als_dict()}
+
+
+@app.get("/api/health/sammelcommit")
+async def health_sammelcommit():
+    """Zähler des Gruppen-Commits der Submits in diesem Worker (core/sammelcommit.py)."""
+    return {"aktiv": settings.sammelcommit_aktiv, **sammelcommit.metriken.als_dict()}
+
+
+@app.get("/api/health/replika")
+async def health_replika():
+    """Stand der Lese-Replika und wohin die Lese-Endpoints gingen (core/database.py)."""
+    return {"aktiv": lese_replika is not None, **(lese_replika.als_dict() if lese_replika else {})}
 
 
 # Statische Dateien (Frontend)
@@ -70,30 +167,44 @@ index_path = static_path / "index.html"
 
 # Frontend nur einbinden wenn assets UND index.html existieren
 if assets_path.exists() and index_path.exists():
-    app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
-
-    @app.get("/")
-    async def serve_frontend():
-        """Liefert das Frontend."""
-        return FileResponse(index_path)
-
-    @app.get("/favicon.svg")
-    async def serve_favicon():
-        """Liefert das Favicon."""
-        return FileResponse(static_path / "favicon.svg")
-
-    @app.get("/deutschland-bundeslaender.geo.json")
-    async def serve_geojson():
-        """Liefert die Deutschland-Bundesländer GeoJSON-Karte."""
-        return FileResponse(static_path / "deutschland-bundeslaender.geo.json", media_type="application/json")
-
-    @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
+    # Einmal indexieren: Lookup pro Request ist ein Dict-Zugriff, Pfade
+    # außerhalb von static/ sind nicht erreichbar (core/static.py).
+    static_index = StatischerIndex(static_path)
+    index_datei = static_index.finden("index.html")
+
+    geojson_name = "deutschland-bundeslaender.geo.json"
+    if static_index.finden(geojson_name) is not None:
+        karten = Kartenvarianten(static_path / geojson_name, settings.karten_toleranzen_liste)
+
+        @app.api_route(f"/{geojson_name}", methods=["GET", "HEAD"])
+        async def serve_geojson(
+            request: Request,
+            format: Literal["geojson", "topojson"] = Query("geojson"),
+            toleranz: float | None = Query(None, description="Douglas–Peucker-Toleranz in Grad"),
+        ):
+            """Bundesländer-Karte: Original oder TopoJSON/vereinfachte Variante (core/geo.py)."""
+            if format == "geojson" and toleranz is None:
+                return static_index.antwort(request.headers, static_index.finden(geojson_name))
+            variante = karten.holen(format, toleranz)
+            if variante is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Toleranz muss eine von {karten.toleranzen} sein",
+                )
+            return speicher_antwort(
+                request.headers, variante.inhalt, variante.etag, variante.media_type, variante.gzip
+            )
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve_spa(full_path: str, request: Request):
         """Statische Dateien aus static/ direkt liefern, sonst SPA-Fallback."""
-        requested = static_path / full_path
-        if requested.exists() and requested.is_file():
-            return FileResponse(requested)
-        return FileResponse(index_path)
+        datei = static_index.finden(full_path)
+        if datei is None:
+            if full_path.startswith("assets/"):
+                # Fehlende Assets nicht mit index.html beantworten
+                return Response(status_code=404)
+            datei = index_datei
+        return static_index.antwort(request.headers, datei)
 else:
     @app.get("/")
     async def redirect_to_docs():
@@ -0,0 +1,96 @@
+"""
+EEDC Community - Wartungsbefehle
+
+    python manage.py rollup aufbauen   # community_monat komplett neu aufbauen
+    python manage.py rollup pruefen    # Rollup gegen Live-Berechnung prüfen
+    python manage.py analytik pruefen  # In-Memory-Analytik gegen SQL prüfen
+    python manage.py partitionen                 # Jahrespartitionen mit Zeilen und Größe
+    python manage.py partitionen abhaengen JJJJ  # Jahr aus monatswerte nehmen (Archiv)
+    python manage.py partitionen anhaengen JJJJ  # abgehängtes Jahr zurückholen
+"""
+
+import asyncio
+import sys
+
+from core.database import async_session, init_db
+
+
+async def _rollup(befehl: str) -> int:
+    from api.rollup import community_monat_aufbauen, community_monat_pruefen
+
+    await init_db()
+    async with async_session() as db:
+        if befehl == "aufbauen":
+            anzahl = await community_monat_aufbauen(db)
+            print(f"✓ community_monat neu aufgebaut ({anzahl} Buckets)")
+            return 0
+        if befehl == "pruefen":
+            abweichend = await community_monat_pruefen(db)
+            for jahr, monat in abweichend:
+                print(f"✗ {jahr}-{monat:02d} weicht von der Live-Berechnung ab")
+            if abweichend:
+                return 1
+            print("✓ community_monat ist konsistent")
+            return 0
+    return 2
+
+
+async def _analytik_pruefen() -> int:
+    from api.analytik import analytik, analytik_pruefen
+
+    if not analytik.aktiv:
+        print("✗ Analytik ist aus (numpy fehlt oder ANALYTIK_AKTIV=false)")
+        return 1
+    await init_db()
+    async with async_session() as db:
+        abweichend = await analytik_pruefen(db)
+    for name in abweichend:
+        print(f"✗ {name} weicht von der SQL-Berechnung ab")
+    if abweichend:
+        return 1
+    print("✓ Analytik ist konsistent")
+    return 0
+
+
+async def _partitionen(befehl: str | None, jahr: int | None) -> int:
+    from api.rollup import community_monat_aufbauen
+    from core.partitionen import (
+        partition_abhaengen, partition_anhaengen, partitionen_auflisten,
+    )
+
+    await init_db()
+    async with async_session() as db:
+        if befehl is None:
+            for p in await partitionen_auflisten(db):
+                status = "" if p.angehaengt else "  (abgehängt)"
+                zeilen = f"~{p.zeilen}"  # Schätzung aus der Statistik
+                print(f"{p.name:22} {zeilen:>11} Zeilen {p.bytes / 1024 / 1024:>8.1f} MB{status}")
+            return 0
+        # Abhängen/Anhängen ändert, was alle Auswertungen sehen: Rollup in
+        # derselben Transaktion neu aufbauen (erhöht auch die Datenversion)
+        if befehl == "abhaengen":
+            await partition_abhaengen(db, jahr)
+        else:
+            await partition_anhaengen(db, jahr)
+        anzahl = await community_monat_aufbauen(db)
+        print(f"✓ {jahr} {'abgehängt' if befehl == 'abhaengen' else 'angehängt'}, "
+              f"community_monat neu aufgebaut ({anzahl} Buckets)")
+        return 0
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) == 2 and argv[0] == "rollup" and argv[1] in ("aufbauen", "pruefen"):
+        return asyncio.run(_rollup(argv[1]))
+    if argv == ["analytik", "pruefen"]:
+        return asyncio.run(_analytik_pruefen())
+    if argv == ["partitionen"]:
+        return asyncio.run(_partitionen(None, None))
+    if len(argv) == 3 and argv[0] == "partitionen" and argv[1] in ("abhaengen", "anhaengen") \
+            and argv[2].isdigit():
+        return asyncio.run(_partitionen(argv[1], int(argv[2])))
+    print(__doc__.strip())
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
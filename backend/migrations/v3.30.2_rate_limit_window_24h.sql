@@ -4,7 +4,7 @@
 --   "max 30 Updates pro Anlage/Kalendermonat" zu
 --   "max 50 Updates pro Anlage in rollendem 24h-Fenster".
 --
--- Die App-Migration in `backend/core/database.py:run_migrations` führt das
+-- Die App-Migration (`backend/core/migrationen.py`, Schritt 2) führt das
 -- ALTER TABLE automatisch beim Server-Start aus. Diese SQL-Datei dient
 -- nur der Dokumentation für manuelle DB-Audits oder Restore-Vorgänge.
 
@@ -3,10 +3,11 @@ EEDC Community - Datenbank-Modelle
 """
 
 from datetime import datetime
-from sqlalchemy import String, Integer, Float, Boolean, DateTime, ForeignKey, Index
+from sqlalchemy import String, Integer, BigInteger, Float, Boolean, Computed, DateTime, ForeignKey, Index, JSON, event, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from core.database import Base
+from core.partitionen import partitionen_sql
 
 
 class Anlage(Base):
@@ -64,18 +65,35 @@ class Anlage(Base):
     monatswerte: Mapped[list["Monatswert"]] = relationship(back_populates="anlage", cascade="all, delete-orphan")
 
 
+#: Meistgelesene KPI-Spalten (Rankings, Benchmark, Komponenten) — als INCLUDE
+#: in den Perioden-Indizes von `monatswerte`
+KPI_INDEX_SPALTEN = (
+    "ertrag_kwh", "autarkie_prozent",
+    "speicher_ladung_kwh", "speicher_entladung_kwh", "speicher_ladung_netz_kwh",
+    "wp_stromverbrauch_kwh", "wp_heizwaerme_kwh", "wp_warmwasser_kwh",
+    "eauto_ladung_gesamt_kwh", "eauto_ladung_pv_kwh", "eauto_km",
+)
+
+
 class Monatswert(Base):
     """
     Monatliche Ertragsdaten einer Anlage.
+
+    Nach `jahr` partitioniert (core/partitionen.py); der Partitionsschlüssel
+    gehört deshalb zum Primärschlüssel.
     """
     __tablename__ = "monatswerte"
 
-    id: Mapped[int] = mapped_column(primary_key=True)
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     anlage_id: Mapped[int] = mapped_column(ForeignKey("anlagen.id", ondelete="CASCADE"))
 
     # Zeitraum
-    jahr: Mapped[int] = mapped_column(Integer)
+    jahr: Mapped[int] = mapped_column(Integer, primary_key=True)
     monat: Mapped[int] = mapped_column(Integer)
+    # Fortlaufender Monatsindex (jahr * 12 + monat - 1), von Postgres berechnet.
+    # Zeitfenster werden als `periode BETWEEN a AND b` gefiltert statt über
+    # verschachtelte (jahr, monat)-Bedingungen — ein einfacher Bereichsscan.
+    periode: Mapped[int] = mapped_column(Integer, Computed("jahr * 12 + monat - 1", persisted=True))
 
     # Energiewerte
     ertrag_kwh: Mapped[float] = mapped_column(Float)
@@ -133,9 +151,127 @@ class Monatswert(Base):
     # Eindeutigkeit: Pro Anlage nur ein Eintrag pro Monat
     __table_args__ = (
         Index("ix_monatswerte_anlage_zeit", "anlage_id", "jahr", "monat", unique=True),
+        # Zeitfenster je Anlage und über alle Anlagen; die meistgelesenen
+        # KPI-Spalten liegen im Index, damit reicht ein Index-Only-Scan.
+        Index(
+            "ix_monatswerte_anlage_periode", "anlage_id", "periode",
+            postgresql_include=list(KPI_INDEX_SPALTEN),
+        ),
+        Index(
+            "ix_monatswerte_periode", "periode",
+            postgresql_include=["anlage_id", *KPI_INDEX_SPALTEN],
+        ),
+        {"postgresql_partition_by": "RANGE (jahr)"},
     )
 
 
+@event.listens_for(Monatswert.__table__, "after_create")
+def _jahrespartitionen_anlegen(target, connection, **kw):
+    """Neue Datenbank: Partitionen gleich mit der Tabelle anlegen."""
+    for anweisung in partitionen_sql():
+        connection.exec_driver_sql(anweisung)
+
+
+class CommunityMonat(Base):
+    """
+    Vorberechnete Community-Werte je (Jahr, Monat, Region).
+
+    Wird bei Submit und Löschen inkrementell nachgeführt (`api/rollup.py`)
+    und lässt sich jederzeit aus `monatswerte` neu aufbauen
+    (`python manage.py rollup aufbauen`). Die Monats-Endpoints lesen nur noch
+    hier statt für jeden Aufruf denselben Monat erneut zu scannen.
+    """
+    __tablename__ = "community_monat"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    jahr: Mapped[int] = mapped_column(Integer)
+    monat: Mapped[int] = mapped_column(Integer)
+    region: Mapped[str] = mapped_column(String(2))
+
+    # Anzahl Monatswerte im Bucket = Anzahl Anlagen (ein Wert pro Anlage und Monat)
+    anzahl_anlagen: Mapped[int] = mapped_column(Integer, default=0)
+
+    # Rohsummen (NULL zählt als 0) für die Community-Gesamtwerte
+    sum_ertrag_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_einspeisung_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_netzbezug_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_speicher_ladung_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_speicher_entladung_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_wp_strom_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_wp_waerme_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_eauto_km: Mapped[float] = mapped_column(Float, default=0)
+    sum_eauto_ladung_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_eauto_pv_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_wallbox_ladung_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_wallbox_pv_kwh: Mapped[float] = mapped_column(Float, default=0)
+    sum_bkw_erzeugung_kwh: Mapped[float] = mapped_column(Float, default=0)
+
+    # Verteilung je KPI als Quantil-Sketch: {kpi: {...}} — siehe `api.sketch.QuantilSketch`
+    kpis: Mapped[dict] = mapped_column(JSON, default=dict)
+
+    aktualisiert_am: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_community_monat_schluessel", "jahr", "monat", "region", unique=True),
+    )
+
+
+class DatenStand(Base):
+    """
+    Gemeinsame Datenversion aller Worker (genau eine Zeile, id = 1).
+
+    Jeder Schreibvorgang erhöht sie in seiner Transaktion; Worker vergleichen
+    sie mit ihrer lokalen Version, bevor sie gecachte Antworten ausliefern
+    (`core/cache.py`).
+    """
+    __tablename__ = "daten_stand"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+    geaendert_am: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class DatenAenderung(Base):
+    """
+    Änderungsprotokoll zur Datenversion: je Erhöhung eine Zeile mit den
+    Anlagen, deren Stammdaten oder Monatswerte sich geändert haben (auch
+    gelöschte). Daraus lädt die In-Memory-Analytik eines Workers nur die
+    geänderten Anlagen nach (`api/analytik.py`). Alte Zeilen fallen weg.
+    """
+    __tablename__ = "daten_aenderungen"
+
+    version: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    anlage_ids: Mapped[list] = mapped_column(JSON)
+
+
+class VorberechnungStand(Base):
+    """
+    Letzter Schnappschuss des rechnenden Workers (genau eine Zeile, id = 1).
+
+    Nur ein Worker rechnet die Aggregate (`api/vorberechnung.py`); die übrigen
+    übernehmen sie von hier. `werte`: Schlüssel → Aggregat als JSON.
+    """
+    __tablename__ = "vorberechnung_stand"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger)
+    werte: Mapped[dict] = mapped_column(JSON)
+    berechnet_am: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+
+class IdempotenzQuittung(Base):
+    """
+    Antwort eines erfolgreichen Submits oder DELETE mit Idempotency-Key, unter
+    SHA-256(Methode, Pfad, Key, Body) — damit auch ein anderer Worker die
+    Wiederholung mit derselben Antwort bestätigt (`core/idempotenz.py`).
+    """
+    __tablename__ = "idempotenz_quittungen"
+
+    schluessel: Mapped[str] = mapped_column(String(64), primary_key=True)
+    antwort: Mapped[dict] = mapped_column(JSON)
+    angelegt_am: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), index=True)
+
+
 class RateLimit(Base):
     """
     Rate-Limiting Tracking pro IP.
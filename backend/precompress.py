@@ -0,0 +1,55 @@
+"""
+EEDC Community - Statische Dateien vorkomprimieren
+
+Legt neben jeder komprimierbaren Datei ein `.gz` und — wenn das Paket
+`brotli` installiert ist — ein `.br` an. Läuft beim Docker-Build; der Server
+liefert die Varianten aus (`core/static.py`).
+
+    python precompress.py [static]
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional, dann nur gzip
+    brotli = None
+
+ENDUNGEN = {".js", ".css", ".html", ".json", ".svg", ".txt", ".xml", ".map"}
+MIN_BYTES = 1024
+
+
+def komprimieren(verzeichnis: Path) -> tuple[int, int, int]:
+    """Gibt (Dateien, Bytes original, Bytes beste Variante) zurück."""
+    anzahl = original = komprimiert = 0
+    for pfad in sorted(verzeichnis.rglob("*")):
+        if not pfad.is_file() or pfad.suffix not in ENDUNGEN:
+            continue
+        daten = pfad.read_bytes()
+        if len(daten) < MIN_BYTES:
+            continue
+
+        # mtime=0: gleicher Inhalt → gleiche Bytes (reproduzierbarer Build)
+        varianten = {".gz": gzip.compress(daten, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            varianten[".br"] = brotli.compress(daten, quality=11)
+
+        for endung, inhalt in varianten.items():
+            # Nur behalten, wenn es sich lohnt (bereits komprimierte Daten)
+            if len(inhalt) < len(daten) * 0.9:
+                pfad.with_name(pfad.name + endung).write_bytes(inhalt)
+        anzahl += 1
+        original += len(daten)
+        komprimiert += min(len(daten), *(len(v) for v in varianten.values()))
+    return anzahl, original, komprimiert
+
+
+if __name__ == "__main__":
+    ziel = Path(sys.argv[1] if len(sys.argv) > 1 else "static")
+    anzahl, original, komprimiert = komprimieren(ziel)
+    print(
+        f"✓ {anzahl} Dateien vorkomprimiert ({'br + gzip' if brotli else 'gzip'}): "
+        f"{original / 1024:.0f} KB → {komprimiert / 1024:.0f} KB"
+    )
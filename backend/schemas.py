@@ -3,7 +3,7 @@ EEDC Community - Pydantic Schemas
 """
 
 from datetime import datetime
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import Literal
 
 
@@ -182,8 +182,8 @@ class AnlageSubmitInput(BaseModel):
     sonstiges_bezeichnung: str | None = Field(None, max_length=100)
     wp_art: str | None = Field(None, max_length=20)  # luft_wasser, sole_wasser
 
-    # Monatswerte
-    monatswerte: list[MonatswertInput] = Field(..., min_length=1)
+    # Monatswerte — beim inkrementellen Submit nur die geänderten
+    monatswerte: list[MonatswertInput] = Field(...)
 
     # N18-2: Client garantiert, dass `monatswerte` ALLE teilbaren Monate enthält —
     # serverseitig vorhandene Monate dieses Hashes, die im Payload fehlen, wurden
@@ -191,6 +191,14 @@ class AnlageSubmitInput(BaseModel):
     # Alte Clients senden das Flag nicht → Verhalten unverändert (nur Upsert).
     monate_vollstaendig: bool = False
 
+    # Inkrementeller Submit: ALLE Monate der Anlage als "JJJJ-MM", `monatswerte`
+    # enthält nur die geänderten (Abgleich über GET /api/submit/{hash}/fingerabdruecke).
+    # Serverseitige Monate außerhalb der Liste werden gelöscht wie beim
+    # Vollständigkeits-Submit; gelistete Monate, die der Server nicht hat,
+    # meldet die Antwort als `fehlende_monate` zum Nachsenden. Nur für bestehende
+    # Anlagen; eine leere Liste wird abgelehnt (alles löschen geht per DELETE).
+    monats_schluessel: list[str] | None = Field(None, max_length=1200)
+
     @field_validator("region")
     @classmethod
     def validate_region(cls, v: str) -> str:
@@ -217,6 +225,39 @@ class AnlageSubmitInput(BaseModel):
             seen.add(key)
         return v
 
+    @field_validator("monats_schluessel")
+    @classmethod
+    def validate_monats_schluessel(cls, v: list[str] | None) -> list[str] | None:
+        if v is None:
+            return v
+        for schluessel in v:
+            jahr, _, monat = schluessel.partition("-")
+            if not (len(jahr) == 4 and len(monat) == 2 and jahr.isdigit() and monat.isdigit()
+                    and 1 <= int(monat) <= 12):
+                raise ValueError(f"Ungültiger Monatsschlüssel: {schluessel} (erwartet JJJJ-MM)")
+        if len(set(v)) != len(v):
+            raise ValueError("Doppelte Monatsschlüssel")
+        return v
+
+    @model_validator(mode="after")
+    def validate_inkrementell(self) -> "AnlageSubmitInput":
+        if self.monats_schluessel is None:
+            # Voll-Submit: mindestens ein Monat
+            if not self.monatswerte:
+                raise ValueError("monatswerte darf nicht leer sein")
+            return self
+        if not self.monats_schluessel:
+            # Leere Liste hieße "alle gespeicherten Monate löschen"
+            raise ValueError(
+                "monats_schluessel darf nicht leer sein — "
+                "alle Daten entfernen: DELETE /api/submit/{anlage_hash}"
+            )
+        schluessel = set(self.monats_schluessel)
+        for mw in self.monatswerte:
+            if f"{mw.jahr:04d}-{mw.monat:02d}" not in schluessel:
+                raise ValueError(f"Monat {mw.jahr}-{mw.monat:02d} fehlt in monats_schluessel")
+        return self
+
 
 # =============================================================================
 # Ausgabe-Schemas (für API-Responses)
@@ -294,9 +335,22 @@ class SubmitResponse(BaseModel):
     success: bool
     message: str
     anlage_hash: str
-    anzahl_monate: int
+    anzahl_monate: int  # Monatswerte der Anlage nach dem Submit, nicht nur die gesendeten
     # Vergleichsdaten
     benchmark: "BenchmarkData | None" = None
+    # Abgleich mit dem gespeicherten Stand: nur Geändertes wird geschrieben
+    monate_geaendert: int = 0
+    monate_unveraendert: int = 0
+    monate_geloescht: int = 0
+    # Inkrementeller Submit: gelistete Monate, die dem Server fehlen — vollständig nachsenden
+    fehlende_monate: list[str] = []
+
+
+class MonatsFingerabdruecke(BaseModel):
+    """Inhalts-Hash je gespeichertem Monat ("JJJJ-MM" → 16 Hex-Zeichen)."""
+    anlage_hash: str
+    anzahl_monate: int
+    monate: dict[str, str]
 
 
 class BenchmarkData(BaseModel):
@@ -377,6 +431,25 @@ class ErweiterteBenchmarkData(BaseModel):
     balkonkraftwerk: BKWBenchmark | None = None
 
 
+# Vergleichszeiträume von `/api/benchmark/anlage/{hash}` und `/api/benchmark/anlagen`
+ZeitraumTyp = Literal["letzter_monat", "letzte_12_monate", "letztes_vollstaendiges_jahr", "jahr", "seit_installation", "monat"]
+
+
+class BatchBenchmarkAnfrage(BaseModel):
+    """Benchmark für mehrere Anlagen in einem Aufruf (z. B. Installateur-Übersicht)."""
+    anlage_hashes: list[str] = Field(..., min_length=1, max_length=100)
+    zeitraum: ZeitraumTyp = "letzte_12_monate"
+    jahr: int | None = Field(None, ge=2010, le=2050)  # für zeitraum=jahr/monat
+    monat: int | None = Field(None, ge=1, le=12)  # für zeitraum=monat
+
+
+class BatchBenchmarkAntwort(BaseModel):
+    """Je Hash dieselben Daten wie `/api/benchmark/anlage/{hash}`."""
+    zeitraum: ZeitraumTyp
+    anlagen: dict[str, dict]
+    nicht_gefunden: list[str]
+
+
 class DeleteResponse(BaseModel):
     """Antwort nach erfolgreicher Löschung."""
     success: bool
@@ -423,6 +496,25 @@ class MonatsStatistik(BaseModel):
     max_spez_ertrag: float
 
 
+class KpiVerteilung(BaseModel):
+    """Verteilung eines Monats-KPI über einen beliebigen Zeitraum.
+
+    Grundgesamtheit sind Anlagen-Monate (eine Anlage zählt je Monat einmal).
+    Quantile aus dem Rollup-Sketch, relativer Fehler ≤ 1 %.
+    """
+    kpi: str
+    von: str  # YYYY-MM
+    bis: str  # YYYY-MM
+    region: str | None = None
+    anzahl_werte: int
+    durchschnitt: float | None = None
+    p25: float | None = None
+    median: float | None = None
+    p75: float | None = None
+    min: float | None = None
+    max: float | None = None
+
+
 class SpeicherStatistik(BaseModel):
     """Speicher-Kennzahlen über die Anlagen mit `speicher_kwh > 0`.
 
@@ -700,6 +792,57 @@ class VerfuegbareMonate(BaseModel):
     neuester: str | None = None  # "YYYY-MM"
 
 
+# =============================================================================
+# Dashboard (Bootstrap)
+# =============================================================================
+
+DashboardSektion = Literal["stats", "totals", "verfuegbare_monate", "monatsvergleich", "benchmark"]
+
+
+class Dashboard(BaseModel):
+    """Alle Startdaten der Community-Übersicht in einer Antwort.
+
+    Nicht angeforderte Sektionen sind null. `benchmark` entspricht
+    `/api/benchmark/anlage/{hash}` und ist auch null, wenn der Hash
+    unbekannt ist (`anlage_gefunden`). Sektionen, die beim Laden scheitern,
+    sind ebenfalls null und stehen in `fehler`.
+    """
+    sektionen: list[DashboardSektion]
+    fehler: list[DashboardSektion] = []
+    stats: GesamtStatistik | None = None
+    totals: CommunityGesamtwerte | None = None
+    verfuegbare_monate: VerfuegbareMonate | None = None
+    monatsvergleich: MonatsVergleich | None = None
+    benchmark: dict | None = None
+    anlage_gefunden: bool | None = None
+
+
+# =============================================================================
+# Vorberechnung (Betrieb)
+# =============================================================================
+
+class AggregatStatus(BaseModel):
+    """Letzter Lauf eines vorberechneten Aggregats."""
+    schluessel: str
+    berechnet_am: datetime | None = None
+    dauer_ms: float | None = None
+    fehler: str | None = None
+
+
+class VorberechnungStatus(BaseModel):
+    """Zustand der Hintergrund-Vorberechnung dieses Worker-Prozesses."""
+    aktiv: bool
+    # Dieser Worker rechnet; sonst übernimmt er den Schnappschuss des rechnenden
+    rechnend: bool = False
+    daten_version: int
+    schnappschuss_version: int | None = None
+    veroeffentlicht_am: datetime | None = None
+    letzte_laufdauer_ms: float | None = None
+    anzahl_laeufe: int
+    anzahl_uebernommen: int = 0
+    aggregate: list[AggregatStatus]
+
+
 # Forward reference auflösen
 SubmitResponse.model_rebuild()
 MonatsVergleich.model_rebuild()
@@ -0,0 +1,42 @@
+"""
+EEDC Community - Produktionsserver mit mehreren Worker-Prozessen
+
+Ein einzelner Prozess blockiert bei CPU-lastigen Anfragen alle anderen.
+`serve.py` startet `settings.worker_anzahl` uvicorn-Worker (WORKERS, 0 =
+automatisch nach CPU-Kernen, höchstens MAX_WORKERS); uvicorn überwacht sie
+und startet abgestürzte neu. Jeder Worker initialisiert beim Start (der
+Reihe nach, `core.database.start_sperre`) und wärmt seinen Antwort-Cache auf.
+Cache-Invalidierung über Worker hinweg: `core/cache.py`.
+
+    python serve.py [--host 0.0.0.0] [--port 8080]
+
+Für die Entwicklung weiterhin: uvicorn main:app --reload --port 8080
+"""
+
+import argparse
+
+import uvicorn
+
+from core.config import settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EEDC Community Produktionsserver")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    workers = settings.worker_anzahl
+    print(f"✓ Starte {workers} Worker auf {args.host}:{args.port}")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        # X-Forwarded-For setzt ProxyHeadersMiddleware in main.py
+        proxy_headers=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
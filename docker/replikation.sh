@@ -0,0 +1,5 @@
+#!/bin/sh
+# Primary für Streaming-Replikation freigeben (docker-compose.replika.yml).
+# Läuft einmalig beim Anlegen des Datenverzeichnisses.
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
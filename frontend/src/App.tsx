@@ -5,7 +5,7 @@ import CommunityOverview from './pages/CommunityOverview'
 import PersonalizedView from './pages/PersonalizedView'
 import { useDarkMode } from './hooks/useDarkMode'
 import { getAnlageHash, getCurrentPage, navigateTo, fetchJson } from './utils'
-import type { GesamtStatistik, CommunityGesamtwerte, AnlageBenchmark } from './types'
+import type { GesamtStatistik, CommunityGesamtwerte, AnlageBenchmark, Dashboard } from './types'
 
 export default function App() {
   const [stats, setStats] = useState<GesamtStatistik | null>(null)
@@ -31,23 +31,19 @@ export default function App() {
   useEffect(() => {
     const loadData = async () => {
       try {
-        // Stats und Totals parallel laden
-        const [statsData, totalsData] = await Promise.all([
-          fetchJson<GesamtStatistik>('/api/stats'),
-          fetchJson<CommunityGesamtwerte>('/api/statistics/global/totals').catch(() => null),
-        ])
-        setStats(statsData)
-        setTotals(totalsData)
-
-        // Wenn anlage Parameter vorhanden, Benchmark laden (immer Jahresertrag)
-        if (anlageHash) {
-          try {
-            const benchmarkData = await fetchJson<AnlageBenchmark>(`/api/benchmark/anlage/${anlageHash}`)
-            setBenchmark(benchmarkData)
-          } catch {
-            // Anlage nicht gefunden → zeigen wir einfach die Übersicht
-          }
+        // Stats, Totals und ggf. Benchmark in einem Aufruf
+        const params = new URLSearchParams({ include: 'stats,totals,benchmark' })
+        if (anlageHash) params.set('anlage_hash', anlageHash)
+        const dashboard = await fetchJson<Dashboard>(`/api/dashboard?${params}`)
+        // Ohne Stats keine Übersicht; Totals und Benchmark sind optional
+        // (gescheiterte Sektionen sind null und stehen in dashboard.fehler)
+        if (!dashboard.stats) {
+          throw new Error('Community-Statistiken konnten nicht geladen werden')
         }
+        setStats(dashboard.stats)
+        setTotals(dashboard.totals)
+        // Anlage nicht gefunden oder Fehler → benchmark ist null, wir zeigen die Übersicht
+        setBenchmark(dashboard.benchmark)
 
         setLoading(false)
       } catch (err) {
@@ -3,7 +3,8 @@ import { ComposableMap, Geographies, Geography } from 'react-simple-maps'
 import type { RegionStatistik } from '../../types'
 import { REGION_NAMEN } from '../../constants'
 
-const GEO_URL = '/deutschland-bundeslaender.geo.json'
+// TopoJSON, vereinfacht um ≈ 1 px bei dieser Kartengröße (core/geo.py)
+const GEO_URL = '/deutschland-bundeslaender.geo.json?format=topojson&toleranz=0.03'
 
 const DE_CODES = new Set([
   'BW', 'BY', 'BE', 'BB', 'HB', 'HH', 'HE', 'MV',
@@ -267,3 +267,15 @@ export interface CommunityGesamtwerte {
   co2_vermieden_kg: number
   monatliche_summen: MonatsSumme[]
 }
+
+// GET /api/dashboard — Startdaten in einem Aufruf, nicht angeforderte Sektionen sind null
+export interface Dashboard {
+  sektionen: string[]
+  fehler: string[]
+  stats: GesamtStatistik | null
+  totals: CommunityGesamtwerte | null
+  verfuegbare_monate: VerfuegbareMonate | null
+  monatsvergleich: MonatsVergleich | null
+  benchmark: AnlageBenchmark | null
+  anlage_gefunden: boolean | null
+}